@@ -1,6 +1,102 @@
-from datetime import datetime
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import MutableSequence, Sequence
+from completion_index import CompletionIndex
+from datetime import datetime, timedelta
+import instrumentation
+from periods import get_period
+from rollups import Rollups
+from streaks import compute_streaks
+
+_ORDINAL_EPOCH = datetime(1, 1, 1)  # The datetime of day ordinal 1
+
+
+def _time_of_day(marked_date: datetime):
+    """
+    Returns the time of day of a datetime in microseconds since midnight.
+
+    Args:
+        marked_date (datetime): The datetime to convert.
+
+    Returns:
+        int: The microseconds since midnight.
+    """
+    return ((marked_date.hour * 60 + marked_date.minute) * 60 + marked_date.second) * 1000000 + marked_date.microsecond
+
+
+class _MarkedDates(MutableSequence):
+    """
+    List-like view of the completions of a habit, producing a datetime per completion on access.
+
+    The completions are always kept in chronological order, so inserting or replacing a date
+    puts it at its sorted position instead of the given index.
+    """
+
+    __slots__ = ('_habit',)
+
+    def __init__(self, habit):
+        self._habit = habit
+
+    def __len__(self):
+        return len(self._habit._get_ordinals())
+
+    def __iter__(self):
+        return self._habit._iter_dates()
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._habit._date_at(index)
+
+    def __setitem__(self, index, value):
+        if isinstance(index, slice):
+            values = list(value)
+            dates = list(self)
+            dates[index] = values
+            self._habit.marked_dates = dates
+        else:
+            del self[index]
+            self._habit._add_date(value)
+            self._habit._streak_state = None
+
+    def __delitem__(self, index):
+        self._habit._remove_dates(index)
+
+    def insert(self, index, value):
+        self._habit._add_date(value)
+        self._habit._streak_state = None
+
+    def append(self, value):
+        self._habit._add_date(value)
+        self._habit._streak_state = None
+
+    def __eq__(self, other):
+        if isinstance(other, Sequence) and not isinstance(other, (str, bytes)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
 
 class Habit:
+    __slots__ = (
+        'name',
+        'description',
+        'frequency',
+        'created',
+        'current_streak',
+        'longest_streak',
+        '_ordinals',
+        '_times',
+        '_iso_dates',
+        '_streak_state',
+        '_period_keys',
+        '_rollups',
+        '_stored_rollups',
+        '_completion_index',
+    )
+
     def __init__(self, name: str, description: str, frequency: str):
         """
         Initializes a new habit with the given name, description, and frequency.
@@ -12,19 +108,394 @@ class Habit:
         """
         self.name = name
         self.description = description
-        self.frequency = frequency 
+        self.frequency = frequency  # 'DAILY', 'WEEKLY', 'MONTHLY' or 'EVERY_<N>_DAYS'
         self.created = datetime.today()  # The date and time when the habit was created
-        self.marked_dates = []  # List to store dates when the habit is marked as complete
-        self.longest_streak = 0  # Placeholder for the longest streak of habit completion
+        self._ordinals = array('i')  # Sorted day ordinals (as returned by date.toordinal) of the completions
+        self._times = None  # Microseconds since midnight of each completion, or None while all are at midnight
+        self._iso_dates = None  # Completions as ISO format strings until they are first used
+        self.current_streak = 0  # Streak ending in the current period, as of the last streak count
+        self.longest_streak = 0  # Longest streak of habit completion, as of the last streak count
+        # (period, key of the creation period, key of the last completed period, streak ending in that period),
+        # kept up to date by mark_complete, or None until the completions are next counted
+        self._streak_state = None
+        self._period_keys = None  # (period, sorted distinct keys of the completed periods), or None until needed
+        self._rollups = None  # Completion counts by week, month and year, kept up to date once built
+        self._stored_rollups = None  # (period, rollups dictionary) loaded from a file until they are first used
+        self._completion_index = None  # Index for date range queries, built on first use
+
+    @property
+    def marked_dates(self):
+        """
+        list[datetime]: The dates when the habit was marked as complete, in chronological order.
+        A list-like view over the packed completions; each access builds the datetimes it returns.
+        """
+        return _MarkedDates(self)
+
+    @marked_dates.setter
+    def marked_dates(self, dates):
+        dates = sorted(dates)
+        self._iso_dates = None
+        self._streak_state = None
+        self._period_keys = None
+        self._rollups = None
+        self._stored_rollups = None
+        self._completion_index = None
+        self._ordinals = array('i', [marked_date.toordinal() for marked_date in dates])
+        times = array('q', [_time_of_day(marked_date) for marked_date in dates])
+        self._times = times if any(times) else None
+
+    def set_iso_dates(self, iso_dates: list[str]):
+        """
+        Sets the completions from ISO format strings, without parsing them yet.
+        The strings are only parsed once the completions are first used.
+
+        Args:
+            iso_dates (list[str]): The completion dates in ISO format.
+        """
+        self._iso_dates = iso_dates
+        self._ordinals = None
+        self._times = None
+        self._streak_state = None
+        self._period_keys = None
+        self._rollups = None
+        self._stored_rollups = None
+        self._completion_index = None
+
+    def set_packed_dates(self, ordinals: array, microseconds: array):
+        """
+        Sets the completions from packed arrays, without creating a datetime per completion.
+
+        Args:
+            ordinals (array): Day ordinals (as returned by date.toordinal) of the completions.
+            microseconds (array): Microseconds since midnight of the completions.
+        """
+        self._iso_dates = None
+        self._streak_state = None
+        self._period_keys = None
+        self._rollups = None
+        self._stored_rollups = None
+        self._completion_index = None
+        if any(ordinals[i] > ordinals[i + 1] for i in range(len(ordinals) - 1)):
+            pairs = sorted(zip(ordinals, microseconds))
+            ordinals = array('i', [ordinal for ordinal, _ in pairs])
+            microseconds = array('q', [microsecond for _, microsecond in pairs])
+        self._ordinals = array('i', ordinals)
+        self._times = array('q', microseconds) if any(microseconds) else None
+
+    def get_packed_dates(self):
+        """
+        Returns the completions as packed arrays, in chronological order.
+
+        Returns:
+            tuple[array, array]: Day ordinals and microseconds since midnight of the completions.
+        """
+        ordinals = self._get_ordinals()
+        if self._times is None:
+            return ordinals, array('q', bytes(8 * len(ordinals)))
+        return ordinals, self._times
+
+    def _get_ordinals(self):
+        """
+        Returns the sorted day ordinals of the completions, parsing pending ISO format strings first.
+
+        Returns:
+            array: The day ordinals.
+        """
+        if self._ordinals is None:
+            # Parsing does not change the completions, so keep the streak state and rollups
+            streak_state, rollups, stored_rollups = self._streak_state, self._rollups, self._stored_rollups
+            self.marked_dates = [datetime.fromisoformat(iso_date) for iso_date in self._iso_dates]
+            self._streak_state, self._rollups, self._stored_rollups = streak_state, rollups, stored_rollups
+        return self._ordinals
+
+    def _iter_dates(self):
+        """
+        Builds the datetimes of all completions, in chronological order.
+
+        Yields:
+            datetime: The date and time of each completion.
+        """
+        ordinals = self._get_ordinals()
+        if self._times is None:
+            for ordinal in ordinals:
+                yield datetime.fromordinal(ordinal)
+        else:
+            # Positional timedelta arguments are noticeably faster than keywords here
+            for ordinal, time_of_day in zip(ordinals, self._times):
+                yield _ORDINAL_EPOCH + timedelta(ordinal - 1, 0, time_of_day)
+
+    def _date_at(self, index: int):
+        """
+        Builds the datetime of a single completion.
+
+        Args:
+            index (int): The position of the completion, in chronological order.
+
+        Returns:
+            datetime: The date and time of the completion.
+        """
+        ordinal = self._get_ordinals()[index]
+        if self._times is None:
+            return datetime.fromordinal(ordinal)
+        return _ORDINAL_EPOCH + timedelta(ordinal - 1, 0, self._times[index])
+
+    def _add_date(self, marked_date: datetime):
+        """
+        Inserts a completion at its chronological position.
+
+        Args:
+            marked_date (datetime): The date and time of the completion.
+        """
+        ordinals = self._get_ordinals()
+        ordinal = marked_date.toordinal()
+        time_of_day = _time_of_day(marked_date)
+        if self._rollups is not None or self._stored_rollups is not None:
+            self._advance_rollups(ordinal)
+        self._completion_index = None
+        if self._period_keys is not None:
+            # Keep the cached period keys up to date
+            period, keys = self._period_keys
+            key = period.key(ordinal)
+            index = bisect_left(keys, key)
+            if index == len(keys) or keys[index] != key:
+                keys.insert(index, key)
+        if self._times is None and time_of_day:
+            self._times = array('q', bytes(8 * len(ordinals)))
+
+        if self._times is None:
+            ordinals.insert(bisect_right(ordinals, ordinal), ordinal)
+            return
+
+        # Find the position after all completions on earlier days or earlier on the same day
+        index = bisect_right(ordinals, ordinal)
+        while index > 0 and ordinals[index - 1] == ordinal and self._times[index - 1] > time_of_day:
+            index -= 1
+        ordinals.insert(index, ordinal)
+        self._times.insert(index, time_of_day)
+
+    def _remove_dates(self, index):
+        """
+        Removes one completion, or a slice of completions.
+
+        Args:
+            index (int | slice): The position of the completions, in chronological order.
+        """
+        ordinals = self._get_ordinals()
+        del ordinals[index]
+        if self._times is not None:
+            del self._times[index]
+        self._streak_state = None
+        self._period_keys = None
+        self._rollups = None
+        self._stored_rollups = None
+        self._completion_index = None
+
+    def count_completions(self):
+        """
+        Returns the number of completions without parsing completions that are still ISO format strings.
+
+        Returns:
+            int: The number of completions.
+        """
+        return len(self._iso_dates) if self._ordinals is None else len(self._ordinals)
+
+    def has_completion_between(self, first_ordinal: int, last_ordinal: int):
+        """
+        Checks if the habit was completed on any day in a range, in O(log n).
+
+        Args:
+            first_ordinal (int): Day ordinal of the first day of the range.
+            last_ordinal (int): Day ordinal of the last day of the range.
 
-    def mark_complete(self):
+        Returns:
+            bool: True if there is a completion in the range, False otherwise.
+        """
+        ordinals = self._get_ordinals()
+        index = bisect_left(ordinals, first_ordinal)
+        return index < len(ordinals) and ordinals[index] <= last_ordinal
+
+    def mark_complete(self, current_date: datetime = None):
         """
         Marks the habit as complete for the current date. If the current date is not already in the marked_dates list, it adds it.
+
+        Args:
+            current_date (datetime, optional): The date and time of the completion. Defaults to now.
+
+        Returns:
+            bool: True if the current date was added, False if it was already marked as complete.
         """
-        current_date = datetime.today()  # Get the current date and time
+        if current_date is None:
+            current_date = datetime.today()  # Get the current date and time
         # Check if the current date is not already marked as complete
-        if current_date.date() not in [date.date() for date in self.marked_dates]:
-            self.marked_dates.append(current_date)  # Add the current date to marked_dates
+        ordinal = current_date.toordinal()
+        if not self.has_completion_between(ordinal, ordinal):
+            streak_state = self._get_streak_state()
+            self._add_date(current_date)  # Add the current date to marked_dates
+            self._advance_streak(streak_state, ordinal)
+            return True
+        return False
+
+    def mark_complete_many(self, dates):
+        """
+        Marks the habit as complete on many dates at once, skipping days that are already marked.
+
+        Args:
+            dates (Iterable[datetime]): The dates and times of the completions, in any order.
+
+        Returns:
+            int: The number of completions added.
+        """
+        dates = list(dates)
+        return self.add_packed_dates(array('i', [marked_date.toordinal() for marked_date in dates]),
+                                     array('q', [_time_of_day(marked_date) for marked_date in dates]))
+
+    def add_packed_dates(self, ordinals: array, microseconds: array = None):
+        """
+        Adds many completions at once from packed arrays, skipping days that are already marked.
+        Duplicates are found with a set of the completed days, and the completions are merged in one go.
+
+        Args:
+            ordinals (array): Day ordinals (as returned by date.toordinal) of the completions, in any order.
+            microseconds (array, optional): Microseconds since midnight of the completions. Defaults to all at midnight.
+
+        Returns:
+            int: The number of completions added.
+        """
+        existing_ordinals = self._get_ordinals()
+        completed_days = set(existing_ordinals)
+        if microseconds is None or not any(microseconds):
+            # Only the days matter, so the set operations do all the work
+            new_ordinals = array('i', sorted(set(ordinals) - completed_days))
+            new_times = array('q', bytes(8 * len(new_ordinals)))
+        else:
+            new_completions = []
+            for ordinal, time_of_day in zip(ordinals, microseconds):
+                if ordinal not in completed_days:
+                    completed_days.add(ordinal)
+                    new_completions.append((ordinal, time_of_day))
+            new_completions.sort()
+            new_ordinals = array('i', [ordinal for ordinal, _ in new_completions])
+            new_times = array('q', [time_of_day for _, time_of_day in new_completions])
+        if not new_ordinals:
+            return 0
+
+        if existing_ordinals and new_ordinals[0] < existing_ordinals[-1]:
+            # The new completions are interleaved with the existing ones, so merge and count the streaks again
+            old_ordinals, old_times = self.get_packed_dates()
+            self.set_packed_dates(old_ordinals + new_ordinals, old_times + new_times)
+            return len(new_ordinals)
+
+        # All new completions come after the existing ones, so append them and extend the streaks
+        streak_state = self._get_streak_state()
+        if self._times is None and any(new_times):
+            self._times = array('q', bytes(8 * len(existing_ordinals)))
+        existing_ordinals.extend(new_ordinals)
+        if self._times is not None:
+            self._times.extend(new_times)
+        self._period_keys = None
+        self._rollups = None  # Rebuilt on first use
+        self._stored_rollups = None
+        self._completion_index = None
+        for ordinal in new_ordinals:
+            self._advance_streak(streak_state, ordinal)
+            streak_state = self._streak_state
+        return len(new_ordinals)
+
+    def _advance_streak(self, streak_state: tuple, ordinal: int):
+        """
+        Updates the streaks in O(1) for a completion added on the given day.
+
+        Args:
+            streak_state (tuple): The streak state from before the completion was added.
+            ordinal (int): Day ordinal of the added completion.
+        """
+        period, first_key, last_key, streak = streak_state
+        if period is None:
+            return  # Unsupported frequency
+        key = period.key(ordinal)
+        if key < first_key or key == last_key:
+            # Completed before the habit was created, or the period was already completed
+            return
+        if last_key is not None and key < last_key:
+            # A completion in an earlier period can join or split runs, so count them again
+            self._count_streaks()
+            return
+
+        if last_key is not None and key == last_key + 1:
+            streak += 1  # Extend the streak
+        else:
+            streak = 1  # A period was skipped, so a new streak starts
+        self._streak_state = (period, first_key, key, streak)
+        self.current_streak = streak
+        self.longest_streak = max(self.longest_streak, streak)
+
+    def _count_streaks(self):
+        """
+        Counts the streak state again from all completions.
+
+        Returns:
+            tuple: The new streak state.
+        """
+        period = self.get_period()
+        first_key = period.key(self.created.toordinal()) if period is not None else None
+        keys = self.period_keys()
+        if keys and keys[-1] >= first_key:
+            last_key = keys[-1]
+            streak, self.longest_streak = compute_streaks(keys, last_key, first_key)
+        else:
+            last_key = None
+            streak, self.longest_streak = 0, 0
+        self._streak_state = (period, first_key, last_key, streak)
+        return self._streak_state
+
+    def _get_streak_state(self):
+        """
+        Returns the streak state, counting it again if it is unknown or the frequency or creation date changed.
+
+        Returns:
+            tuple: (period, key of the creation period, key of the last completed period, streak ending in that period).
+        """
+        streak_state = self._streak_state
+        period = self.get_period()
+        if streak_state is None or streak_state[0] != period \
+                or (period is not None and streak_state[1] != period.key(self.created.toordinal())):
+            streak_state = self._count_streaks()
+        return streak_state
+
+    def get_current_streak(self, current_date: datetime = None):
+        """
+        Returns the current streak from the maintained streak state, without going through the completions.
+
+        The streak is broken when the last completed period is not the current one; as in analytics.get_streaks,
+        the current streak only counts once the habit is completed in the current period.
+
+        Args:
+            current_date (datetime, optional): The moment to count from. Defaults to now.
+
+        Returns:
+            int: The current streak, in periods.
+        """
+        if current_date is None:
+            current_date = datetime.today()
+        period, first_key, last_key, streak = self._get_streak_state()
+        if period is None or last_key is None:
+            return 0
+        current_key = period.key(current_date.toordinal())
+        if last_key < current_key:
+            return 0
+        if last_key > current_key:
+            # There are completions after current_date, so count the streak ending in the current period
+            streak = compute_streaks(self.period_keys(), current_key, first_key)[0]
+        return min(streak, period.count_reachable_periods(self.created, current_date))
+
+    def get_period(self):
+        """
+        Returns the period strategy of the habit frequency.
+
+        Returns:
+            Period: The period strategy, or None if the frequency is not supported.
+        """
+        return get_period(self.frequency, self.created)
 
     def is_completed_in_this_period(self, current_date):
         """
@@ -36,21 +507,81 @@ class Habit:
         Returns:
             bool: True if the habit is completed in the current period, False otherwise.
         """
-        if self.frequency == "DAILY":
-            # Check if the habit is marked complete for the current day
-            if current_date.date() in [date.date() for date in self.marked_dates]:
-                return True
-            
-        elif self.frequency == "WEEKLY":
-            # Get the current calendar week
-            current_calendar_week = current_date.isocalendar()[1]
-            # Check if the habit is marked complete for the current week
-            if len(self.marked_dates) > 0:  # Ensure there are marked dates
-                for i in range(len(self.marked_dates)-1, -1, -1):
-                    last_completed_week = self.marked_dates[i].isocalendar()[1]
-                    if current_calendar_week == last_completed_week:
-                        return True
-        return False
+        period = self.get_period()
+        if period is None:
+            return False
+        # Check if the habit is marked complete on any day of the current day, ISO week, month or N days
+        first_ordinal, last_ordinal = period.day_range(period.key(current_date.toordinal()))
+        return self.has_completion_between(first_ordinal, last_ordinal)
+
+    def period_keys(self):
+        """
+        Returns the integer keys of all periods in which the habit was completed.
+        The keys are computed once and cached until the completions, frequency or creation date change.
+
+        Returns:
+            array: The sorted, distinct completed period keys, empty if the frequency is not supported.
+        """
+        period = self.get_period()
+        if period is None:
+            return array('i')
+        if self._period_keys is None or self._period_keys[0] != period:
+            self._period_keys = (period, period.keys(self._get_ordinals()))
+        return self._period_keys[1]
+
+    def get_rollups(self):
+        """
+        Returns the completion counts of the habit by ISO week, month and year. They are restored from the
+        habit file or built from the completions on first use, and kept up to date by mark_complete.
+
+        Returns:
+            Rollups: The rollups.
+        """
+        period = self.get_period()
+        rollups = self._rollups
+        if rollups is None or rollups.period != period:
+            rollups = None
+            stored_rollups = self._stored_rollups
+            if stored_rollups is not None and stored_rollups[0] == period:
+                try:
+                    rollups = Rollups.from_dict(period, stored_rollups[1])
+                except (KeyError, ValueError, TypeError, AttributeError):  # Damaged rollups are built again
+                    pass
+            if rollups is None:
+                rollups = Rollups.build(period, self.period_keys())
+            self._rollups = rollups
+            self._stored_rollups = None
+        return rollups
+
+    def get_completion_index(self):
+        """
+        Returns the index that answers date range queries about the completions in O(log n).
+        It is built on first use and kept until the completions, frequency or creation date change.
+
+        Returns:
+            CompletionIndex: The index.
+        """
+        period = self.get_period()
+        index = self._completion_index
+        if index is None or index.period != period or index.created != self.created:
+            index = CompletionIndex(period, self.created, self._get_ordinals(), self.period_keys())
+            self._completion_index = index
+        return index
+
+    def _advance_rollups(self, ordinal: int):
+        """
+        Counts a completion on the given day in the rollups, if its period was not completed yet.
+        Must be called before the completion is added.
+
+        Args:
+            ordinal (int): Day ordinal of the completion.
+        """
+        rollups = self.get_rollups()
+        period = rollups.period
+        if period is not None:
+            first_ordinal, last_ordinal = period.day_range(period.key(ordinal))
+            if not self.has_completion_between(first_ordinal, last_ordinal):
+                rollups.add_period(first_ordinal)
 
     def print_out(self):
         """
@@ -68,12 +599,25 @@ class Habit:
         Returns:
             dict: A dictionary representation of the habit.
         """
+        _, _, last_key, streak = self._get_streak_state()
+        marked_dates = (self._iso_dates[:] if self._iso_dates is not None  # Strings not parsed yet are passed through
+                        else [date.isoformat() for date in self.marked_dates])  # Convert list of datetimes to strings
+        if self._rollups is None and self._stored_rollups is not None:
+            rollups = self._stored_rollups[1]  # Unchanged since they were loaded
+        else:
+            # The number of completions and the last one tell if the completions were edited without the rollups
+            rollups = {'completions': len(marked_dates), 'last_date': marked_dates[-1] if marked_dates else None}
+            rollups.update(self.get_rollups().to_dict())
         return {
             'name': self.name,
             'description': self.description,
             'frequency': self.frequency,
             'created': self.created.isoformat(),  # Convert datetime to string
-            'marked_dates': [date.isoformat() for date in self.marked_dates]  # Convert list of datetimes to strings
+            'marked_dates': marked_dates,
+            'current_streak': streak,  # Streak ending in the last completed period
+            'longest_streak': self.longest_streak,
+            'last_period_key': last_key,
+            'rollups': rollups  # Completion counts by week, month and year
         }
 
     @classmethod
@@ -89,5 +633,27 @@ class Habit:
         """
         habit = cls(data['name'], data['description'], data['frequency'])
         habit.created = datetime.fromisoformat(data['created'])  # Convert string to datetime
-        habit.marked_dates = [datetime.fromisoformat(date) for date in data['marked_dates']]  # Convert list of strings to datetimes
+        habit.set_iso_dates(data['marked_dates'])  # The strings are converted on first use
+        rollups = data.get('rollups')
+        marked_dates = data['marked_dates']
+        # The number of completions and the last one, stored with the rollups, tell if the completions were
+        # edited since the streaks and rollups were written; if so, both are counted again on first use
+        if not (isinstance(rollups, dict) and rollups.get('completions') == len(marked_dates)
+                and rollups.get('last_date') == (marked_dates[-1] if marked_dates else None)):
+            return habit
+
+        if 'last_period_key' in data:
+            # Restore the stored streaks
+            habit.current_streak = data.get('current_streak', 0)
+            habit.longest_streak = data.get('longest_streak', 0)
+            period = habit.get_period()
+            if period is not None:
+                habit._streak_state = (period, period.key(habit.created.toordinal()),
+                                       data['last_period_key'], habit.current_streak)
+        habit._stored_rollups = (habit.get_period(), rollups)  # Parsed on first use
         return habit
+
+
+# Called once per habit, so only timed while instrumentation is enabled
+instrumentation.instrument_method(Habit, 'from_dict', "Habit.from_dict")
+instrumentation.instrument_method(Habit, 'to_dict', "Habit.to_dict")
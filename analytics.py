@@ -1,8 +1,17 @@
 from Habit import Habit
-from datetime import datetime, timedelta
-from storage import load_habits, save_habits
+from datetime import datetime
+import heapq
+import os
+from instrumentation import instrumented
+from storage import iter_habits
+from repository import HabitRepository
+from rollups import bucket_day_range, bucket_key, format_bucket, parse_bucket
+from streaks import compute_streaks
 
+VERIFY_STREAKS = False  # Check the maintained streaks against a full recomputation in count_streak_periods
 
+
+@instrumented("analytics.filter_habits_unchecked")
 def filter_habits_unchecked(habits: list[Habit]):
     """
     Filters out habits that have not been completed in the current period.
@@ -22,6 +31,7 @@ def filter_habits_unchecked(habits: list[Habit]):
     return habit_indices
 
 
+@instrumented("analytics.filter_habits_per_period")
 def filter_habits_per_period(habits: list[Habit], period: str):
     """
     Filters habits based on their frequency (e.g., DAILY or WEEKLY).
@@ -41,38 +51,135 @@ def filter_habits_per_period(habits: list[Habit], period: str):
     return habit_indices
 
 
-def count_streak_periods(habit: Habit):
+@instrumented("analytics.classify_habits")
+def classify_habits(habits: list[Habit], current_date: datetime = None):
+    """
+    Finds the unchecked habits and groups the habits by frequency in a single pass,
+    giving the same indices as filter_habits_unchecked and filter_habits_per_period.
+
+    Args:
+        habits (list[Habit]): List of Habit objects.
+        current_date (datetime, optional): The date to check the current period against. Defaults to now.
+
+    Returns:
+        tuple[list, dict]: Indices of the habits not completed in the current period, and indices of the habits
+        of each frequency, by frequency. DAILY, WEEKLY and MONTHLY are always present.
+    """
+    if current_date is None:
+        current_date = datetime.today()
+
+    unchecked_indices = []
+    frequency_indices = {"DAILY": [], "WEEKLY": [], "MONTHLY": []}
+    for i, habit in enumerate(habits):
+        if not habit.is_completed_in_this_period(current_date):
+            unchecked_indices.append(i)
+        indices = frequency_indices.get(habit.frequency)
+        if indices is None:
+            indices = frequency_indices[habit.frequency] = []
+        indices.append(i)
+
+    return unchecked_indices, frequency_indices
+
+
+@instrumented("analytics.get_streaks")
+def get_streaks(habit: Habit, current_date: datetime = None):
+    """
+    Computes the current and the all-time longest streak of a habit in one pass over its completed periods.
+
+    Periods before the habit was created do not count. The current streak only counts periods that a
+    period-by-period walk back from current_date would reach before passing the creation date.
+
+    Args:
+        habit (Habit): The Habit object to compute streaks for.
+        current_date (datetime, optional): The moment to count from. Defaults to now.
+
+    Returns:
+        tuple[int, int]: The current streak and the longest streak, in periods.
+    """
+    if current_date is None:
+        current_date = datetime.today()
+
+    period = habit.get_period()
+    completed_keys = habit.period_keys()
+    if period is None or not completed_keys:
+        return 0, 0
+
+    current_streak, longest_streak = compute_streaks(
+        completed_keys, period.key(current_date.toordinal()), period.key(habit.created.toordinal()))
+
+    return min(current_streak, period.count_reachable_periods(habit.created, current_date)), longest_streak
+
+
+@instrumented("analytics.count_streak_periods")
+def count_streak_periods(habit: Habit, current_date: datetime = None, verify: bool = None):
     """
     Counts the total successful streak periods for a given habit, starting from today and going backwards.
+    Also stores the current and the all-time longest streak on the habit.
+
+    The streaks are read from the state the habit keeps up to date as it is marked complete. In verification
+    mode they are also recomputed from all completions, and both results must agree. The longest streak is
+    recomputed over every completion, as the maintained one also counts completions after current_date.
 
     Args:
         habit (Habit): The Habit object to count streaks for.
+        current_date (datetime, optional): The moment to count from. Defaults to now.
+        verify (bool, optional): Whether to check against a full recomputation. Defaults to VERIFY_STREAKS.
 
     Returns:
         int: The count of streak periods.
+
+    Raises:
+        ValueError: If verifying and the maintained streaks differ from the recomputed ones.
     """
-    streak_count = 0
+    if current_date is None:
+        current_date = datetime.today()
+    if verify is None:
+        verify = VERIFY_STREAKS
+
+    streak_count = habit.get_current_streak(current_date)
+    longest_streak = habit.longest_streak
+
+    if verify:
+        period = habit.get_period()
+        completed_keys = habit.period_keys()
+        expected_longest_streak = 0
+        if period is not None and completed_keys:
+            _, expected_longest_streak = compute_streaks(
+                completed_keys, max(completed_keys), period.key(habit.created.toordinal()))
+        expected = (get_streaks(habit, current_date)[0], expected_longest_streak)
+        if (streak_count, longest_streak) != expected:
+            raise ValueError(f"Streaks of habit '{habit.name}' are {(streak_count, longest_streak)}, "
+                             f"but recomputing them gives {expected}")
+
+    habit.current_streak = streak_count
 
-    if len(habit.marked_dates) == 0:
-        return 0
-    
-    current_date = datetime.today()
-    while current_date >= habit.created:
-        days_offset = 1
+    return streak_count
 
-        if habit.frequency == "WEEKLY":
-            days_offset = 7
+_repositories = {}  # Open habit repositories by absolute habit file path
 
-        if habit.is_completed_in_this_period(current_date):
-            streak_count += 1
-        else:
-            break
 
-        current_date -= timedelta(days=days_offset)
+def get_repository(habit_file: str):
+    """
+    Returns the in-memory repository of a habit file, creating it on first use.
 
-    habit.longest_streak = streak_count
+    Args:
+        habit_file (str): The path to the habit file.
+
+    Returns:
+        HabitRepository: The repository holding the habits of the file.
+    """
+    path = os.path.abspath(habit_file)
+    if path not in _repositories:
+        _repositories[path] = HabitRepository(habit_file)
+    return _repositories[path]
+
+
+def clear_repositories():
+    """
+    Forgets the open habit repositories, so the next use of each habit file loads it again.
+    """
+    _repositories.clear()
 
-    return streak_count
 
 def is_habit_on_the_list(habit_name: str, habit_file: str):
     """
@@ -85,17 +192,28 @@ def is_habit_on_the_list(habit_name: str, habit_file: str):
     Returns:
         bool: True if the habit exists, False otherwise.
     """
-    habits = load_habits(habit_file)
-    for habit in habits:
-        if habit.name == habit_name:
-            return True
-    
-    return False
+    return habit_name in get_repository(habit_file)
+
+
+def search(query: str, habit_file: str, limit: int = None):
+    """
+    Finds the habits whose name starts with the query, or with words starting with each word of the query.
+
+    Args:
+        query (str): The search text. Case is ignored.
+        habit_file (str): The path to the habit file.
+        limit (int, optional): The maximum number of results. Defaults to all of them.
+
+    Returns:
+        list: Indices of the matching habits in the list returned by get_habit_list.
+    """
+    return get_repository(habit_file).search(query, limit)
 
 
 def get_habit_list(habit_file: str):
     """
     Retrieves the list of habits from the specified habit file.
+    The file is only parsed again if it changed since it was last read.
 
     Args:
         habit_file (str): The path to the habit file.
@@ -103,64 +221,305 @@ def get_habit_list(habit_file: str):
     Returns:
         list: The list of Habit objects.
     """
-    habits = load_habits(habit_file)
-    return habits
+    return get_repository(habit_file).list()
+
+def iter_habit_list(habit_file: str):
+    """
+    Streams the habits of the specified habit file one at a time, without loading the whole file.
+    The filter functions accept the result in place of a list.
+
+    Args:
+        habit_file (str): The path to the habit file.
+
+    Returns:
+        Iterator[Habit]: The Habit objects in file order.
+    """
+    return iter_habits(habit_file)
 
 def save_habit_list(habits: list[Habit], habit_file: str):
     """
-    Saves the list of habits to the specified habit file.
+    Saves the list of habits to the specified habit file. Completions and habits saved by other
+    processes since the list was loaded are merged into it rather than overwritten.
 
     Args:
         habits (list[Habit]): The list of Habit objects to save.
         habit_file (str): The path to the habit file.
     """
-    save_habits(habits, habit_file)
+    get_repository(habit_file).save(habits)
+
+
+def mark_habit_complete(habit: Habit, habit_file: str):
+    """
+    Marks a habit as complete and saves the completion, writing as little as the storage backend allows.
+
+    Args:
+        habit (Habit): The habit to mark as complete.
+        habit_file (str): The path to the habit file.
+
+    Returns:
+        bool: True if a new completion was saved, False if the period was already marked.
+    """
+    return get_repository(habit_file).mark_complete(habit)
 
 
-def get_best_performing_tasks(habits: list[Habit]):
+def add_habit_to_list(habit: Habit, habit_file: str):
+    """
+    Adds a new habit to the habit file.
+
+    Args:
+        habit (Habit): The new habit.
+        habit_file (str): The path to the habit file.
+    """
+    get_repository(habit_file).add(habit)
+
+
+def remove_habit_from_list(habit: Habit, habit_file: str):
+    """
+    Removes a habit from the habit file.
+
+    Args:
+        habit (Habit): The habit to delete.
+        habit_file (str): The path to the habit file.
+    """
+    get_repository(habit_file).remove(habit)
+
+
+def get_best_performing_tasks(habits: list[Habit], k: int = None):
     """
     Retrieves the best-performing habits based on streak counts.
 
     Args:
         habits (list[Habit]): List of Habit objects.
+        k (int, optional): Number of habits to return. Defaults to all habits.
 
     Returns:
         list: Sorted list of Habit objects in descending order of streak counts.
     """
-    return get_top_performing_tasks(habits, True)
+    return get_top_performing_tasks(habits, True, k)
 
 
-def get_most_struggled_tasks(habits: list[Habit]):
+def get_most_struggled_tasks(habits: list[Habit], k: int = None):
     """
     Retrieves the most struggled habits based on streak counts.
 
     Args:
         habits (list[Habit]): List of Habit objects.
+        k (int, optional): Number of habits to return. Defaults to all habits.
 
     Returns:
         list: Sorted list of Habit objects in ascending order of streak counts.
     """
-    return get_top_performing_tasks(habits, False)
+    return get_top_performing_tasks(habits, False, k)
 
 
-def get_top_performing_tasks(habits: list[Habit], reverse: bool = True):
+@instrumented("analytics.get_top_performing_tasks")
+def get_top_performing_tasks(habits: list[Habit], reverse: bool = True, k: int = None):
     """
     Retrieves the top-performing habits based on streak counts, sorted by the streak counts.
+    Habits with the same streak count keep their order in the list.
 
     Args:
         habits (list[Habit]): List of Habit objects.
         reverse (bool): If True, sort in descending order; if False, sort in ascending order.
+        k (int, optional): Number of habits to return. Defaults to all habits.
 
     Returns:
         list: Sorted list of Habit objects based on streak counts.
     """
-    # Create a list of habits with their corresponding streak counts
-    habits_with_streaks = [(habit, count_streak_periods(habit)) for habit in habits]
-    
-    # Sort the list by streak count
-    habits_with_streaks.sort(key=lambda x: x[1], reverse=reverse)
-    
-    # Extract the sorted habits
-    sorted_habits = [habit for habit, streak in habits_with_streaks]
-    
-    return sorted_habits
+    best_habits, worst_habits = rank_habits(habits, k, best=reverse, worst=not reverse)
+    return best_habits if reverse else worst_habits
+
+
+@instrumented("analytics.rank_habits")
+def rank_habits(habits: list[Habit], k: int = None, tie_break_by_name: bool = False,
+                best: bool = True, worst: bool = True, current_date: datetime = None, habits_stats: list = None):
+    """
+    Ranks habits by their current streak, computing each streak only once, and returns
+    both ends of the ranking. Selecting k habits out of n takes O(n log k).
+
+    Args:
+        habits (list[Habit]): List of Habit objects.
+        k (int, optional): Number of habits at each end of the ranking. Defaults to all habits.
+        tie_break_by_name (bool): If True, habits with the same streak are ordered by name;
+            if False, they keep their order in the list.
+        best (bool): Whether to compute the best-performing habits.
+        worst (bool): Whether to compute the most struggled habits.
+        current_date (datetime, optional): The moment to rank the streaks at. Defaults to now.
+        habits_stats (list[HabitStats], optional): The stats of the habits at current_date, if compute_habit_stats
+            already computed them. Defaults to computing them.
+
+    Returns:
+        tuple[list, list]: The best-performing habits in descending order of streak counts and
+        the most struggled habits in ascending order (empty lists for ends that were not requested).
+    """
+    habits = list(habits)
+    if k is None:
+        k = len(habits)
+
+    if habits_stats is None:
+        # Imported here so that loading this module does not load NumPy
+        from batch_analytics import compute_habit_stats
+
+        # Compute the streaks of all habits in one batch
+        habits_stats = compute_habit_stats(habits, current_date)
+    # Store the streaks on the habits
+    for habit, habit_stats in zip(habits, habits_stats):
+        habit.current_streak = habit_stats.current_streak
+        habit.longest_streak = habit_stats.longest_streak
+
+    # Rank by streak, then by name or by position in the list
+    ranked = [(habit.current_streak, habit.name if tie_break_by_name else i, habit) for i, habit in enumerate(habits)]
+
+    best_habits = []
+    worst_habits = []
+    if best:
+        best_habits = [habit for _, _, habit in heapq.nsmallest(k, ranked, key=lambda item: (-item[0], item[1]))]
+    if worst:
+        worst_habits = [habit for _, _, habit in heapq.nsmallest(k, ranked, key=lambda item: (item[0], item[1]))]
+    return best_habits, worst_habits
+
+
+@instrumented("analytics.get_completion_counts")
+def get_completion_counts(habit: Habit, granularity: str = "MONTH"):
+    """
+    Returns how many periods of a habit were completed in each ISO week, month or year,
+    read from the habit's rollups in O(number of buckets).
+
+    Args:
+        habit (Habit): The habit.
+        granularity (str): 'WEEK', 'MONTH' or 'YEAR'.
+
+    Returns:
+        dict[str, int]: Completed periods by bucket label, e.g. {'2024-05': 28, '2024-06': 30}, in chronological order.
+    """
+    counts = habit.get_rollups().counts(granularity)
+    return {format_bucket(granularity, key): counts[key] for key in sorted(counts)}
+
+
+@instrumented("analytics.get_completion_rate")
+def get_completion_rate(habit: Habit, granularity: str = "MONTH", current_date: datetime = None, bucket: str = None):
+    """
+    Returns the share of a habit's periods that were completed in an ISO week, month or year, in O(1)
+    from the rollups. Only periods that start in the bucket, from the creation period up to current_date, are due;
+    all completions in the bucket count, including any after current_date.
+
+    Args:
+        habit (Habit): The habit.
+        granularity (str): 'WEEK', 'MONTH' or 'YEAR'.
+        current_date (datetime, optional): The moment to compute the rate at. Defaults to now.
+        bucket (str, optional): The label of the week, month or year, e.g. '2024-06'. Defaults to the one of current_date.
+
+    Returns:
+        float: The completion rate between 0 and 1, or 0 if no period was due in the bucket.
+    """
+    if current_date is None:
+        current_date = datetime.today()
+    rollups = habit.get_rollups()
+    period = rollups.period
+    if period is None:
+        return 0.0
+    key = parse_bucket(granularity, bucket) if bucket is not None else bucket_key(granularity, current_date.toordinal())
+
+    first_ordinal, last_ordinal = bucket_day_range(granularity, key)
+    first_ordinal = max(first_ordinal, period.day_range(period.key(habit.created.toordinal()))[0])
+    last_ordinal = min(last_ordinal, current_date.toordinal())
+    if first_ordinal > last_ordinal:
+        return 0.0
+    # Periods starting in the range: one per key change, plus the first period if it starts on the first day
+    due_periods = period.key(last_ordinal) - period.key(first_ordinal)
+    if period.day_range(period.key(first_ordinal))[0] == first_ordinal:
+        due_periods += 1
+    if due_periods == 0:
+        return 0.0
+    return min(1.0, rollups.counts(granularity).get(key, 0) / due_periods)
+
+
+@instrumented("analytics.get_monthly_table")
+def get_monthly_table(habits: list[Habit], year: int = None, current_date: datetime = None):
+    """
+    Builds a table of completed periods per month of a year for each habit, from the rollups.
+
+    Args:
+        habits (list[Habit]): List of Habit objects.
+        year (int, optional): The year of the table. Defaults to the year of current_date.
+        current_date (datetime, optional): The moment to compute the yearly completion rates at. Defaults to now.
+
+    Returns:
+        list[dict]: One row per habit with its 'name', the 12 monthly 'counts' and the completion 'rate' of the year.
+    """
+    if current_date is None:
+        current_date = datetime.today()
+    if year is None:
+        year = current_date.year
+    table = []
+    for habit in habits:
+        months = habit.get_rollups().months
+        table.append({
+            'name': habit.name,
+            'counts': [months.get(year * 12 + month, 0) for month in range(12)],
+            'rate': get_completion_rate(habit, "YEAR", current_date, str(year)),
+        })
+    return table
+
+
+@instrumented("analytics.count_completions_between")
+def count_completions_between(habit: Habit, first_date: datetime, last_date: datetime):
+    """
+    Counts the days a habit was completed from the first to the last day of a window, both included, in O(log n).
+
+    Args:
+        habit (Habit): The habit.
+        first_date (datetime): The first day of the window.
+        last_date (datetime): The last day of the window.
+
+    Returns:
+        int: The number of completed days; several completions on one day count once.
+    """
+    return habit.get_completion_index().count_days(first_date, last_date)
+
+
+@instrumented("analytics.is_completed_on")
+def is_completed_on(habit: Habit, day: datetime):
+    """
+    Checks if a habit was completed on a day, in O(log n).
+
+    Args:
+        habit (Habit): The habit.
+        day (datetime): The day to check.
+
+    Returns:
+        bool: True if the habit was completed on the day, False otherwise.
+    """
+    return habit.get_completion_index().is_completed_on(day)
+
+
+@instrumented("analytics.find_gaps")
+def find_gaps(habit: Habit, min_periods: int, first_date: datetime = None, last_date: datetime = None):
+    """
+    Finds the runs of more than min_periods missed periods between completions of a habit.
+
+    Args:
+        habit (Habit): The habit.
+        min_periods (int): Only longer gaps are returned.
+        first_date (datetime, optional): Only gaps ending on or after this day are returned.
+        last_date (datetime, optional): Only gaps starting on or before this day are returned.
+
+    Returns:
+        list[tuple[date, date]]: The first and the last day of each gap, in chronological order.
+    """
+    return habit.get_completion_index().find_gaps(min_periods, first_date, last_date)
+
+
+@instrumented("analytics.get_streak_as_of")
+def get_streak_as_of(habit: Habit, as_of: datetime):
+    """
+    Returns the current streak of a habit as it was at a past moment, in O(log n).
+
+    Args:
+        habit (Habit): The habit.
+        as_of (datetime): The moment to count the streak at.
+
+    Returns:
+        int: The streak, in periods; 0 if the period of the moment was not completed.
+    """
+    return habit.get_completion_index().get_streak(as_of)
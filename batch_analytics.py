@@ -0,0 +1,165 @@
+from array import array
+from collections import namedtuple
+from datetime import datetime
+from Habit import Habit
+import instrumentation
+from instrumentation import instrumented
+from streaks import compute_streaks
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional, the pure Python path gives the same results
+    np = None
+
+# Completed periods of many habits packed into flat arrays. The sorted, distinct period keys of habit i are
+# keys[offsets[i]:offsets[i + 1]]. Habits with an unsupported frequency have no keys and a current key of -1.
+PackedHabits = namedtuple('PackedHabits', ['keys', 'offsets', 'first_keys', 'current_keys', 'reachable_periods'])
+
+# Analytics of a single habit as of the current date
+HabitStats = namedtuple('HabitStats', ['completed', 'current_streak', 'longest_streak', 'completion_rate'])
+
+
+def pack_habits(habits: list[Habit], current_date: datetime = None):
+    """
+    Packs the cached period keys of all habits into one flat array with an offsets array,
+    along with the per-habit period parameters the analytics need.
+
+    Args:
+        habits (list[Habit]): List of Habit objects.
+        current_date (datetime, optional): The moment to compute the analytics for. Defaults to now.
+
+    Returns:
+        PackedHabits: The packed period keys and period parameters.
+    """
+    if current_date is None:
+        current_date = datetime.today()
+
+    keys = array('i')
+    offsets = array('q', [0])
+    first_keys = array('q')
+    current_keys = array('q')
+    reachable_periods = array('q')
+    current_ordinal = current_date.toordinal()
+
+    for habit in habits:
+        period = habit.get_period()
+        if period is None:
+            offsets.append(len(keys))
+            first_keys.append(0)
+            current_keys.append(-1)
+            reachable_periods.append(0)
+            continue
+
+        keys.extend(habit.period_keys())
+        offsets.append(len(keys))
+        first_keys.append(period.key(habit.created.toordinal()))
+        current_keys.append(period.key(current_ordinal))
+        reachable_periods.append(period.count_reachable_periods(habit.created, current_date))
+
+    return PackedHabits(keys, offsets, first_keys, current_keys, reachable_periods)
+
+
+@instrumented("batch_analytics.compute_habit_stats")
+def compute_habit_stats(habits: list[Habit], current_date: datetime = None, use_numpy: bool = None):
+    """
+    Computes, for all habits at once, whether they are completed in the current period,
+    their current and longest streaks and their completion rates since creation.
+
+    The current and longest streaks are the same as those of analytics.get_streaks, and the completion rate is
+    the share of periods since the habit was created (up to the current one) in which it was completed.
+
+    Args:
+        habits (list[Habit]): List of Habit objects.
+        current_date (datetime, optional): The moment to compute the analytics for. Defaults to now.
+        use_numpy (bool, optional): Whether to use NumPy. Defaults to using it when it is installed.
+
+    Returns:
+        list[HabitStats]: The analytics of each habit, in the order of the habits.
+    """
+    packed = pack_habits(habits, current_date)
+    instrumentation.record("batch_analytics.compute_habit_stats", habits=len(habits))
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy:
+        return _compute_stats_numpy(packed)
+    return _compute_stats_python(packed)
+
+
+def _compute_stats_python(packed: PackedHabits):
+    """
+    Computes the habit analytics from packed period keys with a loop per habit.
+
+    Args:
+        packed (PackedHabits): The packed period keys and period parameters.
+
+    Returns:
+        list[HabitStats]: The analytics of each habit.
+    """
+    stats = []
+    for i in range(len(packed.offsets) - 1):
+        current_key = packed.current_keys[i]
+        first_key = packed.first_keys[i]
+        keys = packed.keys[packed.offsets[i]:packed.offsets[i + 1]]
+
+        current_streak, longest_streak = compute_streaks(keys, current_key, first_key)
+        counted_periods = sum(1 for key in keys if first_key <= key <= current_key)
+        periods = current_key - first_key + 1
+        stats.append(HabitStats(
+            current_key in keys,
+            min(current_streak, packed.reachable_periods[i]),
+            longest_streak,
+            counted_periods / periods if periods > 0 else 0.0))
+    return stats
+
+
+def _compute_stats_numpy(packed: PackedHabits):
+    """
+    Computes the habit analytics from packed period keys with vectorized NumPy operations.
+
+    Args:
+        packed (PackedHabits): The packed period keys and period parameters.
+
+    Returns:
+        list[HabitStats]: The analytics of each habit.
+    """
+    offsets = np.frombuffer(packed.offsets, dtype=np.int64)
+    habit_count = len(offsets) - 1
+    keys = np.frombuffer(packed.keys, dtype=np.int32).astype(np.int64)
+    first_keys = np.frombuffer(packed.first_keys, dtype=np.int64)
+    current_keys = np.frombuffer(packed.current_keys, dtype=np.int64)
+    reachable_periods = np.frombuffer(packed.reachable_periods, dtype=np.int64)
+
+    # Habit index of every completed period
+    habit_ids = np.repeat(np.arange(habit_count), np.diff(offsets))
+
+    completed = np.zeros(habit_count, dtype=bool)
+    completed[habit_ids[keys == current_keys[habit_ids]]] = True
+
+    # The keys are already sorted and distinct per habit
+    keep = (keys >= first_keys[habit_ids]) & (keys <= current_keys[habit_ids])
+    keys = keys[keep]
+    habit_ids = habit_ids[keep]
+
+    counted_periods = np.bincount(habit_ids, minlength=habit_count)
+    current_streaks = np.zeros(habit_count, dtype=np.int64)
+    longest_streaks = np.zeros(habit_count, dtype=np.int64)
+    if len(keys):
+        # A run of consecutive periods starts at every new habit and every gap
+        run_starts = np.ones(len(keys), dtype=bool)
+        run_starts[1:] = (habit_ids[1:] != habit_ids[:-1]) | (keys[1:] != keys[:-1] + 1)
+        run_ids = np.cumsum(run_starts) - 1
+        run_lengths = np.bincount(run_ids)
+        np.maximum.at(longest_streaks, habit_ids[run_starts], run_lengths)
+
+        # The current streak is the last run of a habit, if it reaches the current period
+        last = np.flatnonzero(np.append(habit_ids[1:] != habit_ids[:-1], True))
+        last_habits = habit_ids[last]
+        ends_now = keys[last] == current_keys[last_habits]
+        current_streaks[last_habits[ends_now]] = run_lengths[run_ids[last[ends_now]]]
+
+    current_streaks = np.minimum(current_streaks, reachable_periods)
+    periods = current_keys - first_keys + 1
+    completion_rates = np.where(periods > 0, counted_periods / np.maximum(periods, 1), 0.0)
+
+    return [HabitStats(bool(completed[i]), int(current_streaks[i]), int(longest_streaks[i]), float(completion_rates[i]))
+            for i in range(habit_count)]
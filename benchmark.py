@@ -0,0 +1,210 @@
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from array import array
+from datetime import datetime
+from Habit import Habit
+import analytics
+import storage
+
+# (number of habits, completions per habit), from 10 to 1,000,000 completions in total
+SCALES = [(1, 10), (10, 100), (100, 100), (1000, 100), (10000, 100)]
+WEEKLY_SHARE = 0.3  # Share of weekly habits in the generated data; the rest are daily
+REGRESSION_THRESHOLD = 0.25  # A benchmark regressed if it got more than 25% slower than the baseline
+NOISE_FLOOR = 0.001  # Seconds; differences in faster benchmarks are not reported as regressions
+
+
+def generate_habits(habit_count: int, completions_per_habit: int, weekly_share: float = WEEKLY_SHARE,
+                    current_date: datetime = None, seed: int = 0):
+    """
+    Generates synthetic habits with a mix of daily and weekly frequencies. Each habit has the given number
+    of completions, spread at random over the periods leading up to current_date, so some streaks are
+    still running and others are broken.
+
+    Args:
+        habit_count (int): The number of habits.
+        completions_per_habit (int): The number of completions of each habit.
+        weekly_share (float): The share of weekly habits, between 0 and 1.
+        current_date (datetime, optional): The day of the last possible completion. Defaults to now.
+        seed (int): The seed of the random generator, so that runs generate the same habits.
+
+    Returns:
+        list[Habit]: The generated habits.
+    """
+    if current_date is None:
+        current_date = datetime.today()
+    generator = random.Random(seed)
+    last_ordinal = current_date.toordinal()
+    # A quarter of the periods stay empty, which breaks the streaks every now and then
+    period_count = completions_per_habit * 4 // 3 + 1
+    habits = []
+    for i in range(habit_count):
+        weekly = generator.random() < weekly_share
+        habit = Habit(f"Habit {i}", f"Synthetic habit number {i}", "WEEKLY" if weekly else "DAILY")
+        period_length = 7 if weekly else 1
+        habit.created = datetime.fromordinal(last_ordinal - period_count * period_length)
+        periods = sorted(generator.sample(range(period_count), completions_per_habit))
+        ordinals = array('i', [last_ordinal - (period_count - 1 - period) * period_length - generator.randrange(period_length)
+                               for period in periods])
+        ordinals = array('i', sorted(ordinals))
+        microseconds = array('q', [generator.randrange(6, 22) * 3600 * 1000000 for _ in periods])
+        habit.set_packed_dates(ordinals, microseconds)
+        habits.append(habit)
+    return habits
+
+
+def _time(function, setup=None, repeat: int = 3):
+    """
+    Times a function, keeping the fastest of several runs.
+
+    Args:
+        function (Callable): The function to time. It gets the result of setup as its argument, if there is a setup.
+        setup (Callable, optional): Prepares fresh input for each run, outside of the timing.
+        repeat (int): The number of runs.
+
+    Returns:
+        float: The fastest run, in seconds.
+    """
+    best = float('inf')
+    for _ in range(repeat):
+        argument = setup() if setup is not None else None
+        started = time.perf_counter()
+        if setup is not None:
+            function(argument)
+        else:
+            function()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def benchmark_scale(habit_count: int, completions_per_habit: int, repeat: int = 3, directory: str = None):
+    """
+    Times the storage and analytics hot paths on generated habits of one scale. The analytics run on
+    habits freshly created from dictionaries, as they are right after loading a habit file.
+
+    Args:
+        habit_count (int): The number of habits.
+        completions_per_habit (int): The number of completions of each habit.
+        repeat (int): The number of runs per benchmark; the fastest is kept.
+        directory (str, optional): Where to write the habit file. Defaults to a temporary directory.
+
+    Returns:
+        dict: Seconds per operation, by operation name.
+    """
+    current_date = datetime.today()
+    habits = generate_habits(habit_count, completions_per_habit, current_date=current_date)
+    habit_dicts = [habit.to_dict() for habit in habits]
+    temp_dir = tempfile.mkdtemp(dir=directory)
+    habit_file = os.path.join(temp_dir, 'habits.json')
+
+    def fresh_habits():
+        return [Habit.from_dict(habit_data) for habit_data in habit_dicts]
+
+    try:
+        storage.save_habits(habits, habit_file)
+        return {
+            'save_habits': _time(lambda: storage.save_habits(habits, habit_file), repeat=repeat),
+            'load_habits': _time(lambda: storage.load_habits(habit_file), repeat=repeat),
+            'Habit.from_dict': _time(fresh_habits, repeat=repeat),
+            'is_completed_in_this_period': _time(
+                lambda fresh: [habit.is_completed_in_this_period(current_date) for habit in fresh], fresh_habits, repeat),
+            'count_streak_periods': _time(
+                lambda fresh: [analytics.count_streak_periods(habit, current_date) for habit in fresh], fresh_habits, repeat),
+            'filter_habits_unchecked': _time(analytics.filter_habits_unchecked, fresh_habits, repeat),
+            'get_top_performing_tasks': _time(
+                lambda fresh: analytics.get_top_performing_tasks(fresh, k=5), fresh_habits, repeat),
+        }
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def run_benchmarks(scales=SCALES, repeat: int = 3, max_completions: int = None, log=None):
+    """
+    Runs the benchmarks at every scale.
+
+    Args:
+        scales (list[tuple[int, int]]): The (number of habits, completions per habit) pairs to run.
+        repeat (int): The number of runs per benchmark; the fastest is kept.
+        max_completions (int, optional): Skips scales with more completions in total.
+        log (Callable[[str], None], optional): Receives a progress line per scale.
+
+    Returns:
+        dict: The environment and the results, one entry per operation and scale, ready to be saved as JSON.
+    """
+    results = []
+    for habit_count, completions_per_habit in scales:
+        completions = habit_count * completions_per_habit
+        if max_completions is not None and completions > max_completions:
+            continue
+        timings = benchmark_scale(habit_count, completions_per_habit, repeat)
+        for operation, seconds in timings.items():
+            results.append({'operation': operation, 'habits': habit_count, 'completions': completions, 'seconds': seconds})
+        if log is not None:
+            log(f"{completions:>9} completions: " + ", ".join(f"{operation} {seconds * 1000:.2f} ms"
+                                                               for operation, seconds in timings.items()))
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+
+
+def find_regressions(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD, noise_floor: float = NOISE_FLOOR):
+    """
+    Compares two benchmark runs and lists the benchmarks that got slower than the threshold allows.
+    Benchmarks that only exist in one run are ignored.
+
+    Args:
+        baseline (dict): The earlier run, as returned by run_benchmarks.
+        current (dict): The new run.
+        threshold (float): The allowed slowdown, e.g. 0.25 for 25%.
+        noise_floor (float): Slowdowns of fewer seconds than this are ignored as noise.
+
+    Returns:
+        list[dict]: The operation, number of completions, both timings and the slowdown ratio of each regression.
+    """
+    baseline_seconds = {(result['operation'], result['completions']): result['seconds'] for result in baseline['results']}
+    regressions = []
+    for result in current['results']:
+        before = baseline_seconds.get((result['operation'], result['completions']))
+        if before is None:
+            continue
+        after = result['seconds']
+        if after > before * (1 + threshold) and after - before > noise_floor:
+            regressions.append({'operation': result['operation'], 'completions': result['completions'],
+                                'baseline': before, 'current': after, 'ratio': after / before if before else float('inf')})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the storage and analytics hot paths on generated habits.")
+    parser.add_argument('--output', default=None, help="write the results to this JSON file")
+    parser.add_argument('--baseline', default=None, help="compare with the results in this JSON file")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help=f"allowed slowdown against the baseline (default: {REGRESSION_THRESHOLD})")
+    parser.add_argument('--max-completions', type=int, default=None, help="skip larger scales")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark; the fastest is kept (default: 3)")
+    args = parser.parse_args()
+
+    run = run_benchmarks(repeat=args.repeat, max_completions=args.max_completions, log=print)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(run, file, indent=4)
+
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            regressions = find_regressions(json.load(file), run, args.threshold)
+        for regression in regressions:
+            print(f"Regression: {regression['operation']} at {regression['completions']} completions took "
+                  f"{regression['current'] * 1000:.2f} ms instead of {regression['baseline'] * 1000:.2f} ms "
+                  f"({regression['ratio']:.2f}x)")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.threshold:.0%}.")
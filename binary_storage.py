@@ -0,0 +1,128 @@
+import struct
+import sys
+from array import array
+from datetime import datetime
+from Habit import Habit
+
+BINARY_EXTENSIONS = ('.bin',)  # Habit files with these extensions use the packed binary format
+MAGIC = b'HABITS'  # The first bytes of every binary habit file
+VERSION = 1
+
+# Layout (all numbers little-endian):
+#   header:   MAGIC, uint8 version, uint32 habit count
+#   habit:    name, description, frequency and created (ISO format) as uint32 length + UTF-8 bytes,
+#             uint32 completion count n,
+#             n x int32 day ordinals (date.toordinal),
+#             n x int64 microseconds since midnight
+_HEADER = struct.Struct('<6sBI')
+_LENGTH = struct.Struct('<I')
+
+
+def is_binary_file(habits_file: str):
+    """
+    Checks if the habit file uses the packed binary format, based on its extension.
+
+    Args:
+        habits_file (str): The path to the habit file.
+
+    Returns:
+        bool: True if the file is a binary habit file, False otherwise.
+    """
+    return habits_file.lower().endswith(BINARY_EXTENSIONS)
+
+
+def _to_little_endian(values: array):
+    """
+    Returns the bytes of an array in little-endian order.
+
+    Args:
+        values (array): The array to convert.
+
+    Returns:
+        bytes: The little-endian bytes of the array.
+    """
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def encode_habits(habits: list[Habit]):
+    """
+    Encodes habits in the packed binary format.
+
+    Args:
+        habits (list[Habit]): The list of Habit objects to encode.
+
+    Returns:
+        bytes: The binary representation of the habits.
+    """
+    parts = [_HEADER.pack(MAGIC, VERSION, len(habits))]
+    for habit in habits:
+        for text in (habit.name, habit.description, habit.frequency, habit.created.isoformat()):
+            encoded = text.encode('utf-8')
+            parts.append(_LENGTH.pack(len(encoded)))
+            parts.append(encoded)
+
+        ordinals, microseconds = habit.get_packed_dates()
+        parts.append(_LENGTH.pack(len(ordinals)))
+        parts.append(_to_little_endian(array('i', ordinals)))
+        parts.append(_to_little_endian(array('q', microseconds)))
+    return b''.join(parts)
+
+
+def decode_habits(data: bytes):
+    """
+    Decodes habits from the packed binary format. Completions are loaded into arrays,
+    without creating a datetime per completion.
+
+    Args:
+        data (bytes): The binary representation of the habits.
+
+    Returns:
+        list: A list of Habit objects.
+
+    Raises:
+        ValueError: If the data is not a valid binary habit file.
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("Binary habit file is truncated")
+    magic, version, habit_count = _HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a binary habit file")
+
+    view = memoryview(data)
+    offset = _HEADER.size
+    unpack_length = _LENGTH.unpack_from
+    habits = []
+    try:
+        for _ in range(habit_count):
+            texts = []
+            for _ in range(4):  # Name, description, frequency and creation date
+                (length,) = unpack_length(view, offset)
+                offset += _LENGTH.size
+                texts.append(str(view[offset:offset + length], 'utf-8'))
+                offset += length
+            (completion_count,) = unpack_length(view, offset)
+            offset += _LENGTH.size
+
+            ordinals = array('i')
+            ordinals.frombytes(view[offset:offset + 4 * completion_count])
+            offset += 4 * completion_count
+            microseconds = array('q')
+            microseconds.frombytes(view[offset:offset + 8 * completion_count])
+            offset += 8 * completion_count
+            if offset > len(view):
+                raise ValueError("Binary habit file is truncated")
+            if sys.byteorder == 'big':
+                ordinals.byteswap()
+                microseconds.byteswap()
+
+            name, description, frequency, created = texts
+            habit = Habit(name, description, frequency)
+            habit.created = datetime.fromisoformat(created)
+            habit.set_packed_dates(ordinals, microseconds)
+            habits.append(habit)
+    except struct.error:
+        raise ValueError("Binary habit file is truncated")
+    return habits
@@ -0,0 +1,197 @@
+import csv
+import json
+import os
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta
+from Habit import Habit
+import analytics
+
+# Completion file formats, by extension
+CSV_EXTENSIONS = ('.csv',)
+JSONL_EXTENSIONS = ('.jsonl', '.ndjson')
+
+
+class _ParsedDates(dict):
+    """
+    Day ordinals of dates by their datetime or ISO format string, parsed on first lookup.
+    Imports repeat the same few dates many times, so each distinct date is parsed once.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.microseconds = {}  # Microseconds since midnight of the dates that are not at midnight
+
+    def __missing__(self, marked_date):
+        parsed_date = datetime.fromisoformat(marked_date) if isinstance(marked_date, str) else marked_date
+        time_of_day = parsed_date - parsed_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        if time_of_day:
+            self.microseconds[marked_date] = time_of_day // timedelta(microseconds=1)
+        ordinal = self[marked_date] = parsed_date.toordinal()
+        return ordinal
+
+
+def date_range(first_date: datetime, last_date: datetime = None):
+    """
+    Lists every day from first_date to last_date, both included, at the time of day of first_date.
+
+    Args:
+        first_date (datetime): The first day.
+        last_date (datetime, optional): The last day. Defaults to first_date.
+
+    Returns:
+        list[datetime]: One datetime per day.
+    """
+    if last_date is None:
+        last_date = first_date
+    days = last_date.toordinal() - first_date.toordinal() + 1
+    return [first_date + timedelta(days=offset) for offset in range(days)]
+
+
+def read_completions(completions_file: str):
+    """
+    Reads completions from a CSV file with 'name' and 'date' columns, or from a JSONL file
+    with one {"name": ..., "date": ...} object per line. Dates are in ISO format.
+
+    Args:
+        completions_file (str): The path to the completions file.
+
+    Yields:
+        tuple[str, str]: The habit name and the ISO format date of each completion.
+
+    Raises:
+        ValueError: If the file format is not supported or a line cannot be read.
+    """
+    extension = os.path.splitext(completions_file)[1].lower()
+    if extension in CSV_EXTENSIONS:
+        with open(completions_file, 'r', newline='') as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if header is None:
+                return
+            try:
+                name_column, date_column = header.index('name'), header.index('date')
+            except ValueError:
+                raise ValueError(f"{completions_file} needs 'name' and 'date' columns")
+            for row in reader:
+                if row:
+                    yield row[name_column], row[date_column]
+    elif extension in JSONL_EXTENSIONS:
+        with open(completions_file, 'r') as file:
+            for line_number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                    yield entry['name'], entry['date']
+                except (json.JSONDecodeError, KeyError, TypeError):
+                    raise ValueError(f"Invalid completion on line {line_number} of {completions_file}")
+    else:
+        raise ValueError(f"Unsupported completions file: {completions_file} (use .csv or .jsonl)")
+
+
+def add_completions(habits: list[Habit], completions):
+    """
+    Adds many completions to a list of habits in memory. The completions are grouped per habit
+    and merged into each habit at once; days that are already marked are skipped.
+
+    Args:
+        habits (list[Habit]): List of Habit objects.
+        completions (Iterable[tuple[str, datetime | str]]): Habit names with datetimes or ISO format dates.
+
+    Returns:
+        tuple[int, list[str]]: The number of completions added, and the names that match no habit.
+    """
+    grouped = defaultdict(list)  # Habit name -> dates of its completions
+    for name, marked_date in completions:
+        grouped[name].append(marked_date)
+
+    parsed_dates = _ParsedDates()
+    added = 0
+    for habit in habits:
+        habit_dates = grouped.pop(habit.name, None)
+        if habit_dates is not None:
+            ordinals = array('i', map(parsed_dates.__getitem__, habit_dates))
+            microseconds = None
+            if parsed_dates.microseconds:
+                microseconds = array('q', [parsed_dates.microseconds.get(marked_date, 0) for marked_date in habit_dates])
+            added += habit.add_packed_dates(ordinals, microseconds)
+    return added, sorted(grouped)
+
+
+def mark_habits_complete(habit_file: str, names: list[str], first_date: datetime = None, last_date: datetime = None):
+    """
+    Marks several habits as complete on a date or every day of a date range, and saves the habit file once.
+
+    Args:
+        habit_file (str): The path to the habit file.
+        names (list[str]): The names of the habits to mark.
+        first_date (datetime, optional): The first day to mark. Defaults to now.
+        last_date (datetime, optional): The last day to mark. Defaults to first_date.
+
+    Returns:
+        tuple[int, list[str]]: The number of completions added, and the names that match no habit.
+    """
+    if first_date is None:
+        first_date = datetime.today()
+    dates = date_range(first_date, last_date)
+    return _commit_completions(habit_file, ((name, marked_date) for name in names for marked_date in dates))
+
+
+def import_completions(habit_file: str, completions_file: str):
+    """
+    Imports completions from a CSV or JSONL file, for example a backfill from another tracker,
+    and saves the habit file once.
+
+    Args:
+        habit_file (str): The path to the habit file.
+        completions_file (str): The path to the CSV or JSONL completions file.
+
+    Returns:
+        tuple[int, list[str]]: The number of completions added, and the names that match no habit.
+    """
+    return _commit_completions(habit_file, read_completions(completions_file))
+
+
+def _commit_completions(habit_file: str, completions):
+    """
+    Adds completions to the habits of a habit file and writes the file once if anything was added.
+
+    Args:
+        habit_file (str): The path to the habit file.
+        completions (Iterable[tuple[str, datetime | str]]): Habit names with datetimes or ISO format dates.
+
+    Returns:
+        tuple[int, list[str]]: The number of completions added, and the names that match no habit.
+    """
+    habits = analytics.get_habit_list(habit_file)
+    added, unknown_names = add_completions(habits, completions)
+    if added:
+        analytics.save_habit_list(habits, habit_file)
+    return added, unknown_names
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Mark many habits complete or import completions with a single save.")
+    parser.add_argument('habit_file', help="the habit file to update")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    done_parser = commands.add_parser('done', help="mark habits complete on a date or date range")
+    done_parser.add_argument('names', nargs='+', help="names of the habits")
+    done_parser.add_argument('--date', type=datetime.fromisoformat, default=None, help="ISO date (default: now)")
+    done_parser.add_argument('--until', type=datetime.fromisoformat, default=None, help="last ISO date of a range")
+
+    import_parser = commands.add_parser('import', help="import completions from a CSV or JSONL file")
+    import_parser.add_argument('completions_file', help="CSV with name and date columns, or JSONL")
+
+    args = parser.parse_args()
+    if args.command == 'done':
+        added, unknown_names = mark_habits_complete(args.habit_file, args.names, args.date, args.until)
+    else:
+        added, unknown_names = import_completions(args.habit_file, args.completions_file)
+
+    print(f"Added {added} completions to {args.habit_file}.")
+    if unknown_names:
+        print(f"Skipped {len(unknown_names)} unknown habits: {', '.join(unknown_names)}")
@@ -0,0 +1,309 @@
+import argparse
+import json
+import sys
+
+DEFAULT_HABIT_FILE = "habits.json"  # Same default as main.py
+
+# Modules are imported inside the commands, so a command only loads what it uses
+
+
+def _parse_date(text: str):
+    """
+    Parses an ISO format date for argparse.
+
+    Args:
+        text (str): The date, e.g. '2024-06-30' or '2024-06-30T20:00:00'.
+
+    Returns:
+        datetime: The parsed date.
+    """
+    from datetime import datetime
+    try:
+        return datetime.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid ISO date: {text}")
+
+
+def _print_result(args, result, lines):
+    """
+    Prints the result of a command, as JSON with --json or as readable lines otherwise.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+        result: The JSON-serializable result.
+        lines (Iterable[str]): The readable output.
+    """
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        for line in lines:
+            print(line)
+
+
+def _error(message: str):
+    """
+    Prints an error message to standard error.
+
+    Args:
+        message (str): The message.
+
+    Returns:
+        int: The exit code of a failed command.
+    """
+    print(f"Error: {message}", file=sys.stderr)
+    return 1
+
+
+def command_add(args):
+    """
+    Adds a new habit.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        int: The exit code.
+    """
+    import analytics
+    import periods
+    from Habit import Habit
+
+    frequency = args.frequency.upper()
+    if not periods.is_supported_frequency(frequency):
+        return _error(f"unsupported frequency '{args.frequency}' (use DAILY, WEEKLY, MONTHLY or EVERY_<N>_DAYS)")
+    if not args.name.strip():
+        return _error("name cannot be empty")
+    if analytics.is_habit_on_the_list(args.name, args.file):
+        return _error(f"habit '{args.name}' is already being tracked")
+
+    habit = Habit(args.name, args.description, frequency)
+    analytics.add_habit_to_list(habit, args.file)
+    _print_result(args, habit.to_dict(), [f"Habit '{habit.name}' added."])
+    return 0
+
+
+def command_done(args):
+    """
+    Marks habits as complete on a date or every day of a date range, with a single save.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        int: The exit code.
+    """
+    from datetime import datetime
+    import sqlite_storage
+
+    marked_date = args.date or datetime.today()
+    added = 0
+    unknown_names = []
+    if args.until is None and sqlite_storage.is_sqlite_file(args.file):
+        # One INSERT per habit, without loading the database
+        import storage
+        added, unknown_names = storage.save_named_completions(args.names, marked_date, args.file)
+    elif args.until is None:
+        # A single day goes through the repository, which writes as little as the backend allows
+        import analytics
+        repository = analytics.get_repository(args.file)
+        for name in args.names:
+            habit = repository.get(name)
+            if habit is None:
+                unknown_names.append(name)
+            elif repository.mark_complete(habit, marked_date):
+                added += 1
+    else:
+        import bulk_import
+        added, unknown_names = bulk_import.mark_habits_complete(args.file, args.names, marked_date, args.until)
+
+    lines = [f"Added {added} completions."]
+    if unknown_names:
+        lines.append(f"Unknown habits: {', '.join(unknown_names)}")
+    _print_result(args, {'added': added, 'unknown': unknown_names}, lines)
+    return 1 if unknown_names else 0
+
+
+def command_list(args):
+    """
+    Lists the habits with their completion status and current streak.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        int: The exit code.
+    """
+    from datetime import datetime
+    import analytics
+
+    current_date = args.date or datetime.today()
+    habits = analytics.get_habit_list(args.file)
+    if args.frequency is not None:
+        habits = [habits[i] for i in analytics.filter_habits_per_period(habits, args.frequency.upper())]
+
+    rows = []
+    for habit in habits:
+        completed = habit.is_completed_in_this_period(current_date)
+        if args.unchecked and completed:
+            continue
+        rows.append({
+            'name': habit.name,
+            'frequency': habit.frequency,
+            'completed': completed,
+            'current_streak': habit.get_current_streak(current_date),
+        })
+
+    _print_result(args, rows, [
+        f"[{'x' if row['completed'] else ' '}] {row['name']} ({row['frequency']}, streak {row['current_streak']})"
+        for row in rows])
+    return 0
+
+
+def command_stats(args):
+    """
+    Shows the number of habits, completion rates and the best and most struggled habits.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        int: The exit code.
+    """
+    from datetime import datetime
+    import analytics
+    from batch_analytics import compute_habit_stats
+
+    current_date = args.date or datetime.today()
+    habits = analytics.get_habit_list(args.file)
+    habits_stats = compute_habit_stats(habits, current_date)
+    best, worst = analytics.rank_habits(habits, args.top, current_date=current_date, habits_stats=habits_stats)
+
+    result = {
+        'habits': len(habits),
+        'completed': sum(1 for habit_stats in habits_stats if habit_stats.completed),
+        'completion_rate': sum(habit_stats.completion_rate for habit_stats in habits_stats) / len(habits) if habits else 0.0,
+        'best': [{'name': habit.name, 'current_streak': habit.current_streak} for habit in best],
+        'struggling': [{'name': habit.name, 'current_streak': habit.current_streak} for habit in worst],
+    }
+    lines = [
+        f"Total number of habits: {result['habits']}",
+        f"Completed in the current period: {result['completed']}",
+        f"Average completion rate: {result['completion_rate']:.0%}",
+        f"Top {args.top} longest streaks:",
+    ]
+    lines += [f"  {habit['name']} ({habit['current_streak']})" for habit in result['best']]
+    lines.append(f"Top {args.top} most struggling habits:")
+    lines += [f"  {habit['name']} ({habit['current_streak']})" for habit in result['struggling']]
+    _print_result(args, result, lines)
+    return 0
+
+
+def command_export(args):
+    """
+    Exports the habits as JSON, or their completions as CSV rows that bulk_import.py can read back.
+
+    Args:
+        args (argparse.Namespace): The parsed arguments.
+
+    Returns:
+        int: The exit code.
+    """
+    import csv
+    import analytics
+
+    habits = analytics.get_habit_list(args.file)
+    output = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        if args.format == 'json':
+            json.dump([habit.to_dict() for habit in habits], output, indent=4)
+            output.write('\n')
+        else:
+            writer = csv.writer(output)
+            writer.writerow(['name', 'date'])
+            for habit in habits:
+                writer.writerows((habit.name, marked_date.isoformat()) for marked_date in habit.marked_dates)
+    finally:
+        if args.output:
+            output.close()
+    return 0
+
+
+def build_parser():
+    """
+    Builds the argument parser with one subcommand per action.
+
+    Returns:
+        argparse.ArgumentParser: The parser.
+    """
+    parser = argparse.ArgumentParser(description="Track habits from scripts.")
+    parser.add_argument('--file', default=DEFAULT_HABIT_FILE, help=f"habit file (default: {DEFAULT_HABIT_FILE})")
+    parser.add_argument('--json', action='store_true', help="print machine-readable JSON")
+    parser.add_argument('--instrument', action='store_true', help="print call counts and latencies to standard error")
+    parser.add_argument('--instrument-json', metavar='FILE', default=None, help="write call counts and latencies to a JSON file")
+    parser.add_argument('--profile', metavar='FILE', default=None, help="write a cProfile capture of the command")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    # Lets --json also follow the command, e.g. 'list --json'
+    json_option = argparse.ArgumentParser(add_help=False)
+    json_option.add_argument('--json', action='store_true', default=argparse.SUPPRESS, help="print machine-readable JSON")
+
+    add_parser = commands.add_parser('add', parents=[json_option], help="add a new habit")
+    add_parser.add_argument('name', help="name of the habit")
+    add_parser.add_argument('-d', '--description', default="", help="short description")
+    add_parser.add_argument('-f', '--frequency', default="DAILY", help="DAILY, WEEKLY, MONTHLY or EVERY_<N>_DAYS")
+    add_parser.set_defaults(handler=command_add)
+
+    done_parser = commands.add_parser('done', parents=[json_option], help="mark habits as complete")
+    done_parser.add_argument('names', nargs='+', help="names of the habits")
+    done_parser.add_argument('--date', type=_parse_date, default=None, help="ISO date (default: now)")
+    done_parser.add_argument('--until', type=_parse_date, default=None, help="last ISO date of a range")
+    done_parser.set_defaults(handler=command_done)
+
+    list_parser = commands.add_parser('list', parents=[json_option], help="list habits")
+    list_parser.add_argument('--unchecked', action='store_true', help="only habits not completed in this period")
+    list_parser.add_argument('--frequency', default=None, help="only habits with this frequency")
+    list_parser.add_argument('--date', type=_parse_date, default=None, help="ISO date to check (default: now)")
+    list_parser.set_defaults(handler=command_list)
+
+    stats_parser = commands.add_parser('stats', parents=[json_option], help="show habit statistics")
+    stats_parser.add_argument('--top', type=int, default=5, help="number of best and struggling habits")
+    stats_parser.add_argument('--date', type=_parse_date, default=None, help="ISO date to compute for (default: now)")
+    stats_parser.set_defaults(handler=command_stats)
+
+    export_parser = commands.add_parser('export', help="export habits or completions")
+    export_parser.add_argument('--format', choices=['json', 'csv'], default='json', help="export format")
+    export_parser.add_argument('--output', default=None, help="output file (default: standard output)")
+    export_parser.set_defaults(handler=command_export)
+
+    return parser
+
+
+def main(argv: list[str] = None):
+    """
+    Runs one command.
+
+    Args:
+        argv (list[str], optional): The command-line arguments. Defaults to sys.argv[1:].
+
+    Returns:
+        int: The exit code.
+    """
+    args = build_parser().parse_args(argv)
+    if not (args.instrument or args.instrument_json or args.profile):
+        return args.handler(args)
+
+    import instrumentation
+    from contextlib import nullcontext
+    if args.instrument or args.instrument_json:
+        instrumentation.enable()
+    try:
+        with instrumentation.profile(args.profile) if args.profile else nullcontext():
+            return args.handler(args)
+    finally:
+        if args.instrument or args.instrument_json:
+            instrumentation.disable()
+            instrumentation.report(args.instrument_json)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime
+
+
+class CompletionIndex:
+    """
+    Answers date range queries about the completions of one habit in O(log n), by binary search over
+    the sorted day ordinals and period keys of its completions. Gap queries also read the gaps they may return.
+
+    Next to them, it keeps the prefix sums of the distinct completed days, the start of the run of periods
+    each completed period belongs to, and the gaps between completed periods sorted by length.
+    """
+
+    __slots__ = ('period', 'created', 'first_key', 'ordinals', 'distinct_days', 'keys', 'run_starts', 'gaps')
+
+    def __init__(self, period, created: datetime, ordinals: array, keys: array):
+        """
+        Builds the index from the completions of a habit.
+
+        Args:
+            period (Period): The period strategy of the habit, or None if its frequency is not supported.
+            created (datetime): The date and time when the habit was created.
+            ordinals (array): The sorted day ordinals of the completions, possibly with repeated days.
+            keys (array): The sorted, distinct keys of the completed periods.
+        """
+        self.period = period
+        self.created = created
+        self.first_key = period.key(created.toordinal()) if period is not None else None
+        self.ordinals = ordinals
+        # distinct_days[i] is the number of distinct days among the first i completions
+        self.distinct_days = array('i', [0])
+        previous_ordinal = None
+        for ordinal in ordinals:
+            self.distinct_days.append(self.distinct_days[-1] + (ordinal != previous_ordinal))
+            previous_ordinal = ordinal
+        self.keys = keys
+        # run_starts[i] is the position of the first key of the run of consecutive keys holding keys[i]
+        self.run_starts = array('i')
+        for i, key in enumerate(keys):
+            self.run_starts.append(self.run_starts[-1] if i and key == keys[i - 1] + 1 else i)
+        # (missed periods, position of the completed period after them), shortest gaps first
+        self.gaps = sorted((keys[i] - keys[i - 1] - 1, i) for i in range(1, len(keys)) if keys[i] > keys[i - 1] + 1)
+
+    def count_completions(self, first_date: date, last_date: date):
+        """
+        Counts the completions from the first to the last day of a window, both included.
+
+        Args:
+            first_date (date): The first day of the window.
+            last_date (date): The last day of the window.
+
+        Returns:
+            int: The number of completions, counting each mark on a day.
+        """
+        return max(bisect_right(self.ordinals, last_date.toordinal()) - bisect_left(self.ordinals, first_date.toordinal()), 0)
+
+    def count_days(self, first_date: date, last_date: date):
+        """
+        Counts the days with at least one completion in a window, both ends included.
+
+        Args:
+            first_date (date): The first day of the window.
+            last_date (date): The last day of the window.
+
+        Returns:
+            int: The number of distinct completed days.
+        """
+        start = bisect_left(self.ordinals, first_date.toordinal())
+        end = bisect_right(self.ordinals, last_date.toordinal())
+        if end <= start:
+            return 0
+        # The first completion of the window may share its day with the completion before it
+        return self.distinct_days[end] - self.distinct_days[start + 1] + 1
+
+    def count_periods(self, first_date: date, last_date: date):
+        """
+        Counts the completed periods of the habit frequency that start or end in a window.
+
+        Args:
+            first_date (date): A day of the first period of the window.
+            last_date (date): A day of the last period of the window.
+
+        Returns:
+            int: The number of completed periods, 0 if the frequency is not supported.
+        """
+        if self.period is None:
+            return 0
+        first_key = self.period.key(first_date.toordinal())
+        last_key = self.period.key(last_date.toordinal())
+        return max(bisect_right(self.keys, last_key) - bisect_left(self.keys, first_key), 0)
+
+    def is_completed_on(self, day: date):
+        """
+        Checks if the habit was completed on a day.
+
+        Args:
+            day (date): The day to check.
+
+        Returns:
+            bool: True if there is a completion on the day, False otherwise.
+        """
+        ordinal = day.toordinal()
+        index = bisect_left(self.ordinals, ordinal)
+        return index < len(self.ordinals) and self.ordinals[index] == ordinal
+
+    def find_gaps(self, min_periods: int, first_date: date = None, last_date: date = None):
+        """
+        Finds the runs of more than min_periods missed periods between two completed periods.
+
+        The long enough gaps are found with one binary search over the gaps sorted by length, and the gaps
+        of the window with two over the keys. Whichever set is smaller is then read, so a query takes
+        O(log n + min(w, r log r)) for w completed periods in the window and r long enough gaps.
+
+        Args:
+            min_periods (int): Only longer gaps are returned.
+            first_date (date, optional): Only gaps ending on or after this day are returned.
+            last_date (date, optional): Only gaps starting on or before this day are returned.
+
+        Returns:
+            list[tuple[date, date]]: The first and the last day of each gap, in chronological order.
+        """
+        if self.period is None:
+            return []
+        # The gap before keys[position] ends on or after first_date from the first key after it,
+        # and starts on or before last_date up to the first key on or after it
+        first_position, last_position = 1, len(self.keys) - 1
+        if first_date is not None:
+            first_position = max(bisect_right(self.keys, self.period.key(first_date.toordinal())), 1)
+        if last_date is not None:
+            last_position = min(bisect_left(self.keys, self.period.key(last_date.toordinal())), len(self.keys) - 1)
+        long_gaps = bisect_right(self.gaps, (min_periods, len(self.keys)))
+        if last_position - first_position + 1 <= len(self.gaps) - long_gaps:
+            # Fewer gaps in the window than long enough ones: read the window in order
+            positions = [position for position in range(first_position, last_position + 1)
+                         if self.keys[position] - self.keys[position - 1] - 1 > min_periods]
+        else:
+            positions = sorted(position for _, position in self.gaps[long_gaps:]
+                               if first_position <= position <= last_position)
+        return [(date.fromordinal(self.period.day_range(self.keys[position - 1] + 1)[0]),
+                 date.fromordinal(self.period.day_range(self.keys[position] - 1)[1])) for position in positions]
+
+    def get_streak(self, as_of: datetime):
+        """
+        Returns the current streak as it was at a moment, counted like Habit.get_current_streak: the streak is 0
+        unless the period of the moment is completed, and does not reach before the creation of the habit.
+
+        Args:
+            as_of (datetime): The moment to count the streak at.
+
+        Returns:
+            int: The streak, in periods.
+        """
+        if self.period is None:
+            return 0
+        key = self.period.key(as_of.toordinal())
+        index = bisect_right(self.keys, key) - 1
+        if index < 0 or self.keys[index] != key or key < self.first_key:
+            return 0
+        run_start = max(self.run_starts[index], bisect_left(self.keys, self.first_key))
+        return min(index - run_start + 1, self.period.count_reachable_periods(self.created, as_of))
@@ -0,0 +1,289 @@
+import atexit
+import functools
+import json
+import os
+import sys
+import time
+from array import array
+from contextlib import contextmanager
+
+ENVIRONMENT_VARIABLE = "HABIT_INSTRUMENTATION"  # '1' prints a summary on exit, a path ending in .json writes one
+PROFILE_ENVIRONMENT_VARIABLE = "HABIT_PROFILE"  # Path of a cProfile capture of the main.py session
+COUNTERS = ('habits', 'completions', 'bytes_read', 'bytes_written')
+
+_enabled = False  # Checked first by every instrumented call, so that disabled instrumentation costs one global lookup
+_operations = {}  # Operation name -> _Operation
+_methods = []  # (class, attribute, operation name, original attribute) of the methods wrapped only while enabled
+
+
+class _Operation:
+    """
+    Call latencies and counters of one instrumented operation.
+    """
+
+    __slots__ = ('latencies', 'counters')
+
+    def __init__(self):
+        self.latencies = array('d')  # Seconds per call
+        self.counters = dict.fromkeys(COUNTERS, 0)
+
+
+def is_enabled():
+    """
+    Checks if instrumentation is recording.
+
+    Returns:
+        bool: True if instrumentation is enabled, False otherwise.
+    """
+    return _enabled
+
+
+def enable():
+    """
+    Starts recording calls and counters.
+    """
+    global _enabled
+    _enabled = True
+    for cls, attribute, name, original in _methods:
+        setattr(cls, attribute, _wrap_method(original, name))
+
+
+def disable():
+    """
+    Stops recording. What was recorded so far is kept.
+    """
+    global _enabled
+    _enabled = False
+    for cls, attribute, name, original in _methods:
+        setattr(cls, attribute, original)
+
+
+def reset():
+    """
+    Forgets everything recorded so far.
+    """
+    _operations.clear()
+
+
+def _get_operation(name: str):
+    operation = _operations.get(name)
+    if operation is None:
+        operation = _operations[name] = _Operation()
+    return operation
+
+
+def record(name: str, seconds: float = None, **counters):
+    """
+    Records one call of an operation and adds to its counters. Does nothing while instrumentation is disabled.
+
+    Args:
+        name (str): The operation, e.g. 'storage.load_habits'.
+        seconds (float, optional): The latency of the call. If None, only the counters are added.
+        **counters (int): Amounts to add to the counters in COUNTERS, e.g. habits=10, bytes_read=2048.
+    """
+    if not _enabled:
+        return
+    operation = _get_operation(name)
+    if seconds is not None:
+        operation.latencies.append(seconds)
+    for counter, amount in counters.items():
+        operation.counters[counter] += amount
+
+
+def _timed(function, name: str):
+    """
+    Wraps a function so that every call is timed.
+
+    Args:
+        function (Callable): The function to wrap.
+        name (str): The operation the calls are recorded as.
+
+    Returns:
+        Callable: The wrapper.
+    """
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            _get_operation(name).latencies.append(time.perf_counter() - started)
+    return wrapper
+
+
+def _wrap_method(original, name: str):
+    """
+    Wraps a method, class method or static method as found in a class dictionary.
+
+    Args:
+        original: The attribute from the class dictionary.
+        name (str): The operation the calls are recorded as.
+
+    Returns:
+        The timed attribute.
+    """
+    if isinstance(original, (classmethod, staticmethod)):
+        return type(original)(_timed(original.__func__, name))
+    return _timed(original, name)
+
+
+def instrument_method(cls, attribute: str, name: str):
+    """
+    Times a method that runs once per habit, where even the check of instrumented() would add up.
+    The method is replaced by a timed one only while instrumentation is enabled, so it costs nothing otherwise.
+
+    Args:
+        cls (type): The class of the method.
+        attribute (str): The name of the method.
+        name (str): The operation the calls are recorded as.
+    """
+    original = cls.__dict__[attribute]
+    _methods.append((cls, attribute, name, original))
+    if _enabled:
+        setattr(cls, attribute, _wrap_method(original, name))
+
+
+def instrumented(name: str):
+    """
+    Decorates a function so that its calls are timed while instrumentation is enabled.
+
+    Args:
+        name (str): The operation the calls are recorded as.
+
+    Returns:
+        Callable: The decorator.
+    """
+    def decorate(function):
+        timed = _timed(function, name)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            return timed(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def _percentile(sorted_latencies, fraction: float):
+    """
+    Returns a percentile of sorted latencies, using the nearest rank.
+
+    Args:
+        sorted_latencies (list[float]): The latencies in ascending order, not empty.
+        fraction (float): The percentile as a fraction, e.g. 0.99.
+
+    Returns:
+        float: The latency at the percentile.
+    """
+    return sorted_latencies[min(len(sorted_latencies) - 1, int(len(sorted_latencies) * fraction))]
+
+
+def get_summary():
+    """
+    Summarizes the recorded operations.
+
+    Returns:
+        dict: Per operation, its call count, total, mean, p50, p90, p99 and maximum latency in seconds,
+        and the counters in COUNTERS.
+    """
+    summary = {}
+    for name in sorted(_operations):
+        operation = _operations[name]
+        latencies = sorted(operation.latencies)
+        entry = {'calls': len(latencies), 'total_seconds': sum(latencies)}
+        if latencies:
+            entry.update({
+                'mean_seconds': entry['total_seconds'] / len(latencies),
+                'p50_seconds': _percentile(latencies, 0.50),
+                'p90_seconds': _percentile(latencies, 0.90),
+                'p99_seconds': _percentile(latencies, 0.99),
+                'max_seconds': latencies[-1],
+            })
+        entry.update(operation.counters)
+        summary[name] = entry
+    return summary
+
+
+def format_summary(summary: dict = None):
+    """
+    Formats a summary as a table, slowest operations first.
+
+    Args:
+        summary (dict, optional): A summary from get_summary. Defaults to the current one.
+
+    Returns:
+        str: The table.
+    """
+    if summary is None:
+        summary = get_summary()
+    lines = [f"{'operation':<36}{'calls':>8}{'total ms':>11}{'p50 ms':>9}{'p99 ms':>9}"
+             f"{'habits':>9}{'completions':>13}{'read':>11}{'written':>11}"]
+    for name, entry in sorted(summary.items(), key=lambda item: -item[1]['total_seconds']):
+        lines.append(f"{name:<36}{entry['calls']:>8}{entry['total_seconds'] * 1000:>11.2f}"
+                     f"{entry.get('p50_seconds', 0) * 1000:>9.3f}{entry.get('p99_seconds', 0) * 1000:>9.3f}"
+                     f"{entry['habits']:>9}{entry['completions']:>13}{entry['bytes_read']:>11}{entry['bytes_written']:>11}")
+    return "\n".join(lines)
+
+
+def dump_json(output_file: str):
+    """
+    Writes the current summary to a JSON file.
+
+    Args:
+        output_file (str): The path to the JSON file.
+    """
+    with open(output_file, 'w') as file:
+        json.dump(get_summary(), file, indent=4)
+
+
+def report(output_file: str = None):
+    """
+    Writes the summary to a JSON file, or prints it to standard error. Does nothing if nothing was recorded.
+
+    Args:
+        output_file (str, optional): The path to the JSON file. Defaults to printing the table.
+    """
+    if not _operations:
+        return
+    if output_file:
+        dump_json(output_file)
+    else:
+        print(format_summary(), file=sys.stderr)
+
+
+@contextmanager
+def profile(output_file: str):
+    """
+    Runs the enclosed code under cProfile and saves the statistics, which can be read with pstats or snakeviz.
+
+    Args:
+        output_file (str): The path to the statistics file.
+    """
+    import cProfile
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_file)
+
+
+def enable_from_environment():
+    """
+    Enables instrumentation if HABIT_INSTRUMENTATION is set, and reports the summary on exit:
+    as JSON if the variable is a path ending in '.json', as a table on standard error otherwise.
+
+    Returns:
+        bool: True if instrumentation was enabled, False otherwise.
+    """
+    setting = os.environ.get(ENVIRONMENT_VARIABLE, "")
+    if setting in ("", "0"):
+        return False
+    enable()
+    atexit.register(report, setting if setting.lower().endswith('.json') else None)
+    return True
+
+
+enable_from_environment()
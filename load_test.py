@@ -0,0 +1,93 @@
+import argparse
+import asyncio
+import time
+from urllib.parse import quote
+
+
+async def _run_client(host: str, port: int, paths: list[str], deadline: float, latencies: list[float]):
+    """
+    Sends GET requests over one keep-alive connection until the deadline, cycling through the paths.
+
+    Args:
+        host (str): The server address.
+        port (int): The server port.
+        paths (list[str]): The request paths.
+        deadline (float): The time.perf_counter() value at which to stop.
+        latencies (list[float]): Receives the latency of every request, in seconds.
+
+    Returns:
+        int: The number of failed requests.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    requests = [f"GET {path} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode() for path in paths]
+    failures = 0
+    i = 0
+    try:
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            writer.write(requests[i % len(requests)])
+            i += 1
+            status_line = await reader.readline()
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+            latencies.append(time.perf_counter() - started)
+            if not status_line.startswith(b'HTTP/1.1 200'):
+                failures += 1
+    finally:
+        writer.close()
+    return failures
+
+
+async def run_load_test(host: str, port: int, paths: list[str], connections: int = 50, duration: float = 5.0):
+    """
+    Runs concurrent keep-alive clients against a running habit server.
+
+    Args:
+        host (str): The server address.
+        port (int): The server port.
+        paths (list[str]): The request paths.
+        connections (int): The number of concurrent connections.
+        duration (float): How long to send requests, in seconds.
+
+    Returns:
+        dict: The number of requests and failures, requests per second and latency percentiles in milliseconds.
+    """
+    latencies = []
+    started = time.perf_counter()
+    failures = await asyncio.gather(*(
+        _run_client(host, port, paths, started + duration, latencies) for _ in range(connections)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000 if latencies else 0.0
+    return {
+        'requests': len(latencies),
+        'failures': sum(failures),
+        'requests_per_second': len(latencies) / elapsed,
+        'p50_ms': percentile(0.50),
+        'p99_ms': percentile(0.99),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a running habit server with concurrent GET requests.")
+    parser.add_argument('--host', default="127.0.0.1", help="server address (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=8765, help="server port (default: 8765)")
+    parser.add_argument('--connections', type=int, default=50, help="concurrent connections (default: 50)")
+    parser.add_argument('--duration', type=float, default=5.0, help="seconds to run (default: 5)")
+    parser.add_argument('--habit', action='append', default=[], help="also request this habit (repeatable)")
+    args = parser.parse_args()
+
+    paths = ['/habits', '/analytics'] + [f"/habits/{quote(name, safe='')}" for name in args.habit]
+    result = asyncio.run(run_load_test(args.host, args.port, paths, args.connections, args.duration))
+    print(f"{result['requests']} requests, {result['failures']} failures, "
+          f"{result['requests_per_second']:.0f} requests/s, "
+          f"p50 {result['p50_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms")
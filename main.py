@@ -1,17 +1,22 @@
 from Habit import Habit
 import analytics 
+import periods
+import bisect
+import instrumentation
 import os
 import time
 
-habit_file = "habits.json"  # Path to the JSON file where habits are stored
+habit_file = "habits.json"  # Path to the JSON file (or .db SQLite database) where habits are stored
+PAGE_SIZE = 20  # Lines of the habit list shown per page
 
 # Convert a digit to a frequency string
-def get_frequency_string(digit: str):
+def get_frequency_string(digit: str, days: str = None):
     """
     Converts a digit to a corresponding frequency string.
 
     Args:
         digit (str): The digit representing the frequency.
+        days (str, optional): The number of days of an every-N-days frequency (digit '4').
 
     Returns:
         str: The corresponding frequency string or 'WRONG' if the input is invalid.
@@ -20,6 +25,10 @@ def get_frequency_string(digit: str):
         return "DAILY"
     elif digit == '2':
         return "WEEKLY"
+    elif digit == '3':
+        return "MONTHLY"
+    elif digit == '4' and days is not None and days.isdigit() and int(days) > 0:
+        return periods.every_n_days_frequency(int(days))
     else:
         return "WRONG"
 
@@ -28,7 +37,7 @@ def clear():
     """
     Clears the console screen.
     """
-    os.system("cls")
+    os.system("cls" if os.name == "nt" else "clear")
 
 # Print out the list of habits based on the provided indices
 def print_out_habit_list(habits: list[Habit], indices: list[int] = None):
@@ -55,10 +64,10 @@ def print_out_streak_top(habits: list[Habit], top_count: int = None):
         top_count (int, optional): Number of top streaks to print. Defaults to None.
     """
     for i, habit in enumerate(habits):
-        if habit.longest_streak == 1:
-            print(f"            {i+1} - {habit.name} ({habit.longest_streak} period)")
+        if habit.current_streak == 1:
+            print(f"            {i+1} - {habit.name} ({habit.current_streak} period)")
         else:
-            print(f"            {i+1} - {habit.name} ({habit.longest_streak} periods)")
+            print(f"            {i+1} - {habit.name} ({habit.current_streak} periods)")
 
         if top_count is not None and i >= top_count - 1:
             break
@@ -81,10 +90,13 @@ def create_new_habit():
             break
 
         description = input("Enter a short description of the habit (optional): ")
-        freq_digit = input("Enter the habit frequency: \n1. DAILY \n2. WEEKLY:\nSelect an option (1-2): ")
+        freq_digit = input("Enter the habit frequency: \n1. DAILY \n2. WEEKLY \n3. MONTHLY \n4. EVERY N DAYS:\nSelect an option (1-4): ")
+        days = None
+        if freq_digit == '4':
+            days = input("Repeat the habit every how many days? ")
 
         # Check for input validity
-        frequency = get_frequency_string(freq_digit)
+        frequency = get_frequency_string(freq_digit, days)
         if frequency == "WRONG":
             print("Incorrect habit frequency, try again!")  
         else:
@@ -92,22 +104,19 @@ def create_new_habit():
             habit = Habit(name, description, frequency)
 
             # Dynamically update the habits list
-            habits = analytics.get_habit_list(habit_file)
-            habits.append(habit)
-            analytics.save_habit_list(habits, habit_file)
+            analytics.add_habit_to_list(habit, habit_file)
             clear()
             print(f"Habit '{name}' added successfully!")
             time.sleep(3)  # Pause to let user see the message
             break
 
 # Menu for individual habit actions
-def individual_habit_menu(selected_habit: Habit, habits: list[Habit]):
+def individual_habit_menu(selected_habit: Habit):
     """
     Displays the menu for individual habit actions.
 
     Args:
         selected_habit (Habit): The selected habit object.
-        habits (list[Habit]): List of all habit objects.
     """
     while True:
         clear()
@@ -120,6 +129,9 @@ def individual_habit_menu(selected_habit: Habit, habits: list[Habit]):
             print(f"Current longest streak: {longest_streak} period.")
         else:
             print(f"Current longest streak: {longest_streak} periods.")
+        # Served from the habit's rollups, without going through its history
+        print(f"Completed this month: {analytics.get_completion_rate(selected_habit, 'MONTH'):.0%}")
+        print(f"Completed this year: {analytics.get_completion_rate(selected_habit, 'YEAR'):.0%}")
             
         print("\nActions:")
         print("1. Mark task completed")
@@ -129,11 +141,10 @@ def individual_habit_menu(selected_habit: Habit, habits: list[Habit]):
         selected_option = input("Select an option (1-3): ")
 
         if selected_option == '1':
-            selected_habit.mark_complete()
+            # Mark the habit and save the new completion
+            analytics.mark_habit_complete(selected_habit, habit_file)
             print("Task completed!")
             time.sleep(2)  # Pause to let user see the message
-            # Save the changes
-            analytics.save_habit_list(habits, habit_file)
 
             # Return back to main list
             break
@@ -142,10 +153,8 @@ def individual_habit_menu(selected_habit: Habit, habits: list[Habit]):
             delete_option = input("Are you sure you want to delete this habit? y/n: ")
 
             if delete_option.lower() == 'y':
-                habits.remove(selected_habit)
-
-                # Save the changes
-                analytics.save_habit_list(habits, habit_file)
+                # Remove the habit and save the changes
+                analytics.remove_habit_from_list(selected_habit, habit_file)
                 print("Habit deleted.")
                 time.sleep(3)  # Pause to let user see the message
                 break  # Exit loop to return to habit list
@@ -159,46 +168,183 @@ def individual_habit_menu(selected_habit: Habit, habits: list[Habit]):
             print("Invalid input. Please enter a valid option 1-3")
             time.sleep(3)  # Pause to let user read the message
 
+# Group the habits into the sections of the habit list
+def get_habit_sections(habits: list[Habit], query: str = "", limit: int = None):
+    """
+    Groups the habits into the sections of the habit list: the unchecked habits and one section per frequency,
+    or only the habits matching a search.
+
+    Args:
+        habits (list[Habit]): List of Habit objects.
+        query (str, optional): The search text. Defaults to showing all habits.
+        limit (int, optional): The maximum number of search matches. Defaults to all of them.
+
+    Returns:
+        list[tuple[str, list[int]]]: The title and the ascending habit indices of each section.
+    """
+    if query:
+        return [(f"Habits matching '{query}'", analytics.search(query, habit_file, limit))]
+
+    unchecked_indices, frequency_indices = analytics.classify_habits(habits)
+    sections = [
+        ("Tasks not yet checked-off", unchecked_indices),
+        ("Weekly habits", frequency_indices["WEEKLY"]),
+        ("Daily habits", frequency_indices["DAILY"]),
+        ("Monthly habits", frequency_indices["MONTHLY"]),
+    ]
+    # Every-N-days habits, grouped by their number of days
+    other_frequencies = set(frequency_indices) - set(periods.FREQUENCIES)
+    for frequency in sorted(other_frequencies, key=lambda frequency: (len(frequency), frequency)):
+        sections.append((f"{periods.get_frequency_label(frequency)} habits", frequency_indices[frequency]))
+    return sections
+
+# Count the lines of the habit list
+def count_section_lines(sections: list):
+    """
+    Counts the lines of the habit list: one title per section and one line per habit.
+
+    Args:
+        sections (list[tuple[str, list[int]]]): The sections of the habit list.
+
+    Returns:
+        int: The number of lines.
+    """
+    return sum(1 + len(indices) for _, indices in sections)
+
+# Find the page that shows a habit
+def find_habit_page(sections: list, habit_index: int, page_size: int = PAGE_SIZE):
+    """
+    Finds the first page of the habit list that shows a habit.
+
+    Args:
+        sections (list[tuple[str, list[int]]]): The sections of the habit list.
+        habit_index (int): The index of the habit.
+        page_size (int, optional): The number of lines per page.
+
+    Returns:
+        int: The page number, starting from 0, or None if no section holds the habit.
+    """
+    line = 0  # Line of the title of the current section
+    for _, indices in sections:
+        position = bisect.bisect_left(indices, habit_index)
+        if position < len(indices) and indices[position] == habit_index:
+            return (line + 1 + position) // page_size
+        line += 1 + len(indices)
+    return None
+
+# Format one page of the habit list
+def format_habit_page(habits: list[Habit], sections: list, page: int, page_size: int = PAGE_SIZE):
+    """
+    Formats one page of the habit list. Only the habits on the page are visited, so the cost
+    depends on the page size and not on the number of habits.
+
+    Args:
+        habits (list[Habit]): List of Habit objects.
+        sections (list[tuple[str, list[int]]]): The sections of the habit list.
+        page (int): The page number, starting from 0.
+        page_size (int, optional): The number of lines per page.
+
+    Returns:
+        str: The lines of the page.
+    """
+    first_line = page * page_size
+    last_line = first_line + page_size
+    lines = []
+    line = 0  # Line of the title of the current section
+    for title, indices in sections:
+        section_end = line + 1 + len(indices)
+        if section_end > first_line:
+            if line >= first_line:
+                lines.append(f"\n{title}:" if lines else f"{title}:")
+            for i in indices[max(first_line - line - 1, 0):last_line - line - 1]:
+                lines.append(f"{i+1}. {habits[i].name}")
+        if section_end >= last_line:
+            break
+        line = section_end
+    return "\n".join(lines)
+
 # List all habits
 def list_all_habits():
     """
-    Lists all habits, categorized by their status and frequency.
+    Lists all habits, categorized by their status and frequency, or only those matching a search.
+    The list is shown one page at a time.
     """
+    query = ""
+    page = 0
+    page_size = PAGE_SIZE
+    sections = None
+    search_limit = None
     while True:
+        if sections is not None and search_limit is not None and (page + 2) * page_size > search_limit:
+            sections = None  # More matches of the search are needed
+        if sections is None:
+            # Only reloaded after the habits may have changed, not when turning pages
+            habits = analytics.get_habit_list(habit_file)
+            if not habits:
+                clear()
+                print("No habits found.")
+                time.sleep(2)  # Pause to let user see the message
+                break
+            # A search only finds the matches up to the page after the shown one, so it stays fast however
+            # many habits match, and the limit grows as the pages are turned
+            search_limit = (max(page, 0) + 2) * page_size if query else None
+            sections = get_habit_sections(habits, query, search_limit)
+            if search_limit is not None and len(sections[0][1]) < search_limit:
+                search_limit = None  # Every match was found
+        page_count = max((count_section_lines(sections) + page_size - 1) // page_size, 1)
+        page = min(max(page, 0), page_count - 1)
+
+        # The whole page is written at once
         clear()
-        habits = analytics.get_habit_list(habit_file)
-        if not habits:  
-            print("No habits found.")
-            time.sleep(2)  # Pause to let user see the message
+        footer = "\nEnter an empty line to show all habits." if query else ""
+        print(format_habit_page(habits, sections, page, page_size) + footer +
+              f"\n\nPage {page+1} of {page_count}{'+' if search_limit is not None else ''} - n: next page, p: previous page, "
+              f"g N: go to habit N, s N: show N lines per page\n0. Back to Main Menu\n")
+        selected_option = input(f"Select an option (0-{len(habits)}) or type to search: ").strip()
+
+        command, _, argument = selected_option.partition(" ")
+        if selected_option.lower() == "n":
+            page += 1
+            continue
+        elif selected_option.lower() == "p":
+            page -= 1
+            continue
+        elif command.lower() in ("g", "s") and argument.strip().isdigit():
+            number = int(argument)
+            if command.lower() == "s":
+                page = page * page_size // max(number, 1)  # Keep the top line of the page in view
+                page_size = max(number, 1)
+            else:
+                if search_limit is not None and find_habit_page(sections, number - 1, page_size) is None:
+                    # The habit may match the search after the matches found so far
+                    sections = get_habit_sections(habits, query)
+                    search_limit = None
+                habit_page = find_habit_page(sections, number - 1, page_size)
+                if habit_page is None:
+                    print(f"Habit {number} is not in the list.")
+                    time.sleep(2)
+                else:
+                    page = habit_page
+            continue
+
+        try:
+            selected_int = int(selected_option)
+        except ValueError:
+            # Anything else searches the habits, and an empty line clears the search
+            query = selected_option
+            page = 0
+            sections = None
+            continue
+
+        if selected_int <= 0:
             break
+        elif selected_int > len(habits):
+            print(f"Selected habit out of range. Please enter a valid option (0-{len(habits)})")
+            time.sleep(3)
         else:
-            print("Tasks not yet checked-off:")
-            uncheck_indices = analytics.filter_habits_unchecked(habits)
-            print_out_habit_list(habits, uncheck_indices)
-
-            print("\nWeekly habits:")
-            weekly_indices = analytics.filter_habits_per_period(habits, "WEEKLY")
-            print_out_habit_list(habits, weekly_indices)
-
-            print("\nDaily habits:")
-            daily_indices = analytics.filter_habits_per_period(habits, "DAILY")
-            print_out_habit_list(habits, daily_indices)
-
-            print("\n0. Back to Main Menu\n")
-            selected_option = input(f"Select an option (0-{len(habits)}): ")
-            try:
-                selected_int = int(selected_option)
-                if selected_int <= 0:
-                    break
-                elif selected_int > len(habits):
-                    print(f"Selected habit out of range. Please enter a valid option (0-{len(habits)})")
-                    time.sleep(3)
-                else:
-                    selected_habit = habits[selected_int-1]
-                    individual_habit_menu(selected_habit, habits)
-            except ValueError:
-                print("Invalid input. Please enter an integer value.")
-                time.sleep(3)
+            selected_habit = habits[selected_int-1]
+            individual_habit_menu(selected_habit)
+            sections = None
 
 # Habits analytics
 def habits_analytics():
@@ -213,12 +359,12 @@ def habits_analytics():
         time.sleep(2)  # Pause to let user see the message
     else:
         print(f"Total number of habits: {len(habits)}")
+        best_habit_list, worst_habit_list = analytics.rank_habits(habits, 5)
+
         print("\nTop 5 longest streaks:")
-        best_habit_list = analytics.get_best_performing_tasks(habits)
         print_out_streak_top(best_habit_list, 5)
 
         print("\nTop 5 most struggling habits:")
-        worst_habit_list = analytics.get_most_struggled_tasks(habits)
         print_out_streak_top(worst_habit_list, 5)
 
         print("\nActions:")
@@ -252,4 +398,9 @@ def main_menu():
             print("Invalid choice. Please select a valid option.")
 
 if __name__ == "__main__":
-    main_menu()
+    profile_file = os.environ.get(instrumentation.PROFILE_ENVIRONMENT_VARIABLE)
+    if profile_file:
+        with instrumentation.profile(profile_file):
+            main_menu()
+    else:
+        main_menu()
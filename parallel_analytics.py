@@ -0,0 +1,173 @@
+import csv
+import glob
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from storage import load_habits
+from batch_analytics import compute_habit_stats
+from sqlite_storage import SQLITE_EXTENSIONS
+from binary_storage import BINARY_EXTENSIONS
+
+HABIT_FILE_EXTENSIONS = ('.json',) + SQLITE_EXTENSIONS + BINARY_EXTENSIONS
+DEFAULT_CHUNK_SIZE = 64  # Number of habit files each worker task processes
+
+# Columns of the report, in order
+SUMMARY_FIELDS = [
+    'file',
+    'habits',
+    'daily_habits',
+    'weekly_habits',
+    'completions',
+    'unchecked_habits',
+    'best_habit',
+    'best_current_streak',
+    'longest_streak',
+    'mean_completion_rate',
+    'error',
+]
+
+
+def find_habit_files(path_or_pattern: str):
+    """
+    Finds habit files from a directory or a glob pattern.
+
+    Args:
+        path_or_pattern (str): A directory, whose habit files are all used, or a glob pattern such as 'users/*.json'.
+
+    Returns:
+        list[str]: The sorted paths of the habit files.
+    """
+    if os.path.isdir(path_or_pattern):
+        return sorted(
+            os.path.join(path_or_pattern, name) for name in os.listdir(path_or_pattern)
+            if name.lower().endswith(HABIT_FILE_EXTENSIONS))
+    return sorted(glob.glob(path_or_pattern, recursive=True))
+
+
+def summarize_habit_file(habit_file: str, current_date: datetime = None):
+    """
+    Loads one habit file and computes a compact summary of its habits, streaks and unchecked habits.
+
+    Args:
+        habit_file (str): The path to the habit file.
+        current_date (datetime, optional): The moment to compute the analytics for. Defaults to now.
+
+    Returns:
+        dict: The summary, with the keys in SUMMARY_FIELDS. Files that cannot be read get an 'error'.
+    """
+    summary = dict.fromkeys(SUMMARY_FIELDS)
+    summary['file'] = habit_file
+    try:
+        habits = load_habits(habit_file)
+        habits_stats = compute_habit_stats(habits, current_date)
+    except Exception as e:  # Report broken files instead of failing the whole run
+        summary['error'] = f"{type(e).__name__}: {e}"
+        return summary
+
+    summary['habits'] = len(habits)
+    summary['daily_habits'] = sum(1 for habit in habits if habit.frequency == "DAILY")
+    summary['weekly_habits'] = sum(1 for habit in habits if habit.frequency == "WEEKLY")
+    summary['completions'] = sum(len(habit.get_packed_dates()[0]) for habit in habits)
+    summary['unchecked_habits'] = sum(1 for habit_stats in habits_stats if not habit_stats.completed)
+    summary['longest_streak'] = max((habit_stats.longest_streak for habit_stats in habits_stats), default=0)
+    if habits:
+        best_index = max(range(len(habits)), key=lambda i: habits_stats[i].current_streak)
+        summary['best_habit'] = habits[best_index].name
+        summary['best_current_streak'] = habits_stats[best_index].current_streak
+        summary['mean_completion_rate'] = sum(habit_stats.completion_rate for habit_stats in habits_stats) / len(habits)
+    return summary
+
+
+def _summarize_chunk(habit_files: list[str], current_date: datetime):
+    """
+    Summarizes a chunk of habit files in a worker process.
+
+    Args:
+        habit_files (list[str]): The paths to the habit files.
+        current_date (datetime): The moment to compute the analytics for.
+
+    Returns:
+        list[dict]: The summaries, in the order of the files.
+    """
+    return [summarize_habit_file(habit_file, current_date) for habit_file in habit_files]
+
+
+def analyze_habit_files(habit_files: list[str], workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        current_date: datetime = None):
+    """
+    Summarizes many habit files, sharding them in chunks across a pool of worker processes.
+
+    Args:
+        habit_files (list[str]): The paths to the habit files.
+        workers (int, optional): Number of worker processes. Defaults to the number of CPUs;
+            1 runs everything in the current process.
+        chunk_size (int, optional): Number of habit files per worker task.
+        current_date (datetime, optional): The moment to compute the analytics for. Defaults to now.
+
+    Returns:
+        list[dict]: The summaries, in the order of the files.
+    """
+    if current_date is None:
+        # Use the same moment in every worker
+        current_date = datetime.today()
+
+    chunks = [habit_files[i:i + chunk_size] for i in range(0, len(habit_files), chunk_size)]
+    if workers == 1 or len(chunks) <= 1:
+        return [summary for chunk in chunks for summary in _summarize_chunk(chunk, current_date)]
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunk_summaries = executor.map(_summarize_chunk, chunks, [current_date] * len(chunks))
+        return [summary for summaries in chunk_summaries for summary in summaries]
+
+
+def write_report(summaries: list[dict], output_file, report_format: str = 'json'):
+    """
+    Writes the merged summaries as a single JSON or CSV report.
+
+    Args:
+        summaries (list[dict]): The summaries of the habit files.
+        output_file: An open text file to write to.
+        report_format (str): 'json' or 'csv'.
+
+    Raises:
+        ValueError: If the format is not supported.
+    """
+    if report_format == 'json':
+        totals = {
+            'files': len(summaries),
+            'failed_files': sum(1 for summary in summaries if summary['error']),
+            'habits': sum(summary['habits'] or 0 for summary in summaries),
+            'completions': sum(summary['completions'] or 0 for summary in summaries),
+            'unchecked_habits': sum(summary['unchecked_habits'] or 0 for summary in summaries),
+        }
+        json.dump({'totals': totals, 'files': summaries}, output_file, indent=4)
+        output_file.write('\n')
+    elif report_format == 'csv':
+        writer = csv.DictWriter(output_file, fieldnames=SUMMARY_FIELDS)
+        writer.writeheader()
+        writer.writerows(summaries)
+    else:
+        raise ValueError(f"Unsupported report format: {report_format}")
+
+
+if __name__ == "__main__":
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Summarize many habit files in parallel.")
+    parser.add_argument('paths', nargs='+', help="habit files, directories or glob patterns")
+    parser.add_argument('--workers', type=int, default=None, help="number of worker processes (default: CPU count)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help="habit files per worker task")
+    parser.add_argument('--format', choices=['json', 'csv'], default='json', help="report format")
+    parser.add_argument('--output', default=None, help="report file (default: standard output)")
+    args = parser.parse_args()
+
+    habit_files = [habit_file for path in args.paths for habit_file in find_habit_files(path)]
+    summaries = analyze_habit_files(habit_files, args.workers, args.chunk_size)
+
+    if args.output is None:
+        write_report(summaries, sys.stdout, args.format)
+    else:
+        with open(args.output, 'w', newline='') as file:
+            write_report(summaries, file, args.format)
@@ -0,0 +1,282 @@
+import re
+from array import array
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY")  # Fixed frequencies; every-N-days frequencies are written EVERY_<N>_DAYS
+_EVERY_N_DAYS = re.compile(r"EVERY_([1-9][0-9]*)_DAYS")
+
+
+class Period:
+    """
+    Maps days to integer period keys for one habit frequency.
+
+    Consecutive periods map to consecutive integers, so streaks can be counted by comparing keys,
+    and every period covers a contiguous range of days.
+    """
+
+    __slots__ = ()
+
+    def key(self, ordinal: int):
+        """
+        Maps a proleptic Gregorian day ordinal (as returned by date.toordinal) to the key of its period.
+
+        Args:
+            ordinal (int): The day ordinal to map.
+
+        Returns:
+            int: The period key.
+        """
+        raise NotImplementedError
+
+    def keys(self, ordinals):
+        """
+        Maps sorted day ordinals to the sorted, distinct keys of their periods.
+
+        Args:
+            ordinals (Iterable[int]): Day ordinals, in ascending order.
+
+        Returns:
+            array: The period keys.
+        """
+        # Keys of sorted ordinals never decrease, so dict.fromkeys drops repeats and keeps the order
+        return array('i', dict.fromkeys(map(self.key, ordinals)))
+
+    def day_range(self, key: int):
+        """
+        Returns the days a period covers.
+
+        Args:
+            key (int): The period key.
+
+        Returns:
+            tuple[int, int]: Day ordinals of the first and the last day of the period.
+        """
+        raise NotImplementedError
+
+    def step_back(self, moment: datetime, periods: int):
+        """
+        Moves a moment back by whole periods, keeping its position within the period.
+
+        Args:
+            moment (datetime): The moment to move.
+            periods (int): Number of periods to move back.
+
+        Returns:
+            datetime: The moved moment.
+        """
+        raise NotImplementedError
+
+    def count_reachable_periods(self, created: datetime, current_date: datetime):
+        """
+        Counts the periods reached when stepping back from current_date one period at a time
+        without passing the creation date of the habit. The current streak is capped at this count.
+
+        Args:
+            created (datetime): The date and time when the habit was created.
+            current_date (datetime): The moment to count from.
+
+        Returns:
+            int: The number of reachable periods, 0 if current_date is before created.
+        """
+        if current_date < created:
+            return 0
+        periods = self.key(current_date.toordinal()) - self.key(created.toordinal())
+        if self.step_back(current_date, periods) < created:
+            periods -= 1
+        return periods + 1
+
+
+class _FixedLengthPeriod(Period):
+    """
+    Periods of a fixed number of days, starting at a given day ordinal.
+    """
+
+    __slots__ = ('days', 'start')
+
+    def __init__(self, days: int, start: int):
+        self.days = days
+        self.start = start
+
+    def __eq__(self, other):
+        # Equal periods map days to the same keys, so what was cached for one stays valid for the other
+        if other is self:
+            return True
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.days == other.days and self.start == other.start
+
+    def __hash__(self):
+        return hash((type(self), self.days, self.start))
+
+    def key(self, ordinal: int):
+        return (ordinal - self.start) // self.days
+
+    def keys(self, ordinals):
+        if self.days == 1 and self.start == 0:
+            # The keys are the ordinals, which only repeat if a day was completed twice
+            if len(set(ordinals)) == len(ordinals):
+                return array('i', ordinals)
+            return array('i', dict.fromkeys(ordinals))
+        start, days = self.start, self.days
+        return array('i', dict.fromkeys([(ordinal - start) // days for ordinal in ordinals]))
+
+    def day_range(self, key: int):
+        first_ordinal = self.start + key * self.days
+        return first_ordinal, first_ordinal + self.days - 1
+
+    def step_back(self, moment: datetime, periods: int):
+        return moment - timedelta(days=periods * self.days)
+
+    def count_reachable_periods(self, created: datetime, current_date: datetime):
+        if current_date < created:
+            return 0
+        # Stepping back by a fixed length lands on the oldest moment directly
+        step = timedelta(days=self.days)
+        oldest_date = current_date - ((current_date - created) // step) * step
+        return self.key(current_date.toordinal()) - self.key(oldest_date.toordinal()) + 1
+
+
+class DailyPeriod(_FixedLengthPeriod):
+    """
+    One period per calendar day; the key is the day ordinal.
+    """
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1, 0)
+
+
+class WeeklyPeriod(_FixedLengthPeriod):
+    """
+    One period per ISO calendar week, from Monday to Sunday.
+    """
+
+    __slots__ = ()
+
+    def __init__(self):
+        # Ordinal 1 (0001-01-01) is a Monday, so this counts ISO weeks
+        super().__init__(7, 1)
+
+
+class EveryNDaysPeriod(_FixedLengthPeriod):
+    """
+    Periods of N days, anchored at the day the habit was created.
+    """
+
+    __slots__ = ()
+
+
+class MonthlyPeriod(Period):
+    """
+    One period per calendar month; the key is year * 12 + month - 1.
+    """
+
+    __slots__ = ()
+
+    def key(self, ordinal: int):
+        day = date.fromordinal(ordinal)
+        return day.year * 12 + day.month - 1
+
+    def day_range(self, key: int):
+        year, month = divmod(key, 12)
+        next_year, next_month = divmod(key + 1, 12)
+        return date(year, month + 1, 1).toordinal(), date(next_year, next_month + 1, 1).toordinal() - 1
+
+    def step_back(self, moment: datetime, periods: int):
+        year, month = divmod(moment.year * 12 + moment.month - 1 - periods, 12)
+        first_ordinal, last_ordinal = self.day_range(year * 12 + month)
+        # Keep the day of the month, or use the last day of shorter months
+        day = min(moment.day, last_ordinal - first_ordinal + 1)
+        return moment.replace(year=year, month=month + 1, day=day)
+
+
+_DAILY = DailyPeriod()
+_WEEKLY = WeeklyPeriod()
+_MONTHLY = MonthlyPeriod()
+
+
+def every_n_days_frequency(days: int):
+    """
+    Builds the frequency string of a habit repeated every given number of days.
+
+    Args:
+        days (int): The length of the period in days, at least 1.
+
+    Returns:
+        str: The frequency string, e.g. 'EVERY_3_DAYS'.
+
+    Raises:
+        ValueError: If the number of days is less than 1.
+    """
+    if days < 1:
+        raise ValueError(f"A habit cannot repeat every {days} days")
+    return f"EVERY_{days}_DAYS"
+
+
+def is_supported_frequency(frequency: str):
+    """
+    Checks if a frequency string is one of the supported frequencies.
+
+    Args:
+        frequency (str): The habit frequency.
+
+    Returns:
+        bool: True if the frequency is supported, False otherwise.
+    """
+    return frequency in FREQUENCIES or _EVERY_N_DAYS.fullmatch(frequency) is not None
+
+
+def get_frequency_label(frequency: str):
+    """
+    Returns a readable label of a frequency, e.g. 'Daily' or 'Every 3 days'.
+
+    Args:
+        frequency (str): The habit frequency.
+
+    Returns:
+        str: The label.
+    """
+    match = _EVERY_N_DAYS.fullmatch(frequency)
+    if match is not None:
+        return f"Every {match.group(1)} days"
+    return frequency.capitalize()
+
+
+def get_period(frequency: str, created: datetime = None):
+    """
+    Returns the period strategy of a habit frequency.
+
+    Args:
+        frequency (str): The habit frequency: 'DAILY', 'WEEKLY', 'MONTHLY' or 'EVERY_<N>_DAYS'.
+        created (datetime, optional): The creation date of the habit, where every-N-days periods start.
+
+    Returns:
+        Period: The period strategy, or None if the frequency is not supported.
+    """
+    if frequency == "DAILY":
+        return _DAILY
+    elif frequency == "WEEKLY":
+        return _WEEKLY
+    elif frequency == "MONTHLY":
+        return _MONTHLY
+    return _get_every_n_days_period(frequency, created.toordinal() if created is not None else 1)
+
+
+@lru_cache(maxsize=1024)
+def _get_every_n_days_period(frequency: str, start: int):
+    """
+    Returns the shared every-N-days period strategy for a frequency and start day.
+
+    Args:
+        frequency (str): The habit frequency.
+        start (int): Day ordinal of the first day of the first period.
+
+    Returns:
+        EveryNDaysPeriod: The period strategy, or None if the frequency is not an every-N-days frequency.
+    """
+    match = _EVERY_N_DAYS.fullmatch(frequency)
+    if match is None:
+        return None
+    return EveryNDaysPeriod(int(match.group(1)), start)
@@ -0,0 +1,219 @@
+import os
+from datetime import datetime
+from Habit import Habit
+from search_index import SearchIndex
+import storage
+
+
+class HabitRepository:
+    """
+    Keeps the habits of one habit file in memory, keyed by name.
+
+    The file is only parsed again when its modification time or size changes, and changes made
+    through the repository are written with the cheapest write the storage backend offers.
+    Every change reloads, modifies and writes the file under an exclusive lock, so changes made
+    by other processes at the same time are not lost.
+    """
+
+    def __init__(self, habit_file: str):
+        """
+        Initializes an empty repository for the given habit file. Nothing is loaded until first use.
+
+        Args:
+            habit_file (str): The path to the habit file.
+        """
+        self.habit_file = habit_file
+        self._habits = {}  # Habits by name, in file order
+        self._signature = None  # Modification time and size of the files at the last load or save
+        self._generation = None  # Generation counter of the habit file at the last load or save
+        self._index = None  # Search index of the habits, built on first search after a change of names
+
+    def _file_signature(self):
+        """
+        Returns the modification time and size of the habit file and the files stored next to it.
+
+        Returns:
+            tuple: One (mtime, size) pair per file, or None for files that do not exist.
+        """
+        signature = []
+        for path in (self.habit_file, storage.get_journal_file(self.habit_file), storage.get_lock_file(self.habit_file)):
+            try:
+                stat = os.stat(path)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def refresh(self):
+        """
+        Reloads the habits if the habit file changed since it was last loaded or saved.
+
+        Returns:
+            bool: True if the habits were reloaded, False otherwise.
+        """
+        # Under the lock, a save by another process is either fully visible in the signature or not at all
+        with storage.lock_habit_file(self.habit_file, shared=True):
+            signature = self._file_signature()
+            if signature == self._signature:
+                return False
+
+            habits, self._generation = storage.load_habits_and_generation(self.habit_file)
+        self._habits = {habit.name: habit for habit in habits}
+        self._signature = signature
+        self._index = None
+        return True
+
+    def adopt(self, habits: list[Habit]):
+        """
+        Takes the given habits as the current contents of the habit file, after they were saved by the caller.
+
+        Args:
+            habits (list[Habit]): The list of Habit objects that was saved.
+        """
+        self._habits = {habit.name: habit for habit in habits}
+        self._signature = self._file_signature()
+        self._generation = storage.read_generation(self.habit_file)
+        self._index = None
+
+    def save(self, habits: list[Habit]):
+        """
+        Saves a whole list of habits, such as one returned by list() and changed since. Completions and habits
+        saved by other processes after the list was loaded are merged into the list instead of being overwritten,
+        and habits removed from the list are deleted.
+
+        Args:
+            habits (list[Habit]): The list of Habit objects to save.
+        """
+        # The generation and names of the last load only describe the list if it was built from that load:
+        # its loaded habits are the same objects, while habits may have been added to it or removed from it
+        is_current = all(self._habits.get(habit.name, habit) is habit for habit in habits)
+        with storage.lock_habit_file(self.habit_file):
+            if is_current:
+                storage.save_habits_merged(habits, self.habit_file, self._generation, set(self._habits))
+            else:
+                storage.save_habits_merged(habits, self.habit_file)
+            self.adopt(habits)
+
+    def list(self):
+        """
+        Returns the habits in file order.
+
+        Returns:
+            list: The list of Habit objects.
+        """
+        self.refresh()
+        return list(self._habits.values())
+
+    def get(self, habit_name: str):
+        """
+        Looks up a habit by name.
+
+        Args:
+            habit_name (str): The name of the habit.
+
+        Returns:
+            Habit: The habit with the given name, or None if there is no such habit.
+        """
+        self.refresh()
+        return self._habits.get(habit_name)
+
+    def search(self, query: str, limit: int = None):
+        """
+        Finds habits by the start of their name or of the words in their name and description.
+        The search index is built once per load and reused until habits are added or removed.
+
+        Args:
+            query (str): The search text. Case is ignored.
+            limit (int, optional): The maximum number of results. Defaults to all of them.
+
+        Returns:
+            list[int]: Indices of the matching habits in the list returned by list().
+        """
+        self.refresh()
+        if self._index is None:
+            self._index = SearchIndex(list(self._habits.values()))
+        return self._index.search(query, limit)
+
+    def __contains__(self, habit_name: str):
+        self.refresh()
+        return habit_name in self._habits
+
+    def __len__(self):
+        self.refresh()
+        return len(self._habits)
+
+    def add(self, habit: Habit):
+        """
+        Adds a new habit and saves it.
+
+        Args:
+            habit (Habit): The new habit. Its name must not be in use.
+
+        Raises:
+            ValueError: If a habit with the same name already exists.
+        """
+        with storage.lock_habit_file(self.habit_file):
+            self.refresh()
+            if habit.name in self._habits:
+                raise ValueError(f"Habit '{habit.name}' already exists")
+
+            self._habits[habit.name] = habit
+            self._index = None
+            storage.save_new_habit(habit, list(self._habits.values()), self.habit_file)
+            self._synced()
+
+    def remove(self, habit: Habit):
+        """
+        Deletes a habit and saves the deletion. Does nothing if the habit is already gone.
+
+        Args:
+            habit (Habit): The habit to delete.
+
+        Returns:
+            bool: True if the habit was deleted, False otherwise.
+        """
+        with storage.lock_habit_file(self.habit_file):
+            self.refresh()
+            if self._habits.pop(habit.name, None) is None:
+                return False
+            self._index = None
+
+            storage.save_deletion(habit, list(self._habits.values()), self.habit_file)
+            self._synced()
+        return True
+
+    def mark_complete(self, habit: Habit, current_date: datetime = None):
+        """
+        Marks a habit as complete and saves the completion, unless the period is already marked.
+
+        Args:
+            habit (Habit): The habit to mark as complete.
+            current_date (datetime, optional): The date and time of the completion. Defaults to now.
+
+        Returns:
+            bool: True if a completion was added and saved, False otherwise.
+        """
+        if current_date is None:
+            current_date = datetime.today()
+
+        with storage.lock_habit_file(self.habit_file):
+            self.refresh()
+            stored_habit = self._habits.get(habit.name)
+            if stored_habit is None:
+                return False
+            if stored_habit is not habit:
+                # The file was reloaded since the caller got the habit
+                habit.mark_complete(current_date)
+            if not stored_habit.mark_complete(current_date):
+                return False
+
+            storage.save_completion(stored_habit, list(self._habits.values()), self.habit_file, current_date)
+            self._synced()
+        return True
+
+    def _synced(self):
+        """
+        Records the signature and generation of the habit file after a write through the repository.
+        """
+        self._signature = self._file_signature()
+        self._generation = storage.read_generation(self.habit_file)
@@ -0,0 +1,231 @@
+from datetime import date
+
+GRANULARITIES = ("WEEK", "MONTH", "YEAR")
+
+
+def bucket_key(granularity: str, ordinal: int):
+    """
+    Maps a day to the integer key of its ISO week, month or year.
+
+    Args:
+        granularity (str): 'WEEK', 'MONTH' or 'YEAR'.
+        ordinal (int): The day ordinal (as returned by date.toordinal).
+
+    Returns:
+        int: The bucket key; consecutive buckets have consecutive keys.
+    """
+    if granularity == "WEEK":
+        return (ordinal - 1) // 7  # Ordinal 1 (0001-01-01) is a Monday, as in periods.WeeklyPeriod
+    day = date.fromordinal(ordinal)
+    if granularity == "MONTH":
+        return day.year * 12 + day.month - 1
+    return day.year
+
+
+def bucket_day_range(granularity: str, key: int):
+    """
+    Returns the days a bucket covers.
+
+    Args:
+        granularity (str): 'WEEK', 'MONTH' or 'YEAR'.
+        key (int): The bucket key.
+
+    Returns:
+        tuple[int, int]: Day ordinals of the first and the last day of the bucket.
+    """
+    if granularity == "WEEK":
+        return key * 7 + 1, key * 7 + 7
+    if granularity == "MONTH":
+        year, month = divmod(key, 12)
+        next_year, next_month = divmod(key + 1, 12)
+        return date(year, month + 1, 1).toordinal(), date(next_year, next_month + 1, 1).toordinal() - 1
+    return date(key, 1, 1).toordinal(), date(key, 12, 31).toordinal()
+
+
+def format_bucket(granularity: str, key: int):
+    """
+    Formats a bucket key as a label, e.g. '2024-W26', '2024-06' or '2024'.
+
+    Args:
+        granularity (str): 'WEEK', 'MONTH' or 'YEAR'.
+        key (int): The bucket key.
+
+    Returns:
+        str: The label.
+    """
+    if granularity == "WEEK":
+        year, week, _ = date.fromordinal(key * 7 + 1).isocalendar()
+        return f"{year}-W{week:02d}"
+    if granularity == "MONTH":
+        year, month = divmod(key, 12)
+        return f"{year}-{month + 1:02d}"
+    return str(key)
+
+
+def parse_bucket(granularity: str, label: str):
+    """
+    Parses a label written by format_bucket back into a bucket key.
+
+    Args:
+        granularity (str): 'WEEK', 'MONTH' or 'YEAR'.
+        label (str): The label.
+
+    Returns:
+        int: The bucket key.
+
+    Raises:
+        ValueError: If the label is not a valid label of the granularity.
+    """
+    if granularity == "WEEK":
+        year, week = label.split('-W')
+        return bucket_key(granularity, date.fromisocalendar(int(year), int(week), 1).toordinal())
+    if granularity == "MONTH":
+        year, month = label.split('-')
+        if not 1 <= int(month) <= 12:
+            raise ValueError(f"Invalid month: {label}")
+        return int(year) * 12 + int(month) - 1
+    return int(label)
+
+
+class Rollups:
+    """
+    Completion counts of one habit by ISO week, month and year.
+
+    The counts are completed periods of the habit's own frequency, each counted in the buckets holding
+    the first day of the period, so a weekly habit counts at most once per week and a daily habit once per day.
+    """
+
+    __slots__ = ('period', 'weeks', 'months', 'years')
+
+    def __init__(self, period):
+        """
+        Initializes empty rollups.
+
+        Args:
+            period (Period): The period strategy of the habit, or None if its frequency is not supported.
+        """
+        self.period = period
+        self.weeks = {}  # Week key -> completed periods
+        self.months = {}  # Month key -> completed periods
+        self.years = {}  # Year -> completed periods
+
+    def counts(self, granularity: str):
+        """
+        Returns the counts of one granularity.
+
+        Args:
+            granularity (str): 'WEEK', 'MONTH' or 'YEAR'.
+
+        Returns:
+            dict[int, int]: Completed periods by bucket key.
+        """
+        if granularity == "WEEK":
+            return self.weeks
+        if granularity == "MONTH":
+            return self.months
+        if granularity == "YEAR":
+            return self.years
+        raise ValueError(f"Unsupported granularity: {granularity} (use WEEK, MONTH or YEAR)")
+
+    def add_period(self, first_ordinal: int):
+        """
+        Counts a newly completed period.
+
+        Args:
+            first_ordinal (int): Day ordinal of the first day of the period.
+        """
+        week_key = (first_ordinal - 1) // 7
+        self.weeks[week_key] = self.weeks.get(week_key, 0) + 1
+        day = date.fromordinal(first_ordinal)
+        month_key = day.year * 12 + day.month - 1
+        self.months[month_key] = self.months.get(month_key, 0) + 1
+        self.years[day.year] = self.years.get(day.year, 0) + 1
+
+    @classmethod
+    def build(cls, period, keys):
+        """
+        Builds the rollups from the completed period keys of a habit.
+
+        Args:
+            period (Period): The period strategy of the habit, or None if its frequency is not supported.
+            keys (Iterable[int]): The sorted, distinct keys of the completed periods.
+
+        Returns:
+            Rollups: The rollups.
+        """
+        rollups = cls(period)
+        if period is not None:
+            for key in keys:
+                rollups.add_period(period.day_range(key)[0])
+        return rollups
+
+    def to_dict(self):
+        """
+        Converts the counts to a compact dictionary. Each granularity is written as the label of its first bucket
+        followed by the counts of consecutive buckets, e.g. '2024-05:28,30' for May and June 2024.
+
+        Returns:
+            dict: The counts by 'weeks', 'months' and 'years'.
+        """
+        return {
+            'weeks': _format_counts("WEEK", self.weeks),
+            'months': _format_counts("MONTH", self.months),
+            'years': _format_counts("YEAR", self.years),
+        }
+
+    @classmethod
+    def from_dict(cls, period, data):
+        """
+        Creates rollups from a dictionary written by to_dict.
+
+        Args:
+            period (Period): The period strategy of the habit.
+            data (dict): The counts by 'weeks', 'months' and 'years'.
+
+        Returns:
+            Rollups: The rollups.
+
+        Raises:
+            ValueError: If the counts cannot be read.
+        """
+        rollups = cls(period)
+        rollups.weeks = _parse_counts("WEEK", data['weeks'])
+        rollups.months = _parse_counts("MONTH", data['months'])
+        rollups.years = _parse_counts("YEAR", data['years'])
+        return rollups
+
+
+def _format_counts(granularity: str, counts: dict):
+    """
+    Writes counts as the label of the first bucket and the counts of all buckets up to the last one.
+
+    Args:
+        granularity (str): 'WEEK', 'MONTH' or 'YEAR'.
+        counts (dict[int, int]): Counts by bucket key.
+
+    Returns:
+        str: The counts, e.g. '2024-W22:1,0,3', or an empty string if there are none.
+    """
+    if not counts:
+        return ""
+    first_key = min(counts)
+    return format_bucket(granularity, first_key) + ":" + ",".join(
+        str(counts.get(key, 0)) for key in range(first_key, max(counts) + 1))
+
+
+def _parse_counts(granularity: str, text: str):
+    """
+    Reads counts written by _format_counts.
+
+    Args:
+        granularity (str): 'WEEK', 'MONTH' or 'YEAR'.
+        text (str): The written counts.
+
+    Returns:
+        dict[int, int]: Counts by bucket key, without the empty buckets.
+    """
+    if not text:
+        return {}
+    label, _, values = text.partition(":")
+    first_key = parse_bucket(granularity, label)
+    return {first_key + offset: int(count) for offset, count in enumerate(values.split(",")) if count != "0"}
@@ -0,0 +1,141 @@
+import heapq
+import re
+from bisect import bisect_left
+from collections import defaultdict
+from functools import partial
+from itertools import accumulate, groupby, islice
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_LAST_CHARACTER = chr(0x10FFFF)  # Sorts after every string with the same prefix
+
+
+def tokenize(text: str):
+    """
+    Splits a text into case-insensitive words.
+
+    Args:
+        text (str): The text, e.g. a habit name or description.
+
+    Returns:
+        list[str]: The words, case-folded, in text order.
+    """
+    return _TOKEN_PATTERN.findall(text.casefold())
+
+
+def _prefix_range(sorted_strings: list[str], prefix: str):
+    """
+    Finds the strings that start with a prefix.
+
+    Args:
+        sorted_strings (list[str]): The strings, in ascending order.
+        prefix (str): The prefix.
+
+    Returns:
+        tuple[int, int]: The first position of a match and the position after the last one.
+    """
+    return bisect_left(sorted_strings, prefix), bisect_left(sorted_strings, prefix + _LAST_CHARACTER)
+
+
+class SearchIndex:
+    """
+    Finds habits by the start of their name or of the words in their name and description.
+
+    The names and the distinct words are kept in sorted lists, so a lookup is a binary search
+    followed by the matches only, whatever the number of habits. Building the index visits every
+    word of every habit, so it is built once and reused for many searches.
+    """
+
+    __slots__ = ('_names', '_name_positions', '_tokens', '_token_positions', '_posting_counts', '_habit_texts')
+
+    def __init__(self, habits):
+        """
+        Builds the index of a list of habits.
+
+        Args:
+            habits (list[Habit]): The habits; results are positions in this list.
+        """
+        named = sorted((habit.name.casefold(), position) for position, habit in enumerate(habits))
+        self._names = [name for name, _ in named]  # Case-folded names, in ascending order
+        self._name_positions = [position for _, position in named]  # Position of the habit of each name
+        token_positions = defaultdict(list)  # Word -> positions of the habits using it, in ascending order
+        # Distinct words of each habit, each after a space, so ' ' + prefix is found in it if a word starts with prefix
+        self._habit_texts = []
+        for position, habit in enumerate(habits):
+            tokens = set(tokenize(habit.name + " " + habit.description))
+            self._habit_texts.append(" " + " ".join(tokens))
+            for token in tokens:
+                token_positions[token].append(position)
+        self._tokens = sorted(token_positions)
+        self._token_positions = [token_positions[token] for token in self._tokens]
+        # Prefix sums of the number of positions per word, so the size of a prefix range is known without visiting it
+        self._posting_counts = [0, *accumulate(map(len, self._token_positions))]
+
+    def find_by_name_prefix(self, prefix: str):
+        """
+        Finds the habits whose name starts with a prefix, ignoring case.
+
+        Args:
+            prefix (str): The start of the name.
+
+        Returns:
+            list[int]: Positions of the matching habits, in ascending order.
+        """
+        start, end = _prefix_range(self._names, prefix.casefold())
+        return sorted(self._name_positions[start:end])
+
+    def _find_by_token_prefix(self, prefix: str, limit: int = None):
+        """
+        Finds the habits with a word in their name or description that starts with a prefix.
+
+        Args:
+            prefix (str): The case-folded start of the word.
+            limit (int, optional): About how many positions will be read. Defaults to all of them.
+
+        Returns:
+            Iterable[int]: Positions of the matching habits, in ascending order. With a limit, they are
+            only found as far as they are read.
+        """
+        start, end = _prefix_range(self._tokens, prefix)
+        if end - start == 1:
+            return self._token_positions[start]
+        if limit is None:
+            return sorted({position for token_positions in self._token_positions[start:end] for position in token_positions})
+        # Merging many short lists costs more than reading the habits in order until enough of them match,
+        # which takes about limit * habits / postings steps
+        postings = self._posting_counts[end] - self._posting_counts[start]
+        if (end - start) * postings > limit * len(self._habit_texts):
+            return (position for position, text in enumerate(self._habit_texts) if " " + prefix in text)
+        return (position for position, _ in groupby(heapq.merge(*self._token_positions[start:end])))
+
+    def _count_postings(self, prefix: str):
+        start, end = _prefix_range(self._tokens, prefix)
+        return self._posting_counts[end] - self._posting_counts[start]
+
+    def _has_token_prefix(self, prefix: str, position: int):
+        return " " + prefix in self._habit_texts[position]
+
+    def search(self, query: str, limit: int = None):
+        """
+        Finds the habits that have words starting with each word of the query, e.g. 'run morn' finds a habit
+        described as 'Running in the morning'. This includes every habit whose name starts with the query.
+
+        Args:
+            query (str): The search text. Case is ignored.
+            limit (int, optional): The maximum number of results. Defaults to all of them.
+
+        Returns:
+            list[int]: Positions of the matching habits, in ascending order.
+        """
+        query = query.strip()
+        query_tokens = sorted(set(tokenize(query)), key=self._count_postings)
+        if not query_tokens:
+            # Only punctuation, which the words leave out
+            return self.find_by_name_prefix(query)[:limit] if query else []
+
+        # Candidates come from the rarest word and are narrowed down by the other words, rarest first,
+        # only as far as the limit needs
+        first_token, other_tokens = query_tokens[0], query_tokens[1:]
+        matches = self._find_by_token_prefix(first_token, limit)
+        for token in other_tokens:
+            matches = filter(partial(self._has_token_prefix, token), matches)
+        return list(islice(matches, limit))
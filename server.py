@@ -0,0 +1,374 @@
+import asyncio
+import json
+from datetime import date, datetime
+from urllib.parse import unquote, urlsplit
+from Habit import Habit
+import analytics
+import storage
+
+DEFAULT_PORT = 8765
+SAVE_DELAY = 0.5  # Seconds to wait for more writes before saving, so bursts of writes are saved once
+MAX_BODY_SIZE = 64 * 1024
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+
+class HttpError(Exception):
+    """
+    An error answered with an HTTP status code and a JSON error message.
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class HabitServer:
+    """
+    Serves the habits of one habit file over HTTP/JSON.
+
+    The habits are loaded once and kept in memory. Reads are answered directly from the in-memory habits,
+    with the serialized list and analytics cached until the next write. Writes are queued to a single
+    writer task, which applies them in order and saves the habit file once per burst of writes,
+    merging in whatever other processes saved to the file in the meantime.
+    """
+
+    def __init__(self, habit_file: str, save_delay: float = SAVE_DELAY):
+        """
+        Initializes the server for the given habit file. Nothing is loaded until the server starts.
+
+        Args:
+            habit_file (str): The path to the habit file.
+            save_delay (float): Seconds to wait for more writes before saving.
+        """
+        self.habit_file = habit_file
+        self.save_delay = save_delay
+        self.habits = []
+        self._habits_by_name = {}
+        self._version = 0  # Increased by every write, to invalidate the cached responses
+        self._cache = {}  # Serialized responses by path, valid for self._cache_state
+        self._cache_state = None  # The write version and the day the cached responses were built for
+        self._writes = None  # Queue of (habit name, current_date, future) completions for the writer task
+        self._pending_saves = 0  # Writes applied but not saved yet
+        self._saved_version = 0  # The write version in the habit file
+        self._generation = None  # Generation counter of the habit file at the last load or save
+        self._writer = None
+        self._server = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = DEFAULT_PORT):
+        """
+        Loads the habits and starts listening.
+
+        Args:
+            host (str): The address to listen on.
+            port (int): The port to listen on, 0 for any free port.
+
+        Returns:
+            int: The port the server listens on.
+        """
+        loop = asyncio.get_running_loop()
+        self.habits, self._generation = await loop.run_in_executor(None, storage.load_habits_and_generation, self.habit_file)
+        self._habits_by_name = {habit.name: habit for habit in self.habits}
+        self._writes = asyncio.Queue()
+        self._writer = asyncio.create_task(self._write_loop())
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        Stops listening, applies the queued writes and saves them.
+        """
+        self._server.close()
+        await self._server.wait_closed()
+        await self._writes.join()
+        self._writer.cancel()
+        try:
+            await self._writer
+        except asyncio.CancelledError:
+            pass
+
+    async def serve_forever(self):
+        """
+        Serves requests until the task is cancelled.
+        """
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _write_loop(self):
+        """
+        Applies queued writes one at a time and saves them once no more writes arrive within save_delay.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._apply_write(await self._writes.get())
+            # Coalesce: keep applying writes until the queue stays empty for save_delay
+            while True:
+                try:
+                    write = await asyncio.wait_for(self._writes.get(), self.save_delay)
+                except asyncio.TimeoutError:
+                    break
+                await self._apply_write(write)
+            if self._saved_version != self._version:
+                # Readers keep being served while the file is written; no writes are applied meanwhile.
+                # The habits are serialized here on the loop, so the saving thread never touches the habits
+                # the readers use, and merged changes come back as new habits swapped in on the loop
+                version = self._version
+                habit_dicts = [habit.to_dict() for habit in self.habits]
+                generation, saved_habits = await loop.run_in_executor(
+                    None, _save_habit_dicts, habit_dicts, self.habit_file, self._generation)
+                if generation != self._generation + 1:
+                    # Changes saved by other processes were merged into the saved habits
+                    self.habits = saved_habits
+                    self._habits_by_name = {habit.name: habit for habit in self.habits}
+                    self._version += 1
+                    version = self._version
+                self._generation = generation
+                self._saved_version = version
+            for _ in range(self._pending_saves):
+                self._writes.task_done()
+            self._pending_saves = 0
+
+    async def _apply_write(self, write: tuple):
+        """
+        Applies one queued completion and answers its request.
+
+        Args:
+            write (tuple): The habit name, the date of the completion and the future of the request.
+        """
+        habit_name, current_date, future = write
+        habit = self._habits_by_name.get(habit_name)
+        added = habit is not None and habit.mark_complete(current_date)
+        if added:
+            self._version += 1
+        self._pending_saves += 1
+        if not future.done():
+            future.set_result(added)
+
+    def _cached(self, key: str, build):
+        """
+        Returns a serialized response from the cache, building it if the habits changed or the day
+        passed since it was cached.
+
+        Args:
+            key (str): The cache key.
+            build (Callable[[], object]): Builds the JSON-serializable response.
+
+        Returns:
+            bytes: The serialized response.
+        """
+        state = (self._version, date.today())
+        if self._cache_state != state:
+            self._cache.clear()
+            self._cache_state = state
+        body = self._cache.get(key)
+        if body is None:
+            body = self._cache[key] = json.dumps(build()).encode()
+        return body
+
+    def _get_habit(self, name: str):
+        """
+        Returns the habit with the given name.
+
+        Args:
+            name (str): The name of the habit.
+
+        Returns:
+            Habit: The habit.
+
+        Raises:
+            HttpError: If there is no such habit.
+        """
+        habit = self._habits_by_name.get(name)
+        if habit is None:
+            raise HttpError(404, f"No habit named '{name}'")
+        return habit
+
+    def _list_habits(self):
+        """
+        Builds the habit list response.
+
+        Returns:
+            list[dict]: Name, frequency, completion status and current streak of every habit.
+        """
+        current_date = datetime.today()
+        return [{
+            'name': habit.name,
+            'frequency': habit.frequency,
+            'completed': habit.is_completed_in_this_period(current_date),
+            'current_streak': habit.get_current_streak(current_date),
+        } for habit in self.habits]
+
+    def _habit_details(self, habit: Habit):
+        """
+        Builds the response of a single habit.
+
+        Args:
+            habit (Habit): The habit.
+
+        Returns:
+            dict: The stored habit fields and its current streak.
+        """
+        details = habit.to_dict()
+        details['current_streak'] = habit.get_current_streak()
+        return details
+
+    def _analytics(self):
+        """
+        Builds the analytics response.
+
+        Returns:
+            dict: The number of habits, unchecked habits and the best and most struggled habits.
+        """
+        best, worst = analytics.rank_habits(self.habits, 5)
+        return {
+            'habits': len(self.habits),
+            'unchecked': [self.habits[i].name for i in analytics.filter_habits_unchecked(self.habits)],
+            'best': [{'name': habit.name, 'current_streak': habit.current_streak} for habit in best],
+            'struggling': [{'name': habit.name, 'current_streak': habit.current_streak} for habit in worst],
+        }
+
+    async def handle_request(self, method: str, path: str, body: bytes):
+        """
+        Routes one request.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path, without the query string.
+            body (bytes): The request body.
+
+        Returns:
+            bytes: The JSON response body.
+
+        Raises:
+            HttpError: If the request cannot be answered.
+        """
+        parts = [unquote(part) for part in path.strip('/').split('/')]
+        if parts == ['habits']:
+            if method != 'GET':
+                raise HttpError(405, "Use GET")
+            return self._cached('habits', self._list_habits)
+        if parts == ['analytics']:
+            if method != 'GET':
+                raise HttpError(405, "Use GET")
+            return self._cached('analytics', self._analytics)
+        if len(parts) == 2 and parts[0] == 'habits':
+            if method != 'GET':
+                raise HttpError(405, "Use GET")
+            habit = self._get_habit(parts[1])
+            return self._cached('habit:' + habit.name, lambda: self._habit_details(habit))
+        if len(parts) == 3 and parts[0] == 'habits' and parts[2] == 'complete':
+            if method != 'POST':
+                raise HttpError(405, "Use POST")
+            habit = self._get_habit(parts[1])
+            current_date = None
+            if body:
+                try:
+                    current_date = datetime.fromisoformat(json.loads(body)['date'])
+                except (ValueError, KeyError, TypeError):
+                    raise HttpError(400, 'Expected a body like {"date": "2024-06-30T20:00:00"}')
+            future = asyncio.get_running_loop().create_future()
+            # The habit is looked up again when the write is applied, as a merged save may replace it by then
+            await self._writes.put((habit.name, current_date, future))
+            return json.dumps({'added': await future}).encode()
+        raise HttpError(404, f"No route for {path}")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Answers the requests of one keep-alive HTTP/1.1 connection.
+
+        Args:
+            reader (asyncio.StreamReader): The connection's reader.
+            writer (asyncio.StreamWriter): The connection's writer.
+        """
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                    break
+                request_line, *header_lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = request_line.split(' ')
+                except ValueError:
+                    break
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                status = 200
+                try:
+                    length = int(headers.get('content-length', 0))
+                    if length > MAX_BODY_SIZE:
+                        raise HttpError(413, "Request body too large")
+                    body = await reader.readexactly(length) if length else b''
+                    response = await self.handle_request(method, urlsplit(target).path, body)
+                except HttpError as e:
+                    status = e.status
+                    response = json.dumps({'error': str(e)}).encode()
+                except ValueError:
+                    status = 400
+                    response = json.dumps({'error': "Invalid Content-Length"}).encode()
+
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                writer.write(
+                    f"HTTP/1.1 {status} {_REASONS[status]}\r\n"
+                    f"Content-Type: application/json\r\n"
+                    f"Content-Length: {len(response)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + response)
+                await writer.drain()
+                if not keep_alive or status == 413:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+def _save_habit_dicts(habit_dicts: list[dict], habit_file: str, generation: int):
+    """
+    Saves serialized habits, merging in changes saved by other processes since the given generation.
+    Runs in a worker thread, on habits of its own.
+
+    Args:
+        habit_dicts (list[dict]): The habits, as returned by Habit.to_dict.
+        habit_file (str): The path to the habit file.
+        generation (int): The generation the habits were loaded or last saved at.
+
+    Returns:
+        tuple[int, list[Habit]]: The generation of the saved file and the saved habits, including merged changes.
+    """
+    habits = [Habit.from_dict(habit_data) for habit_data in habit_dicts]
+    return storage.save_habits_merged(habits, habit_file, generation), habits
+
+
+async def _serve(habit_file: str, host: str, port: int):
+    """
+    Runs the server until interrupted, saving queued writes before exiting.
+
+    Args:
+        habit_file (str): The path to the habit file.
+        host (str): The address to listen on.
+        port (int): The port to listen on.
+    """
+    server = HabitServer(habit_file)
+    port = await server.start(host, port)
+    print(f"Serving {habit_file} on http://{host}:{port}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve habits over HTTP/JSON.")
+    parser.add_argument('--file', default="habits.json", help="habit file (default: habits.json)")
+    parser.add_argument('--host', default="127.0.0.1", help="address to listen on (default: 127.0.0.1)")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    args = parser.parse_args()
+    try:
+        asyncio.run(_serve(args.file, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,320 @@
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+from Habit import Habit
+
+SQLITE_EXTENSIONS = ('.db', '.sqlite', '.sqlite3')  # Habit files with these extensions are SQLite databases
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS habits (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    description TEXT NOT NULL,
+    frequency TEXT NOT NULL,
+    created TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS completions (
+    habit_id INTEGER NOT NULL REFERENCES habits(id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    marked_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS completions_habit_day ON completions (habit_id, day);
+"""
+
+
+def is_sqlite_file(habits_file: str):
+    """
+    Checks if the habit file should be handled by the SQLite backend, based on its extension.
+
+    Args:
+        habits_file (str): The path to the habit file.
+
+    Returns:
+        bool: True if the file is a SQLite database, False otherwise.
+    """
+    return habits_file.lower().endswith(SQLITE_EXTENSIONS)
+
+
+def connect(db_file: str):
+    """
+    Opens a connection to the SQLite habit database, creating the schema if needed.
+
+    Args:
+        db_file (str): The path to the database file.
+
+    Returns:
+        sqlite3.Connection: An open connection to the database.
+    """
+    connection = sqlite3.connect(db_file)
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def load_habits(db_file: str):
+    """
+    Loads habits from a SQLite database, in the order they were added.
+
+    Args:
+        db_file (str): The path to the database file.
+
+    Returns:
+        list: A list of Habit objects.
+    """
+    if not os.path.exists(db_file):
+        return []
+
+    connection = connect(db_file)
+    try:
+        marked_dates = {}
+        for habit_id, marked_at in connection.execute(
+                "SELECT habit_id, marked_at FROM completions ORDER BY rowid"):
+            marked_dates.setdefault(habit_id, []).append(datetime.fromisoformat(marked_at))
+
+        habits = []
+        for habit_id, name, description, frequency, created in connection.execute(
+                "SELECT id, name, description, frequency, created FROM habits ORDER BY id"):
+            habit = Habit(name, description, frequency)
+            habit.created = datetime.fromisoformat(created)
+            habit.marked_dates = marked_dates.get(habit_id, [])
+            habits.append(habit)
+        return habits
+    finally:
+        connection.close()
+
+
+def save_habits(habits: list[Habit], db_file: str):
+    """
+    Replaces the contents of a SQLite database with the given habits, in a single transaction.
+
+    Args:
+        habits (list[Habit]): The list of Habit objects to save.
+        db_file (str): The path to the database file.
+    """
+    connection = connect(db_file)
+    try:
+        with connection:
+            connection.execute("DELETE FROM completions")
+            connection.execute("DELETE FROM habits")
+            for habit in habits:
+                _insert_habit(connection, habit)
+    finally:
+        connection.close()
+
+
+def _insert_habit(connection: sqlite3.Connection, habit: Habit):
+    """
+    Inserts a habit row and its completion rows using an open connection.
+
+    Args:
+        connection (sqlite3.Connection): The connection to insert with, inside a transaction.
+        habit (Habit): The habit to insert.
+    """
+    cursor = connection.execute(
+        "INSERT INTO habits (name, description, frequency, created) VALUES (?, ?, ?, ?)",
+        (habit.name, habit.description, habit.frequency, habit.created.isoformat()))
+    connection.executemany(
+        "INSERT INTO completions (habit_id, day, marked_at) VALUES (?, ?, ?)",
+        [(cursor.lastrowid, date.date().isoformat(), date.isoformat()) for date in habit.marked_dates])
+
+
+def add_habit(habit: Habit, db_file: str):
+    """
+    Inserts a single new habit, with its completions, into a SQLite database.
+
+    Args:
+        habit (Habit): The habit to add.
+        db_file (str): The path to the database file.
+    """
+    connection = connect(db_file)
+    try:
+        with connection:
+            _insert_habit(connection, habit)
+    finally:
+        connection.close()
+
+
+def delete_habit(habit_name: str, db_file: str):
+    """
+    Deletes a habit and its completions from a SQLite database.
+
+    Args:
+        habit_name (str): The name of the habit to delete.
+        db_file (str): The path to the database file.
+    """
+    connection = connect(db_file)
+    try:
+        with connection:
+            connection.execute("DELETE FROM habits WHERE name = ?", (habit_name,))
+    finally:
+        connection.close()
+
+
+def add_completion(habit_name: str, marked_date: datetime, db_file: str):
+    """
+    Records a single completion of a habit with one INSERT, unless the day is already marked.
+
+    Args:
+        habit_name (str): The name of the completed habit.
+        marked_date (datetime): The date and time of the completion.
+        db_file (str): The path to the database file.
+
+    Returns:
+        bool: True if a completion was added, False otherwise.
+    """
+    day = marked_date.date().isoformat()
+    connection = connect(db_file)
+    try:
+        with connection:
+            cursor = connection.execute(
+                """
+                INSERT INTO completions (habit_id, day, marked_at)
+                SELECT id, ?, ? FROM habits
+                WHERE name = ?
+                  AND NOT EXISTS (SELECT 1 FROM completions WHERE habit_id = habits.id AND day = ?)
+                """,
+                (day, marked_date.isoformat(), habit_name, day))
+        return cursor.rowcount > 0
+    finally:
+        connection.close()
+
+
+def habit_exists(habit_name: str, db_file: str):
+    """
+    Checks if a habit with the given name is stored, without loading the habits.
+
+    Args:
+        habit_name (str): The name of the habit.
+        db_file (str): The path to the database file.
+
+    Returns:
+        bool: True if the habit exists, False otherwise.
+    """
+    connection = connect(db_file)
+    try:
+        return connection.execute("SELECT 1 FROM habits WHERE name = ?", (habit_name,)).fetchone() is not None
+    finally:
+        connection.close()
+
+
+def filter_habits_unchecked(db_file: str, current_date: datetime = None):
+    """
+    SQL version of analytics.filter_habits_unchecked, answered from the completions index.
+
+    Args:
+        db_file (str): The path to the database file.
+        current_date (datetime, optional): The date to check for completion. Defaults to now.
+
+    Returns:
+        list: Indices (in load_habits order) of habits that are not completed in the current period.
+    """
+    if current_date is None:
+        current_date = datetime.today()
+
+    day = current_date.date()
+    week_start = day - timedelta(days=day.weekday())
+    week_end = week_start + timedelta(days=6)
+    month_start = day.replace(day=1)
+    month_end = (month_start + timedelta(days=31)).replace(day=1) - timedelta(days=1)
+
+    connection = connect(db_file)
+    try:
+        rows = connection.execute(
+            """
+            WITH habit_periods AS (
+                SELECT id, frequency, created,
+                    -- N of EVERY_<N>_DAYS frequencies, NULL for other frequencies
+                    CASE WHEN frequency GLOB 'EVERY_[1-9]*_DAYS'
+                            AND substr(frequency, 7, length(frequency) - 11) NOT GLOB '*[^0-9]*'
+                        THEN CAST(substr(frequency, 7, length(frequency) - 11) AS INTEGER)
+                    END AS days,
+                    CAST(julianday(:day) - julianday(date(created)) AS INTEGER) AS days_since_created
+                FROM habits
+            ),
+            every_n_days AS (
+                -- Days from the creation date to the start of the current N-day period, rounded down
+                SELECT *, CASE WHEN days_since_created >= 0 THEN days_since_created / days
+                               ELSE -((days - 1 - days_since_created) / days)
+                          END * days AS period_start
+                FROM habit_periods
+            )
+            SELECT position FROM (
+                SELECT ROW_NUMBER() OVER (ORDER BY id) - 1 AS position,
+                    CASE
+                        WHEN frequency = 'DAILY' THEN EXISTS (
+                            SELECT 1 FROM completions WHERE habit_id = every_n_days.id AND day = :day)
+                        WHEN frequency = 'WEEKLY' THEN EXISTS (
+                            SELECT 1 FROM completions WHERE habit_id = every_n_days.id AND day BETWEEN :week_start AND :week_end)
+                        WHEN frequency = 'MONTHLY' THEN EXISTS (
+                            SELECT 1 FROM completions WHERE habit_id = every_n_days.id AND day BETWEEN :month_start AND :month_end)
+                        WHEN days IS NOT NULL THEN EXISTS (
+                            SELECT 1 FROM completions WHERE habit_id = every_n_days.id AND day BETWEEN
+                                date(created, period_start || ' days') AND date(created, (period_start + days - 1) || ' days'))
+                        ELSE 0
+                    END AS completed
+                FROM every_n_days
+            )
+            WHERE NOT completed
+            ORDER BY position
+            """,
+            {'day': day.isoformat(), 'week_start': week_start.isoformat(), 'week_end': week_end.isoformat(),
+             'month_start': month_start.isoformat(), 'month_end': month_end.isoformat()})
+        return [position for (position,) in rows]
+    finally:
+        connection.close()
+
+
+def filter_habits_per_period(db_file: str, period: str):
+    """
+    SQL version of analytics.filter_habits_per_period.
+
+    Args:
+        db_file (str): The path to the database file.
+        period (str): The frequency period to filter by.
+
+    Returns:
+        list: Indices (in load_habits order) of habits that match the specified frequency.
+    """
+    connection = connect(db_file)
+    try:
+        rows = connection.execute(
+            """
+            SELECT position FROM (
+                SELECT ROW_NUMBER() OVER (ORDER BY id) - 1 AS position, frequency FROM habits
+            )
+            WHERE frequency = ?
+            ORDER BY position
+            """,
+            (period,))
+        return [position for (position,) in rows]
+    finally:
+        connection.close()
+
+
+def migrate_json_to_sqlite(json_file: str, db_file: str):
+    """
+    Copies all habits from a JSON habit file into a SQLite database, replacing its contents.
+
+    Args:
+        json_file (str): The path to the existing JSON habit file.
+        db_file (str): The path to the database file to create or overwrite.
+
+    Returns:
+        int: The number of migrated habits.
+    """
+    with open(json_file, 'r') as file:
+        habits = [Habit.from_dict(habit_data) for habit_data in json.load(file)]
+    save_habits(habits, db_file)
+    return len(habits)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 3:
+        print("Usage: python sqlite_storage.py <habits.json> <habits.db>")
+        sys.exit(1)
+
+    count = migrate_json_to_sqlite(sys.argv[1], sys.argv[2])
+    print(f"Migrated {count} habits from {sys.argv[1]} to {sys.argv[2]}.")
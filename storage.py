@@ -1,7 +1,30 @@
 import json
 import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
 from datetime import datetime
 from Habit import Habit  # Import the Habit class from the Habit module
+import binary_storage
+import instrumentation
+from instrumentation import instrumented
+import sqlite_storage
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows, where locking is skipped
+    fcntl = None
+
+JOURNAL_MODE = False  # If True, changes to JSON and binary habit files are appended to a journal instead of rewriting the file
+JOURNAL_SUFFIX = '.log'  # The journal of 'habits.json' is 'habits.json.log'
+JOURNAL_COMPACT_SIZE = 64 * 1024  # Journal size in bytes after which it is folded back into the JSON file
+KEEP_BACKUP = True  # If True, saving a JSON habit file keeps its previous version as a backup
+BACKUP_SUFFIX = '.bak'  # The backup of 'habits.json' is 'habits.json.bak'
+STREAM_CHUNK_SIZE = 64 * 1024  # Number of characters read at a time when streaming a JSON habit file
+LOCK_SUFFIX = '.lock'  # The lock file of 'habits.json' is 'habits.json.lock', which also holds the generation counter
+
+_held_locks = {}  # (thread id, lock file path) -> [open lock file, nesting depth, shared] for the locks held by this process
 
 # Custom JSON Encoder for handling datetime objects and Habit objects
 class CustomEncoder(json.JSONEncoder):
@@ -22,9 +45,11 @@ class CustomEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)  # Use default encoding for other types
 
 # Load habits from a JSON file
+@instrumented("storage.load_habits")
 def load_habits(habits_file: str):
     """
-    Loads habits from a specified JSON file.
+    Loads habits from a specified JSON file, or from a SQLite database or packed binary file
+    if the file has a database or binary extension.
 
     Args:
         habits_file (str): The path to the file containing the habits data.
@@ -32,37 +57,723 @@ def load_habits(habits_file: str):
     Returns:
         list: A list of Habit objects.
     """
+    if sqlite_storage.is_sqlite_file(habits_file):
+        habits = sqlite_storage.load_habits(habits_file)
+    else:
+        with lock_habit_file(habits_file, shared=True):
+            habits = _load_file_habits(habits_file)
+            if habits is None:
+                # Fall back to the previous version if the file is missing or corrupt
+                habits = _load_file_habits(habits_file + BACKUP_SUFFIX) or []
+
+            # Apply the changes journaled since the file was last written
+            replay_journal(habits, get_journal_file(habits_file))
+    if instrumentation.is_enabled():
+        _record_habits("storage.load_habits", habits, bytes_read=_file_size(habits_file))
+    return habits
+
+# Load habits together with the generation they belong to
+def load_habits_and_generation(habits_file: str):
+    """
+    Loads habits and reads the generation counter of the habit file under one lock,
+    so that the generation matches the loaded habits.
+
+    Args:
+        habits_file (str): The path to the file containing the habits data.
+
+    Returns:
+        tuple[list, int]: A list of Habit objects and the generation of the file.
+    """
+    with lock_habit_file(habits_file, shared=True):
+        return load_habits(habits_file), read_generation(habits_file)
+
+# Load habits from a single JSON or binary file
+def _load_file_habits(habits_file: str):
+    """
+    Loads habits from a JSON or binary habit file without looking at its backup or journal.
+
+    Args:
+        habits_file (str): The path to the file.
+
+    Returns:
+        list: A list of Habit objects, or None if the file is missing or corrupt.
+    """
     if not os.path.exists(habits_file):  # Check if the file exists
-        return []
+        return None
+    if binary_storage.is_binary_file(habits_file):
+        with open(habits_file, 'rb') as file:
+            try:
+                return binary_storage.decode_habits(file.read())
+            except ValueError:  # Handle corrupt binary files
+                return None
     try:
         with open(habits_file, 'r') as file:
             habits_data = json.load(file)  # Load the JSON data from the file
             # Convert each dictionary in the JSON data to a Habit object
             return [Habit.from_dict(habit_data) for habit_data in habits_data]
     except json.JSONDecodeError:  # Handle JSON decoding errors
-        return []
+        return None
+
+# Stream habits from a JSON file
+def iter_habits(habits_file: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """
+    Loads habits one at a time, parsing the JSON file incrementally so that only one habit
+    and one chunk of the file are held in memory at once. Journaled changes are applied on the way.
+
+    Args:
+        habits_file (str): The path to the file containing the habits data.
+        chunk_size (int, optional): The number of characters to read at a time.
+
+    Yields:
+        Habit: The habits in file order.
+    """
+    if (sqlite_storage.is_sqlite_file(habits_file) or binary_storage.is_binary_file(habits_file)
+            or not os.path.exists(habits_file)):
+        yield from load_habits(habits_file)
+        return
+
+    habits = (Habit.from_dict(habit_data) for habit_data in _iter_json_array(habits_file, chunk_size))
+    yield from _apply_journal(habits, _read_journal(get_journal_file(habits_file)))
+
+# Stream the elements of a top-level JSON array
+def _iter_json_array(json_file: str, chunk_size: int):
+    """
+    Parses the elements of the top-level array of a JSON file one at a time.
+
+    Args:
+        json_file (str): The path to the JSON file.
+        chunk_size (int): The number of characters to read at a time.
+
+    Yields:
+        The decoded array elements.
+
+    Raises:
+        json.JSONDecodeError: If the file is not a valid JSON array.
+    """
+    decoder = json.JSONDecoder()
+    with open(json_file, 'r') as file:
+        buffer = ''
+        position = 0
+        at_end_of_file = False
+        expected = '['  # The next structural character, once the array is open
+
+        while True:
+            # Skip whitespace and the separators between elements
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+
+            if position < len(buffer):
+                character = buffer[position]
+                if expected == '[':
+                    if character != '[':
+                        raise json.JSONDecodeError("Expected a JSON array", buffer, position)
+                    position += 1
+                    expected = 'element'
+                    continue
+                if character == ']' and expected in ('element', 'separator'):
+                    return
+                if character == ',' and expected == 'separator':
+                    position += 1
+                    expected = 'element'
+                    continue
+                if expected == 'element':
+                    try:
+                        element, end = decoder.raw_decode(buffer, position)
+                    except json.JSONDecodeError:
+                        if at_end_of_file:
+                            raise
+                    else:
+                        # An element running up to the end of the buffer may continue in the next chunk
+                        if end < len(buffer) or at_end_of_file:
+                            position = end
+                            expected = 'separator'
+                            yield element
+                            continue
+                else:
+                    raise json.JSONDecodeError("Expected ',' or ']'", buffer, position)
+            elif at_end_of_file:
+                raise json.JSONDecodeError("Unexpected end of file", buffer, position)
+
+            # The element is cut off at the end of the buffer, or the buffer is used up.
+            # Only the unparsed rest of the buffer is kept, so memory stays flat.
+            chunk = file.read(chunk_size)
+            if chunk == '':
+                at_end_of_file = True
+            buffer = buffer[position:] + chunk
+            position = 0
 
 # Save habits to a JSON file
+@instrumented("storage.save_habits")
 def save_habits(habits: list[Habit], habits_file: str):
     """
-    Saves a list of Habit objects to a specified JSON file.
+    Saves a list of Habit objects to a specified JSON file, or to a SQLite database or packed binary file
+    if the file has a database or binary extension.
 
     Args:
         habits (list[Habit]): The list of Habit objects to save.
         habits_file (str): The path to the file where the habits data will be saved.
     """
+    if sqlite_storage.is_sqlite_file(habits_file):
+        with lock_habit_file(habits_file):
+            sqlite_storage.save_habits(habits, habits_file)
+            _increment_generation(habits_file)
+        if instrumentation.is_enabled():
+            _record_habits("storage.save_habits", habits, bytes_written=_file_size(habits_file))
+        return
     try:
-        with open(habits_file, 'w') as file:
-            try:
-                # Convert the list of Habit objects to a list of dictionaries
-                habits_dict_list = [habit.to_dict() for habit in habits]
+        # Serialize the habits in memory first, so a failure here leaves the file untouched
+        if binary_storage.is_binary_file(habits_file):
+            data = binary_storage.encode_habits(habits)
+        else:
+            # Convert the list of Habit objects to a list of dictionaries
+            habits_dict_list = [habit.to_dict() for habit in habits]
 
-                # Serialize the list of dictionaries to JSON with indentation for readability
-                json_data = json.dumps(habits_dict_list, indent=4)
+            # Serialize the list of dictionaries to JSON with indentation for readability
+            data = json.dumps(habits_dict_list, indent=4)
 
-                # Write the JSON data to the file
-                file.write(json_data)
-            except IOError:  # Handle file I/O errors
-                print("Error: File is busy.")
+        with lock_habit_file(habits_file):
+            # Replace the file with the serialized data in one step
+            write_file_atomically(habits_file, data)
+
+            # The file now holds every journaled change
+            if os.path.exists(get_journal_file(habits_file)):
+                os.remove(get_journal_file(habits_file))
+            _increment_generation(habits_file)
+        if instrumentation.is_enabled():
+            # The data is bytes or ASCII-only JSON, so its length is its size in bytes
+            _record_habits("storage.save_habits", habits, bytes_written=len(data))
+    except IOError:  # Handle file I/O errors
+        print("Error: File is busy.")
+    except Exception as e:  # Catch all other exceptions
+        print(f"An error occurred: {e}")
+
+# Stream habits to a JSON file
+@instrumented("storage.save_habits_streaming")
+def save_habits_streaming(habits, habits_file: str):
+    """
+    Saves habits to a JSON file one at a time, without building the whole JSON document in memory.
+    The output is the same as that of save_habits, and the file is replaced atomically.
+
+    Args:
+        habits (Iterable[Habit]): The habits to save, for example from iter_habits.
+        habits_file (str): The path to the file where the habits data will be saved.
+    """
+    if sqlite_storage.is_sqlite_file(habits_file) or binary_storage.is_binary_file(habits_file):
+        save_habits(list(habits), habits_file)
+        return
+    try:
+        with lock_habit_file(habits_file):
+            write_file_atomically(habits_file, _iter_json_chunks(habits))
+
+            # The file now holds every journaled change
+            if os.path.exists(get_journal_file(habits_file)):
+                os.remove(get_journal_file(habits_file))
+            _increment_generation(habits_file)
+        instrumentation.record("storage.save_habits_streaming", bytes_written=_file_size(habits_file))
+    except IOError:  # Handle file I/O errors
+        print("Error: File is busy.")
     except Exception as e:  # Catch all other exceptions
         print(f"An error occurred: {e}")
+
+# Serialize habits chunk by chunk
+def _iter_json_chunks(habits):
+    """
+    Serializes habits as an indented JSON array, one habit at a time.
+
+    Args:
+        habits (Iterable[Habit]): The habits to serialize.
+
+    Yields:
+        str: Consecutive pieces of the JSON document.
+    """
+    first = True
+    for habit in habits:
+        habit_json = json.dumps(habit.to_dict(), indent=4).replace('\n', '\n    ')
+        yield ('[\n    ' if first else ',\n    ') + habit_json
+        first = False
+    yield '[]' if first else '\n]'
+
+# Write a file so that it is either fully replaced or left untouched
+def write_file_atomically(target_file: str, data: str):
+    """
+    Writes data to a temporary file in the same directory, flushes it to disk and renames it over the target.
+    A crash at any point leaves either the old or the new file in place, never a partial one.
+    If KEEP_BACKUP is set, the previous version of the target is kept with BACKUP_SUFFIX.
+
+    Args:
+        target_file (str): The path to the file to replace.
+        data (str | bytes | Iterable[str]): The new contents of the file, as a string, as bytes or as consecutive pieces.
+    """
+    directory = os.path.dirname(os.path.abspath(target_file))
+    descriptor, temp_file = tempfile.mkstemp(dir=directory, prefix=os.path.basename(target_file) + '.', suffix='.tmp')
+    temp_backup_file = temp_file + BACKUP_SUFFIX
+    try:
+        with os.fdopen(descriptor, 'wb' if isinstance(data, bytes) else 'w') as file:
+            if isinstance(data, (str, bytes)):
+                file.write(data)
+            else:
+                for piece in data:
+                    file.write(piece)
+            file.flush()
+            os.fsync(file.fileno())
+        # Temporary files are only readable by their owner, so the new file takes the mode of the one it replaces
+        if os.path.exists(target_file):
+            shutil.copymode(target_file, temp_file)
+        else:
+            os.chmod(temp_file, _new_file_mode())
+
+        if KEEP_BACKUP and os.path.exists(target_file):
+            # The backup is a second name for the old file rather than the old file moved away,
+            # so the target never stops existing
+            try:
+                os.link(target_file, temp_backup_file)
+            except OSError:
+                shutil.copy2(target_file, temp_backup_file)  # File systems without hard links
+            os.replace(temp_backup_file, target_file + BACKUP_SUFFIX)
+        os.replace(temp_file, target_file)
+    except BaseException:
+        for leftover_file in (temp_file, temp_backup_file):
+            if os.path.exists(leftover_file):
+                os.remove(leftover_file)
+        raise
+
+    _fsync_directory(directory)
+
+# Get the mode of a newly created file
+def _new_file_mode():
+    """
+    Returns the mode open() gives to a new file, read and write for everyone less the umask.
+
+    Returns:
+        int: The file mode.
+    """
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+# Flush a directory entry to disk
+def _fsync_directory(directory: str):
+    """
+    Flushes a directory to disk so that renames inside it survive a crash. Does nothing where
+    directories cannot be opened, such as on Windows.
+
+    Args:
+        directory (str): The path to the directory.
+    """
+    try:
+        descriptor = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(descriptor)
+    except OSError:
+        pass
+    finally:
+        os.close(descriptor)
+
+# Save a single new completion of a habit
+def save_completion(habit: Habit, habits: list[Habit], habits_file: str, marked_date: datetime = None):
+    """
+    Persists a new completion of a habit. SQLite databases get a single-row insert,
+    JSON files get a journal entry in journal mode and are rewritten otherwise.
+
+    Args:
+        habit (Habit): The habit that was just marked as complete.
+        habits (list[Habit]): The full list of Habit objects the habit belongs to.
+        habits_file (str): The path to the file where the habits data is stored.
+        marked_date (datetime, optional): The date and time of the new completion. Defaults to the latest one,
+            which is only the new one if it was not back-dated.
+    """
+    if marked_date is None:
+        marked_date = habit.marked_dates[-1]
+    if sqlite_storage.is_sqlite_file(habits_file):
+        with lock_habit_file(habits_file):
+            sqlite_storage.add_completion(habit.name, marked_date, habits_file)
+            _increment_generation(habits_file)
+    elif JOURNAL_MODE:
+        append_journal_entry(habits_file, {'op': 'complete', 'name': habit.name, 'date': marked_date.isoformat()})
+    else:
+        save_habits(habits, habits_file)
+
+# Save completions of habits in a database, by name
+def save_named_completions(habit_names: list[str], marked_date: datetime, db_file: str):
+    """
+    Records a completion of each named habit in a SQLite database with one INSERT per habit, without
+    loading the habits. Like every save, it holds the lock of the database and counts a new generation.
+
+    Args:
+        habit_names (list[str]): The names of the completed habits.
+        marked_date (datetime): The date and time of the completions.
+        db_file (str): The path to the database file.
+
+    Returns:
+        tuple[int, list[str]]: The number of completions added and the names of the unknown habits.
+    """
+    added = 0
+    unknown_names = []
+    with lock_habit_file(db_file):
+        for name in habit_names:
+            if sqlite_storage.add_completion(name, marked_date, db_file):
+                added += 1
+            elif not sqlite_storage.habit_exists(name, db_file):
+                unknown_names.append(name)
+        if added:
+            _increment_generation(db_file)
+    return added, unknown_names
+
+# Save a newly created habit
+def save_new_habit(habit: Habit, habits: list[Habit], habits_file: str):
+    """
+    Persists a habit that was just added to the list of habits.
+
+    Args:
+        habit (Habit): The new habit.
+        habits (list[Habit]): The full list of Habit objects, including the new habit.
+        habits_file (str): The path to the file where the habits data is stored.
+    """
+    if sqlite_storage.is_sqlite_file(habits_file):
+        with lock_habit_file(habits_file):
+            sqlite_storage.add_habit(habit, habits_file)
+            _increment_generation(habits_file)
+    elif JOURNAL_MODE:
+        append_journal_entry(habits_file, {'op': 'create', 'habit': habit.to_dict()})
+    else:
+        save_habits(habits, habits_file)
+
+# Save the deletion of a habit
+def save_deletion(habit: Habit, habits: list[Habit], habits_file: str):
+    """
+    Persists a habit deletion after the habit was removed from the list of habits.
+
+    Args:
+        habit (Habit): The deleted habit.
+        habits (list[Habit]): The full list of remaining Habit objects.
+        habits_file (str): The path to the file where the habits data is stored.
+    """
+    if sqlite_storage.is_sqlite_file(habits_file):
+        with lock_habit_file(habits_file):
+            sqlite_storage.delete_habit(habit.name, habits_file)
+            _increment_generation(habits_file)
+    elif JOURNAL_MODE:
+        append_journal_entry(habits_file, {'op': 'delete', 'name': habit.name})
+    else:
+        save_habits(habits, habits_file)
+
+# Get the journal file of a habit file
+def get_journal_file(habits_file: str):
+    """
+    Returns the path of the write-ahead journal kept next to a JSON habit file.
+
+    Args:
+        habits_file (str): The path to the JSON habit file.
+
+    Returns:
+        str: The path to the journal file.
+    """
+    return habits_file + JOURNAL_SUFFIX
+
+# Append a change to the journal
+def append_journal_entry(habits_file: str, entry: dict):
+    """
+    Appends one change as a single JSON line to the journal of a habit file and flushes it to disk.
+    Compacts the journal once it grows past JOURNAL_COMPACT_SIZE.
+
+    Args:
+        habits_file (str): The path to the JSON habit file.
+        entry (dict): The change, with an 'op' of 'complete', 'create' or 'delete'.
+    """
+    journal_file = get_journal_file(habits_file)
+    with lock_habit_file(habits_file):
+        with open(journal_file, 'a') as file:
+            file.write(json.dumps(entry) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        _increment_generation(habits_file)
+
+        if os.path.getsize(journal_file) > JOURNAL_COMPACT_SIZE:
+            compact_journal(habits_file)
+
+# Apply journaled changes to a list of habits
+def replay_journal(habits: list[Habit], journal_file: str):
+    """
+    Applies the changes recorded in a journal to a list of habits, in place.
+    Replaying an entry that is already applied has no effect, and a torn last line is ignored.
+
+    Args:
+        habits (list[Habit]): The habits loaded from the last snapshot.
+        journal_file (str): The path to the journal file.
+    """
+    if os.path.exists(journal_file):
+        habits[:] = _apply_journal(habits, _read_journal(journal_file))
+
+# Read the entries of a journal
+def _read_journal(journal_file: str):
+    """
+    Reads the entries of a journal, stopping at a line torn by a crash.
+
+    Args:
+        journal_file (str): The path to the journal file.
+
+    Returns:
+        list: The journal entries in the order they were written, empty if there is no journal.
+    """
+    entries = []
+    if not os.path.exists(journal_file):
+        return entries
+
+    with open(journal_file, 'r') as file:
+        for line in file:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:  # Write interrupted by a crash
+                break
+    return entries
+
+# Apply journal entries to a stream of habits
+def _apply_journal(habits, entries: list[dict]):
+    """
+    Applies journal entries to habits as they stream past. Habits keep their position,
+    deleted habits are dropped and created habits follow at the end, in the order they were created.
+
+    Args:
+        habits (Iterable[Habit]): The habits loaded from the last snapshot.
+        entries (list[dict]): The journal entries.
+
+    Yields:
+        Habit: The habits with the journaled changes applied.
+    """
+    # Entries only ever affect the habit they name, so they are applied per habit
+    entries_by_name = {}
+    for position, entry in enumerate(entries):
+        name = entry['habit']['name'] if entry['op'] == 'create' else entry['name']
+        entries_by_name.setdefault(name, []).append((position, entry))
+
+    created_habits = []
+    for habit in habits:
+        habit_entries = entries_by_name.pop(habit.name, None)
+        if habit_entries is None:
+            yield habit
+            continue
+
+        current_habit, created_at = _apply_habit_entries(habit, habit_entries)
+        if current_habit is habit:
+            yield habit
+        elif current_habit is not None:
+            created_habits.append((created_at, current_habit))
+
+    for habit_entries in entries_by_name.values():
+        current_habit, created_at = _apply_habit_entries(None, habit_entries)
+        if current_habit is not None:
+            created_habits.append((created_at, current_habit))
+
+    created_habits.sort(key=lambda item: item[0])
+    for created_at, habit in created_habits:
+        yield habit
+
+# Apply the journal entries of a single habit
+def _apply_habit_entries(habit: Habit, habit_entries: list):
+    """
+    Applies the journal entries that name one habit.
+
+    Args:
+        habit (Habit): The habit from the snapshot, or None if the snapshot does not contain it.
+        habit_entries (list): (position, entry) pairs for the habit, in journal order.
+
+    Returns:
+        tuple: The resulting habit (None if it ends up deleted) and the journal position
+        of the entry that created it (None if it comes from the snapshot).
+    """
+    created_at = None
+    for position, entry in habit_entries:
+        if entry['op'] == 'complete':
+            if habit is not None:
+                habit.mark_complete(datetime.fromisoformat(entry['date']))
+        elif entry['op'] == 'create':
+            if habit is None:
+                habit = Habit.from_dict(entry['habit'])
+                created_at = position
+        elif entry['op'] == 'delete':
+            habit = None
+            created_at = None
+    return habit, created_at
+
+# Fold the journal back into the JSON file
+def compact_journal(habits_file: str):
+    """
+    Writes the journaled changes into the JSON habit file and removes the journal.
+
+    Args:
+        habits_file (str): The path to the JSON habit file.
+    """
+    with lock_habit_file(habits_file):
+        save_habits(load_habits(habits_file), habits_file)
+
+# Record the habits and completions processed by an operation
+def _record_habits(operation: str, habits: list[Habit], **counters):
+    """
+    Adds the number of habits and completions to the instrumentation counters of an operation.
+
+    Args:
+        operation (str): The operation name.
+        habits (list[Habit]): The habits the operation processed.
+        **counters (int): Further counters, such as bytes_read.
+    """
+    instrumentation.record(operation, habits=len(habits),
+                           completions=sum(habit.count_completions() for habit in habits), **counters)
+
+# Get the size of a file for the instrumentation
+def _file_size(path: str):
+    """
+    Returns the size of a file.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        int: The size in bytes, 0 if the file does not exist.
+    """
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+# Get the lock file of a habit file
+def get_lock_file(habits_file: str):
+    """
+    Returns the path of the lock file kept next to a habit file. The habit file itself cannot be locked,
+    because saving replaces it with a new file.
+
+    Args:
+        habits_file (str): The path to the habit file.
+
+    Returns:
+        str: The path to the lock file.
+    """
+    return habits_file + LOCK_SUFFIX
+
+# Lock a habit file against other processes
+@contextmanager
+def lock_habit_file(habits_file: str, shared: bool = False):
+    """
+    Holds an advisory fcntl.flock lock on the lock file of a habit file. Readers share the lock,
+    writers hold it exclusively and create the lock file on first use. Nested locks of the same thread
+    reuse the outer lock, and a shared lock is upgraded if an exclusive one is nested in it.
+    Without fcntl, or if the lock file cannot be opened, nothing is locked.
+
+    Args:
+        habits_file (str): The path to the habit file.
+        shared (bool): Whether to take a shared lock for reading instead of an exclusive one.
+    """
+    key = (threading.get_ident(), os.path.abspath(get_lock_file(habits_file)))
+    held = _held_locks.get(key)
+    if held is not None:
+        if held[2] and not shared:
+            if fcntl is not None:
+                fcntl.flock(held[0].fileno(), fcntl.LOCK_EX)
+            held[2] = False
+        held[1] += 1
+        try:
+            yield
+        finally:
+            held[1] -= 1
+        return
+
+    try:
+        # Readers do not create the lock file; until a writer has created it there is nothing to wait for
+        lock_file = open(key[1], 'r' if shared else 'a')
+    except OSError:  # For example a read-only directory
+        yield
+        return
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        _held_locks[key] = [lock_file, 1, shared]
+        yield
+    finally:
+        _held_locks.pop(key, None)
+        lock_file.close()  # Closing the file releases the lock
+
+# Read the generation counter of a habit file
+def read_generation(habits_file: str):
+    """
+    Reads the generation counter of a habit file, which every save through this module increments.
+
+    Args:
+        habits_file (str): The path to the habit file.
+
+    Returns:
+        int: The generation, 0 if the file was never saved with a generation.
+    """
+    try:
+        with open(get_lock_file(habits_file), 'r') as file:
+            return int(file.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+# Increment the generation counter of a habit file
+def _increment_generation(habits_file: str):
+    """
+    Increments the generation counter of a habit file. Must be called while holding the exclusive lock.
+
+    Args:
+        habits_file (str): The path to the habit file.
+    """
+    generation = read_generation(habits_file) + 1
+    try:
+        # Rewriting the file in place keeps the locks on it
+        with open(get_lock_file(habits_file), 'w') as file:
+            file.write(str(generation))
+    except OSError:  # The lock file could not be created either
+        pass
+
+# Merge the stored habits into habits that are about to be saved
+def merge_habits(habits: list[Habit], stored_habits: list[Habit], known_names: set = None):
+    """
+    Merges habits saved by another process into a list of habits, in place. Completions are a union of days,
+    so each habit gets the stored days it is missing, and habits added to the file since the list was loaded
+    are appended. Habits that were loaded but are missing from the list were deleted by the caller and stay deleted.
+    Both sides keep every completion; a habit deleted by the other process comes back if it is in the list.
+
+    Args:
+        habits (list[Habit]): The habits about to be saved.
+        stored_habits (list[Habit]): The habits currently in the file.
+        known_names (set, optional): The names of the habits in the file when the list was loaded.
+            If None, every stored habit missing from the list is treated as new and appended.
+
+    Returns:
+        int: The number of completions and habits taken from the file.
+    """
+    habits_by_name = {habit.name: habit for habit in habits}
+    merged = 0
+    for stored_habit in stored_habits:
+        habit = habits_by_name.get(stored_habit.name)
+        if habit is None:
+            if known_names is None or stored_habit.name not in known_names:
+                habits.append(stored_habit)
+                merged += 1
+        elif habit is not stored_habit:
+            merged += habit.add_packed_dates(*stored_habit.get_packed_dates())
+    return merged
+
+# Save habits, merging in changes saved by other processes
+def save_habits_merged(habits: list[Habit], habits_file: str, generation: int = None, known_names: set = None):
+    """
+    Saves habits under the exclusive lock. If the file was saved by someone else since the habits were loaded
+    at the given generation, the stored completions and habits are merged into the list first, so that
+    concurrent read-modify-write cycles do not lose each other's updates.
+
+    Args:
+        habits (list[Habit]): The habits to save. Merged changes are added to this list and its habits.
+        habits_file (str): The path to the habit file.
+        generation (int, optional): The generation the habits were loaded at. If None, always merges.
+        known_names (set, optional): The names of the habits in the file at that generation, so that habits
+            deleted from the list are not merged back in. If None, missing habits are always merged back in.
+
+    Returns:
+        int: The generation of the saved file.
+    """
+    with lock_habit_file(habits_file):
+        if generation is None or read_generation(habits_file) != generation:
+            merge_habits(habits, load_habits(habits_file), known_names)
+        save_habits(habits, habits_file)
+        return read_generation(habits_file)
@@ -0,0 +1,35 @@
+def compute_streaks(keys, current_key: int, first_key: int = None):
+    """
+    Computes the current and the longest streak in a single pass over the period keys.
+
+    Args:
+        keys (Iterable[int]): Keys of the completed periods, in any order and possibly repeated.
+        current_key (int): Key of the current period; later keys are ignored.
+        first_key (int, optional): Key of the first period that may count towards a streak.
+
+    Returns:
+        tuple[int, int]: The current streak (ending in the current period) and the longest streak.
+    """
+    current_streak = 0
+    longest_streak = 0
+    run = 0
+    previous_key = None
+
+    for key in sorted(set(keys)):
+        if first_key is not None and key < first_key:
+            continue
+        if key > current_key:
+            break
+
+        if previous_key is not None and key == previous_key + 1:
+            run += 1
+        else:
+            run = 1
+        previous_key = key
+        longest_streak = max(longest_streak, run)
+
+    if previous_key == current_key:
+        current_streak = run
+
+    return current_streak, longest_streak
+
@@ -1,3 +1,6 @@
+import os
+import shutil
+import tempfile
 import unittest
 from unittest.mock import patch, mock_open
 from datetime import datetime, timedelta
@@ -5,14 +8,23 @@ from Habit import Habit
 from analytics import (
     filter_habits_unchecked,
     filter_habits_per_period,
+    classify_habits,
     count_streak_periods,
+    get_streaks,
     is_habit_on_the_list,
     get_habit_list,
     save_habit_list,
     get_best_performing_tasks,
-    get_most_struggled_tasks
+    get_most_struggled_tasks,
+    rank_habits,
+    get_completion_counts,
+    get_completion_rate,
+    get_monthly_table,
+    clear_repositories
 )
 from storage import load_habits, save_habits
+import batch_analytics
+from batch_analytics import compute_habit_stats
 
 
 
@@ -23,6 +35,9 @@ class TestAnalytics(unittest.TestCase):
     @patch('storage.load_habits')
     def setUp(self, mock_load_habits):
         self.habit_file = 'test_habits.json'
+        # Every test gets habits of its own, not those cached by an earlier test
+        clear_repositories()
+        self.addCleanup(clear_repositories)
         with open(self.habit_file, 'r') as file:
             mock_load_habits.return_value = load_habits(self.habit_file)
         self.habits = get_habit_list(self.habit_file)
@@ -38,12 +53,88 @@ class TestAnalytics(unittest.TestCase):
         self.assertEqual(len(daily_habits), 3)
         self.assertEqual(len(weekly_habits), 2)
 
+    def test_classify_habits(self):
+        current_date = datetime(2024, 6, 30, 20, 0)
+        self.habits.append(Habit("Water plants", "", "EVERY_3_DAYS"))
+        unchecked_habits, frequency_habits = classify_habits(self.habits, current_date)
+        self.assertEqual(unchecked_habits, [i for i, habit in enumerate(self.habits)
+                                            if not habit.is_completed_in_this_period(current_date)])
+        for frequency in ("DAILY", "WEEKLY", "MONTHLY", "EVERY_3_DAYS"):
+            self.assertEqual(frequency_habits[frequency], filter_habits_per_period(self.habits, frequency))
+
     def test_count_streak_periods(self):
         daily_streak = count_streak_periods(self.habits[1])  # "Eat vegetables"
         weekly_streak = count_streak_periods(self.habits[0])  # "Read a book"
         self.assertEqual(daily_streak, 4)
         self.assertEqual(weekly_streak, 4)
 
+    def test_get_streaks(self):
+        habit = Habit("Stretch", "Stretch for ten minutes", "DAILY")
+        habit.created = datetime(2024, 1, 1, 8, 0)
+        habit.marked_dates = [datetime(2024, 1, day, 9, 0) for day in (1, 2, 3, 4, 7, 8, 8)]
+        self.assertEqual(get_streaks(habit, datetime(2024, 1, 8, 10, 0)), (2, 4))
+        self.assertEqual(get_streaks(habit, datetime(2024, 1, 9, 10, 0)), (0, 4))
+
+        weekly_habit = Habit("Long run", "Run 10 km", "WEEKLY")
+        weekly_habit.created = datetime(2023, 12, 20, 8, 0)
+        weekly_habit.marked_dates = [datetime(2023, 12, 31), datetime(2024, 1, 1), datetime(2024, 1, 14)]
+        self.assertEqual(get_streaks(weekly_habit, datetime(2024, 1, 3)), (2, 2))  # Weeks 52 and 1 are consecutive
+        self.assertEqual(get_streaks(weekly_habit, datetime(2024, 1, 17)), (0, 3))
+
+    def test_count_streak_periods_sets_longest_streak(self):
+        habit = Habit("Stretch", "Stretch for ten minutes", "DAILY")
+        today = datetime.today()
+        habit.created = today - timedelta(days=30)
+        habit.marked_dates = [today - timedelta(days=offset) for offset in (0, 1, 10, 11, 12)]
+        self.assertEqual(count_streak_periods(habit), 2)
+        self.assertEqual(habit.current_streak, 2)
+        self.assertEqual(habit.longest_streak, 3)
+
+    def test_incremental_streaks_match_recomputation(self):
+        daily_habit = Habit("Stretch", "Stretch for ten minutes", "DAILY")
+        daily_habit.created = datetime(2024, 1, 1, 8, 0)
+        weekly_habit = Habit("Long run", "Run 10 km", "WEEKLY")
+        weekly_habit.created = datetime(2023, 12, 20, 8, 0)
+        days = [0, 1, 2, 5, 6, 6, 7, 20, 21, 3, 4, 40, 41, 42, 43]  # Includes a repeated day and late completions
+        for habit in (daily_habit, weekly_habit):
+            for i, day in enumerate(days):
+                habit.mark_complete(datetime(2024, 1, 1, 9, 0) + timedelta(days=day))
+                count_streak_periods(habit, datetime(2024, 1, 1, 20, 0) + timedelta(days=max(days[:i + 1])), verify=True)
+            for offset in range(0, 30):
+                count_streak_periods(habit, datetime(2024, 2, 10, 12, 0) + timedelta(days=offset), verify=True)
+
+    def test_count_streak_periods_verifies_streaks(self):
+        habit = self.habits[1]  # "Eat vegetables"
+        current_date = datetime(2024, 6, 30, 20, 0)
+        self.assertEqual(count_streak_periods(habit, current_date, verify=True), get_streaks(habit, current_date)[0])
+        habit.longest_streak += 1  # Corrupt the maintained streaks
+        with self.assertRaises(ValueError):
+            count_streak_periods(habit, current_date, verify=True)
+
+    def test_count_streak_periods_verifies_with_later_completions(self):
+        habit = Habit("Stretch", "Stretch for ten minutes", "DAILY")
+        habit.created = datetime(2024, 1, 1, 8, 0)
+        for day in range(5):
+            habit.mark_complete(datetime(2024, 1, 1, 9, 0) + timedelta(days=day))
+        # The completions after current_date still count towards the longest streak
+        self.assertEqual(count_streak_periods(habit, datetime(2024, 1, 2, 20, 0), verify=True), 2)
+        self.assertEqual(habit.longest_streak, 5)
+
+    def test_compute_habit_stats_matches_per_habit_analytics(self):
+        current_date = datetime(2024, 6, 30, 20, 0)
+        habits_stats = compute_habit_stats(self.habits, current_date, use_numpy=False)
+        for habit, habit_stats in zip(self.habits, habits_stats):
+            self.assertEqual((habit_stats.current_streak, habit_stats.longest_streak), get_streaks(habit, current_date))
+            self.assertEqual(habit_stats.completed, habit.is_completed_in_this_period(current_date))
+        self.assertEqual(habits_stats[1].current_streak, 4)  # "Eat vegetables"
+        self.assertAlmostEqual(habits_stats[1].completion_rate, 6 / 28)
+
+    @unittest.skipIf(batch_analytics.np is None, "NumPy is not installed")
+    def test_compute_habit_stats_numpy_matches_python(self):
+        current_date = datetime(2024, 6, 30, 20, 0)
+        self.assertEqual(compute_habit_stats(self.habits, current_date, use_numpy=True),
+                         compute_habit_stats(self.habits, current_date, use_numpy=False))
+
     @patch('storage.load_habits')
     def test_is_habit_on_the_list(self, mock_load_habits):
         mock_load_habits.return_value = self.habits
@@ -56,9 +147,14 @@ class TestAnalytics(unittest.TestCase):
         habits = get_habit_list(self.habit_file)
         self.assertEqual(len(habits), 5)
 
-    @patch('analytics.save_habits')
+    @patch('storage.save_habits')
     def test_save_habit_list(self, mock_save_habits):
-        save_habit_list(self.habits, self.habit_file)
+        # Saving takes the lock of the habit file, so save to a copy rather than next to the test data
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        habit_file = os.path.join(temp_dir, 'habits.json')
+        shutil.copy(self.habit_file, habit_file)
+        save_habit_list(self.habits, habit_file)
         self.assertEqual(mock_save_habits.call_count, 1)
 
     def test_get_best_performing_tasks(self):
@@ -71,6 +167,51 @@ class TestAnalytics(unittest.TestCase):
         self.assertEqual(struggled_tasks[0].name, "Do yoga")
         self.assertEqual(struggled_tasks[1].name, "Drink water")
 
+    def test_rank_habits(self):
+        habits = [Habit(name, "", "DAILY") for name in ("Walk", "Sing", "Swim", "Bake", "Cook")]
+        today = datetime.today()
+        for streak, habit in zip((2, 0, 2, 1, 0), habits):
+            habit.created = today - timedelta(days=10)
+            habit.marked_dates = [today - timedelta(days=offset) for offset in range(streak)]
+
+        best, worst = rank_habits(habits, 3)
+        self.assertEqual([habit.name for habit in best], ["Walk", "Swim", "Bake"])
+        self.assertEqual([habit.name for habit in worst], ["Sing", "Cook", "Bake"])
+        best, worst = rank_habits(habits, 2, tie_break_by_name=True)
+        self.assertEqual([habit.name for habit in best], ["Swim", "Walk"])
+        self.assertEqual([habit.name for habit in worst], ["Cook", "Sing"])
+
+        self.assertEqual(get_best_performing_tasks(habits), sorted(habits, key=lambda habit: habit.current_streak, reverse=True))
+        self.assertEqual([habit.name for habit in get_most_struggled_tasks(habits, 2)], ["Sing", "Cook"])
+
+    def test_completion_counts_and_rates(self):
+        habit = Habit("Walk", "", "DAILY")
+        habit.created = datetime(2024, 2, 10, 8, 0)
+        for day in range(0, 120, 3):
+            habit.mark_complete(datetime(2024, 2, 10) + timedelta(days=day))
+        days_by_month = {}
+        for marked_date in habit.marked_dates:
+            days_by_month[f"{marked_date.year}-{marked_date.month:02d}"] = days_by_month.get(f"{marked_date.year}-{marked_date.month:02d}", 0) + 1
+        self.assertEqual(get_completion_counts(habit, "MONTH"), days_by_month)
+        self.assertEqual(get_completion_counts(habit, "YEAR"), {'2024': 40})
+        self.assertEqual(sum(get_completion_counts(habit, "WEEK").values()), 40)
+
+        # February is due from the creation day, and June up to the current date
+        self.assertAlmostEqual(get_completion_rate(habit, "MONTH", datetime(2024, 5, 31), "2024-02"), days_by_month['2024-02'] / 20)
+        self.assertAlmostEqual(get_completion_rate(habit, "MONTH", datetime(2024, 6, 8)), sum(
+            1 for marked_date in habit.marked_dates if marked_date >= datetime(2024, 6, 1)) / 8)
+        self.assertEqual(get_completion_rate(habit, "MONTH", datetime(2024, 5, 31), "2024-01"), 0.0)
+
+        weekly_habit = Habit("Swim", "", "WEEKLY")
+        weekly_habit.created = datetime(2024, 1, 1, 8, 0)
+        for day in (1, 2, 15, 29):  # January 2024 has 5 Mondays
+            weekly_habit.mark_complete(datetime(2024, 1, day))
+        self.assertAlmostEqual(get_completion_rate(weekly_habit, "MONTH", datetime(2024, 1, 31)), 3 / 5)
+
+        table = get_monthly_table([habit, weekly_habit], 2024, datetime(2024, 12, 31))
+        self.assertEqual(table[0]['counts'][:6], [0] + [days_by_month.get(f"2024-{month:02d}", 0) for month in range(2, 7)])
+        self.assertEqual(table[1]['counts'], [3] + [0] * 11)
+        self.assertAlmostEqual(table[1]['rate'], 3 / 53)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,47 @@
+import unittest
+from datetime import datetime
+from benchmark import generate_habits, run_benchmarks, find_regressions
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_generate_habits(self):
+        current_date = datetime(2024, 6, 30)
+        habits = generate_habits(50, 20, weekly_share=0.5, current_date=current_date)
+        self.assertEqual(len(habits), 50)
+        self.assertEqual({habit.frequency for habit in habits}, {"DAILY", "WEEKLY"})
+        for habit in habits:
+            self.assertEqual(len({habit.get_period().key(marked_date.toordinal()) for marked_date in habit.marked_dates}), 20)
+            self.assertTrue(all(habit.created <= marked_date <= current_date.replace(hour=23) for marked_date in habit.marked_dates))
+        # The same seed generates the same habits
+        self.assertEqual([habit.to_dict() for habit in habits],
+                         [habit.to_dict() for habit in generate_habits(50, 20, weekly_share=0.5, current_date=current_date)])
+
+    def test_run_benchmarks(self):
+        run = run_benchmarks(scales=[(2, 5), (5, 10)], repeat=1)
+        self.assertEqual(len(run['results']), 14)
+        self.assertEqual({result['completions'] for result in run['results']}, {10, 50})
+        self.assertTrue(all(result['seconds'] >= 0 for result in run['results']))
+        self.assertEqual(len(run_benchmarks(scales=[(2, 5), (5, 10)], repeat=1, max_completions=10)['results']), 7)
+
+    def test_find_regressions(self):
+        baseline = {'results': [
+            {'operation': 'load_habits', 'habits': 10, 'completions': 100, 'seconds': 0.010},
+            {'operation': 'save_habits', 'habits': 10, 'completions': 100, 'seconds': 0.010},
+            {'operation': 'save_habits', 'habits': 1, 'completions': 10, 'seconds': 0.0001},
+        ]}
+        current = {'results': [
+            {'operation': 'load_habits', 'habits': 10, 'completions': 100, 'seconds': 0.020},
+            {'operation': 'save_habits', 'habits': 10, 'completions': 100, 'seconds': 0.012},
+            {'operation': 'save_habits', 'habits': 1, 'completions': 10, 'seconds': 0.0005},  # Below the noise floor
+            {'operation': 'from_dict', 'habits': 10, 'completions': 100, 'seconds': 1.0},  # Not in the baseline
+        ]}
+        regressions = find_regressions(baseline, current, threshold=0.25)
+        self.assertEqual([(regression['operation'], regression['completions']) for regression in regressions],
+                         [('load_habits', 100)])
+        self.assertAlmostEqual(regressions[0]['ratio'], 2.0)
+        self.assertEqual(find_regressions(baseline, current, threshold=1.5), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
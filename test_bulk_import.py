@@ -0,0 +1,80 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+import analytics
+import storage
+from storage import load_habits
+from bulk_import import date_range, read_completions, add_completions, mark_habits_complete, import_completions
+
+
+class TestBulkImport(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.habit_file = os.path.join(self.temp_dir, 'habits.json')
+        shutil.copy('test_habits.json', self.habit_file)
+        self.habits = load_habits(self.habit_file)
+        self.names = [habit.name for habit in self.habits]
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_date_range(self):
+        self.assertEqual(date_range(datetime(2024, 2, 27, 9, 0), datetime(2024, 3, 1)),
+                         [datetime(2024, 2, 27, 9, 0), datetime(2024, 2, 28, 9, 0),
+                          datetime(2024, 2, 29, 9, 0), datetime(2024, 3, 1, 9, 0)])
+        self.assertEqual(date_range(datetime(2024, 2, 27)), [datetime(2024, 2, 27)])
+
+    def test_add_completions_matches_mark_complete(self):
+        dates = [datetime(2024, 7, 1) + timedelta(days=offset, hours=offset % 3) for offset in (5, 0, 1, 1, 3, 9, 2)]
+        expected = load_habits(self.habit_file)
+        for habit in expected:
+            for marked_date in dates:
+                habit.mark_complete(marked_date)
+
+        added, unknown_names = add_completions(
+            self.habits, [(name, marked_date) for marked_date in dates for name in self.names + ["Unknown"]])
+        self.assertEqual(added, 6 * len(self.habits))
+        self.assertEqual(unknown_names, ["Unknown"])
+        for habit, expected_habit in zip(self.habits, expected):
+            self.assertEqual(habit.marked_dates, expected_habit.marked_dates)
+            self.assertEqual(analytics.count_streak_periods(habit, datetime(2024, 7, 10, 20, 0), verify=True),
+                             analytics.count_streak_periods(expected_habit, datetime(2024, 7, 10, 20, 0)))
+
+    def test_mark_habits_complete_saves_once(self):
+        with patch('storage.save_habits', wraps=storage.save_habits) as mock_save_habits:
+            added, unknown_names = mark_habits_complete(self.habit_file, self.names[:2],
+                                                        datetime(2024, 7, 1), datetime(2024, 7, 7))
+        self.assertEqual((added, unknown_names), (14, []))
+        mock_save_habits.assert_called_once()
+
+        habits = load_habits(self.habit_file)
+        self.assertTrue(habits[0].is_completed_in_this_period(datetime(2024, 7, 7)))
+        # Marking the same days again adds nothing
+        self.assertEqual(mark_habits_complete(self.habit_file, self.names[:1], datetime(2024, 7, 3)), (0, []))
+
+    def test_import_completions(self):
+        csv_file = os.path.join(self.temp_dir, 'completions.csv')
+        with open(csv_file, 'w') as file:
+            file.write(f"date,name\n2024-07-01,{self.names[0]}\n2024-07-02T08:30:00,{self.names[0]}\n2024-07-01,Unknown\n")
+        jsonl_file = os.path.join(self.temp_dir, 'completions.jsonl')
+        with open(jsonl_file, 'w') as file:
+            file.write(json.dumps({'name': self.names[1], 'date': "2024-07-03"}) + "\n\n")
+
+        self.assertEqual(list(read_completions(jsonl_file)), [(self.names[1], "2024-07-03")])
+        self.assertEqual(import_completions(self.habit_file, csv_file), (2, ["Unknown"]))
+        self.assertEqual(import_completions(self.habit_file, jsonl_file), (1, []))
+        habits = load_habits(self.habit_file)
+        self.assertEqual(habits[0].marked_dates[-1], datetime(2024, 7, 2, 8, 30))
+        self.assertTrue(habits[1].is_completed_in_this_period(datetime(2024, 7, 3)))
+
+        with self.assertRaises(ValueError):
+            list(read_completions(os.path.join(self.temp_dir, 'completions.txt')))
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
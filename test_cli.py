@@ -0,0 +1,98 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+import batch_analytics
+from cli import main
+from storage import load_habits, read_generation, save_habits
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.habit_file = os.path.join(self.temp_dir, 'habits.json')
+        shutil.copy('test_habits.json', self.habit_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def run_cli(self, *argv):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(io.StringIO()):
+            exit_code = main(['--file', self.habit_file, *argv])
+        return exit_code, output.getvalue()
+
+    def test_add(self):
+        exit_code, output = self.run_cli('add', 'Journal', '-d', 'Write a page', '-f', 'every_3_days')
+        self.assertEqual(exit_code, 0)
+        self.assertIn("Journal", output)
+        self.assertEqual(load_habits(self.habit_file)[-1].frequency, "EVERY_3_DAYS")
+        self.assertEqual(self.run_cli('add', 'Journal')[0], 1)  # Already tracked
+        self.assertEqual(self.run_cli('add', 'Nap', '-f', 'HOURLY')[0], 1)
+
+    def test_done_and_list(self):
+        exit_code, output = self.run_cli('--json', 'done', 'Do yoga', '--date', '2024-07-01')
+        self.assertEqual((exit_code, json.loads(output)), (0, {'added': 1, 'unknown': []}))
+        exit_code, output = self.run_cli('done', 'Do yoga', 'Unknown', '--date', '2024-07-02', '--until', '2024-07-04', '--json')
+        self.assertEqual((exit_code, json.loads(output)), (1, {'added': 3, 'unknown': ['Unknown']}))
+
+        exit_code, output = self.run_cli('list', '--date', '2024-07-04T20:00:00', '--json')
+        rows = {row['name']: row for row in json.loads(output)}
+        self.assertTrue(rows['Do yoga']['completed'])
+        self.assertEqual(rows['Do yoga']['current_streak'], 4)
+        exit_code, output = self.run_cli('list', '--unchecked', '--date', '2024-07-04T20:00:00', '--json')
+        self.assertNotIn('Do yoga', [row['name'] for row in json.loads(output)])
+
+    def test_done_on_sqlite(self):
+        db_file = os.path.join(self.temp_dir, 'habits.db')
+        save_habits(load_habits(self.habit_file), db_file)
+        self.habit_file = db_file
+        generation = read_generation(db_file)
+        self.assertEqual(self.run_cli('done', 'Do yoga', '--date', '2024-07-01')[0], 0)
+        # Other processes see the database changed
+        self.assertEqual(read_generation(db_file), generation + 1)
+        self.assertEqual(self.run_cli('done', 'Do yoga', 'Unknown', '--date', '2024-07-01', '--json'),
+                         (1, json.dumps({'added': 0, 'unknown': ['Unknown']}, indent=2) + "\n"))
+        self.assertTrue(load_habits(db_file)[4].is_completed_in_this_period(datetime(2024, 7, 1)))
+
+    def test_stats(self):
+        with patch('batch_analytics.compute_habit_stats', wraps=batch_analytics.compute_habit_stats) as compute_habit_stats:
+            exit_code, output = self.run_cli('stats', '--top', '2', '--date', '2024-06-30T20:00:00', '--json')
+        self.assertEqual(compute_habit_stats.call_count, 1)
+        stats = json.loads(output)
+        self.assertEqual(stats['habits'], 5)
+        self.assertEqual(len(stats['best']), 2)
+        self.assertEqual(stats['best'][0]['current_streak'], 4)
+
+    def test_export(self):
+        csv_file = os.path.join(self.temp_dir, 'completions.csv')
+        self.assertEqual(self.run_cli('export', '--format', 'csv', '--output', csv_file)[0], 0)
+        with open(csv_file) as file:
+            rows = file.read().splitlines()
+        self.assertEqual(rows[0], "name,date")
+        self.assertEqual(len(rows) - 1, sum(len(habit.marked_dates) for habit in load_habits(self.habit_file)))
+
+        exit_code, output = self.run_cli('export')
+        self.assertEqual([habit['name'] for habit in json.loads(output)],
+                         [habit.name for habit in load_habits(self.habit_file)])
+        # The format is chosen with --format only
+        with self.assertRaises(SystemExit):
+            self.run_cli('export', '--json')
+
+    def test_instrument_json(self):
+        summary_file = os.path.join(self.temp_dir, 'summary.json')
+        self.assertEqual(self.run_cli('--instrument-json', summary_file, 'stats')[0], 0)
+        with open(summary_file) as file:
+            summary = json.load(file)
+        self.assertEqual(summary['storage.load_habits']['calls'], 1)
+        self.assertEqual(summary['storage.load_habits']['habits'], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
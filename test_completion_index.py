@@ -0,0 +1,76 @@
+import random
+import unittest
+from datetime import date, datetime, timedelta
+from Habit import Habit
+import analytics
+
+
+class TestCompletionIndex(unittest.TestCase):
+
+    def setUp(self):
+        generator = random.Random(0)
+        self.start = datetime(2023, 12, 1)
+        self.habits = []
+        for frequency in ("DAILY", "WEEKLY", "MONTHLY", "EVERY_3_DAYS"):
+            for _ in range(5):
+                habit = Habit(f"{frequency} habit", "", frequency)
+                habit.created = self.start + timedelta(days=generator.randrange(60), hours=generator.randrange(24))
+                days = generator.sample(range(400), generator.randrange(1, 200))
+                # Some days are marked twice, at different times
+                days += generator.sample(days, len(days) // 5)
+                habit.marked_dates = [self.start + timedelta(days=day, hours=generator.randrange(24)) for day in days]
+                self.habits.append(habit)
+        self.windows = [(self.start + timedelta(days=first), self.start + timedelta(days=first + length))
+                        for first, length in [(-30, 10), (0, 0), (10, 45), (100, 200), (390, 30), (50, -5)]]
+
+    def test_counts_and_membership_match_brute_force(self):
+        for habit in self.habits:
+            index = habit.get_completion_index()
+            days = [marked_date.date() for marked_date in habit.marked_dates]
+            for first_date, last_date in self.windows:
+                in_window = [day for day in days if first_date.date() <= day <= last_date.date()]
+                self.assertEqual(index.count_completions(first_date, last_date), len(in_window))
+                self.assertEqual(analytics.count_completions_between(habit, first_date, last_date), len(set(in_window)))
+
+                period = habit.get_period()
+                first_key, last_key = period.key(first_date.toordinal()), period.key(last_date.toordinal())
+                self.assertEqual(index.count_periods(first_date, last_date),
+                                 len({period.key(day.toordinal()) for day in days} & set(range(first_key, last_key + 1))))
+            for day in range(-5, 405, 7):
+                moment = self.start + timedelta(days=day)
+                self.assertEqual(analytics.is_completed_on(habit, moment), moment.date() in days)
+
+    def test_streak_as_of_matches_current_streak(self):
+        for habit in self.habits:
+            for day in range(-5, 405, 3):
+                as_of = self.start + timedelta(days=day, hours=12)
+                self.assertEqual(analytics.get_streak_as_of(habit, as_of), habit.get_current_streak(as_of), (habit.frequency, as_of))
+
+    def test_gaps_match_brute_force(self):
+        for habit in self.habits:
+            period = habit.get_period()
+            keys = sorted({period.key(marked_date.toordinal()) for marked_date in habit.marked_dates})
+            for min_periods in (0, 1, 3, 10):
+                expected = [(date.fromordinal(period.day_range(previous_key + 1)[0]), date.fromordinal(period.day_range(key - 1)[1]))
+                            for previous_key, key in zip(keys, keys[1:]) if key - previous_key - 1 > min_periods]
+                self.assertEqual(analytics.find_gaps(habit, min_periods), expected)
+                for first_date, last_date in self.windows:
+                    self.assertEqual(analytics.find_gaps(habit, min_periods, first_date, last_date),
+                                     [gap for gap in expected if gap[1] >= first_date.date() and gap[0] <= last_date.date()])
+
+    def test_index_follows_changes(self):
+        habit = Habit("Read a book", "", "DAILY")
+        habit.created = datetime(2024, 6, 1)
+        habit.mark_complete(datetime(2024, 6, 1, 8))
+        self.assertEqual(analytics.get_streak_as_of(habit, datetime(2024, 6, 2, 20)), 0)
+        habit.mark_complete(datetime(2024, 6, 2, 8))
+        self.assertEqual(analytics.get_streak_as_of(habit, datetime(2024, 6, 2, 20)), 2)
+        self.assertTrue(analytics.is_completed_on(habit, date(2024, 6, 2)))
+        habit.frequency = "WEEKLY"
+        self.assertEqual(analytics.get_streak_as_of(habit, datetime(2024, 6, 2, 20)), 1)
+        del habit.marked_dates[1]
+        self.assertFalse(analytics.is_completed_on(habit, date(2024, 6, 2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
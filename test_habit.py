@@ -1,6 +1,7 @@
 import unittest
 from datetime import datetime, timedelta
 from Habit import Habit 
+from rollups import format_bucket
 
 class TestHabit(unittest.TestCase):
 
@@ -39,6 +40,31 @@ class TestHabit(unittest.TestCase):
         self.habit_weekly.marked_dates.append(next_week)
         self.assertTrue(self.habit_weekly.is_completed_in_this_period(next_week))
 
+    def test_completion_index_follows_marked_dates(self):
+        today = datetime.today()
+        self.habit_daily.marked_dates.append(today)
+        self.assertTrue(self.habit_daily.is_completed_in_this_period(today))
+        self.habit_daily.marked_dates.remove(today)
+        self.assertFalse(self.habit_daily.is_completed_in_this_period(today))
+        self.habit_daily.marked_dates = [today]
+        self.assertTrue(self.habit_daily.is_completed_in_this_period(today))
+
+    def test_marked_dates_stay_sorted(self):
+        dates = [datetime(2024, 6, 3, 8, 0), datetime(2024, 6, 1, 9, 30), datetime(2024, 6, 2)]
+        for date in dates:
+            self.habit_daily.marked_dates.append(date)
+        self.assertEqual(self.habit_daily.marked_dates, sorted(dates))
+        self.assertEqual(self.habit_daily.marked_dates[-1], datetime(2024, 6, 3, 8, 0))
+        del self.habit_daily.marked_dates[0]
+        self.assertEqual(len(self.habit_daily.marked_dates), 2)
+        self.assertFalse(self.habit_daily.is_completed_in_this_period(datetime(2024, 6, 1)))
+        self.assertFalse(hasattr(self.habit_daily, '__dict__'))
+
+    def test_weekly_completion_respects_iso_year(self):
+        self.habit_weekly.marked_dates.append(datetime(2023, 1, 30))  # ISO week 5 of 2023
+        self.assertTrue(self.habit_weekly.is_completed_in_this_period(datetime(2023, 2, 1)))
+        self.assertFalse(self.habit_weekly.is_completed_in_this_period(datetime(2024, 1, 31)))  # ISO week 5 of 2024
+
     def test_to_dict(self):
         self.habit_daily.mark_complete()
         habit_dict = self.habit_daily.to_dict()
@@ -58,6 +84,115 @@ class TestHabit(unittest.TestCase):
         self.assertEqual(new_habit.created, self.habit_daily.created)
         self.assertEqual(new_habit.marked_dates, self.habit_daily.marked_dates)
 
+    def test_from_dict_parses_marked_dates_lazily(self):
+        habit_dict = {
+            'name': "Exercise",
+            'description': "Daily exercise",
+            'frequency': "DAILY",
+            'created': "2024-06-01T08:00:00",
+            'marked_dates': ["2024-06-02T09:30:00.500000", "2024-06-03T07:15:00"],
+            'current_streak': 2,
+            'longest_streak': 2,
+            'last_period_key': datetime(2024, 6, 3).toordinal(),
+            'rollups': {'completions': 2, 'last_date': "2024-06-03T07:15:00",
+                        'weeks': "2024-W22:1,1", 'months': "2024-06:2", 'years': "2024:2"}
+        }
+        new_habit = Habit.from_dict(habit_dict)
+        self.assertEqual(new_habit.to_dict(), habit_dict)
+        self.assertIsNone(new_habit._ordinals)  # Nothing needed the completions yet
+        self.assertTrue(new_habit.is_completed_in_this_period(datetime(2024, 6, 3, 20, 0)))
+        self.assertEqual(new_habit.marked_dates, [datetime(2024, 6, 2, 9, 30, 0, 500000), datetime(2024, 6, 3, 7, 15)])
+        self.assertTrue(new_habit.mark_complete(datetime(2024, 6, 4, 10, 0)))
+        self.assertEqual(new_habit.to_dict()['marked_dates'][-1], "2024-06-04T10:00:00")
+
+    def test_mark_complete_updates_streaks(self):
+        self.habit_daily.created = datetime(2024, 6, 1, 8, 0)
+        for day in (1, 2, 3):
+            self.habit_daily.mark_complete(datetime(2024, 6, day, 9, 0))
+        self.assertEqual((self.habit_daily.current_streak, self.habit_daily.longest_streak), (3, 3))
+        self.habit_daily.mark_complete(datetime(2024, 6, 5, 9, 0))  # June 4 was skipped
+        self.assertEqual((self.habit_daily.current_streak, self.habit_daily.longest_streak), (1, 3))
+        self.assertEqual(self.habit_daily.get_current_streak(datetime(2024, 6, 5, 20, 0)), 1)
+        self.assertEqual(self.habit_daily.get_current_streak(datetime(2024, 6, 7, 20, 0)), 0)  # The streak is broken
+        self.habit_daily.mark_complete(datetime(2024, 6, 4, 9, 0))  # Filling the gap joins both streaks
+        self.assertEqual(self.habit_daily.get_current_streak(datetime(2024, 6, 5, 20, 0)), 5)
+        self.assertEqual(self.habit_daily.longest_streak, 5)
+
+    def test_streaks_are_stored(self):
+        self.habit_weekly.created = datetime(2024, 5, 27, 8, 0)
+        for day in (27, 29, 31):
+            self.habit_weekly.mark_complete(datetime(2024, 5, day))
+        self.habit_weekly.mark_complete(datetime(2024, 6, 3))
+        habit_dict = self.habit_weekly.to_dict()
+        self.assertEqual((habit_dict['current_streak'], habit_dict['longest_streak']), (2, 2))
+
+        new_habit = Habit.from_dict(habit_dict)
+        self.assertEqual(new_habit.get_current_streak(datetime(2024, 6, 9)), 2)
+        self.assertIsNone(new_habit._ordinals)  # The stored streaks did not need the completions
+
+        del habit_dict['current_streak'], habit_dict['longest_streak'], habit_dict['last_period_key']
+        old_habit = Habit.from_dict(habit_dict)  # Written before the streaks were stored
+        self.assertEqual(old_habit.get_current_streak(datetime(2024, 6, 9)), 2)
+        self.assertEqual(old_habit.longest_streak, 2)
+
+    def test_stored_streaks_are_not_trusted_after_edits(self):
+        self.habit_weekly.created = datetime(2024, 5, 27, 8, 0)
+        self.habit_weekly.mark_complete(datetime(2024, 6, 3))
+        habit_dict = self.habit_weekly.to_dict()
+        # A completion added by another tool, without updating the stored streaks
+        habit_dict['marked_dates'].append("2024-06-10T08:00:00")
+        edited_habit = Habit.from_dict(habit_dict)
+        self.assertEqual(edited_habit.get_current_streak(datetime(2024, 6, 10, 20, 0)), 2)
+        self.assertEqual(edited_habit.longest_streak, 2)
+
+    def test_monthly_and_every_n_days_habits(self):
+        habit_monthly = Habit("Budget", "Review the budget", "MONTHLY")
+        habit_monthly.created = datetime(2024, 1, 15, 8, 0)
+        for day in (datetime(2024, 1, 31), datetime(2024, 2, 1), datetime(2024, 3, 20)):
+            habit_monthly.mark_complete(day)
+        self.assertTrue(habit_monthly.is_completed_in_this_period(datetime(2024, 3, 1)))
+        self.assertFalse(habit_monthly.is_completed_in_this_period(datetime(2024, 4, 1)))
+        self.assertEqual(habit_monthly.get_current_streak(datetime(2024, 3, 31)), 3)
+
+        habit_every_3_days = Habit("Water plants", "Water the plants", "EVERY_3_DAYS")
+        habit_every_3_days.created = datetime(2024, 6, 5, 8, 0)
+        habit_every_3_days.mark_complete(datetime(2024, 6, 7))
+        self.assertTrue(habit_every_3_days.is_completed_in_this_period(datetime(2024, 6, 5)))
+        self.assertFalse(habit_every_3_days.is_completed_in_this_period(datetime(2024, 6, 8)))
+        habit_every_3_days.mark_complete(datetime(2024, 6, 8))
+        self.assertEqual(list(habit_every_3_days.period_keys()), [0, 1])
+        self.assertEqual(habit_every_3_days.get_current_streak(datetime(2024, 6, 10)), 2)
+
+    def test_rollups_follow_mark_complete(self):
+        self.habit_weekly.created = datetime(2024, 1, 1, 8, 0)
+        self.assertEqual(self.habit_weekly.get_rollups().months, {})  # Built before the first completion
+        for day in (datetime(2024, 1, 29), datetime(2024, 1, 31), datetime(2024, 2, 6), datetime(2024, 12, 31),
+                    datetime(2024, 1, 2), datetime(2025, 1, 1)):
+            self.habit_weekly.mark_complete(day)
+        rollups = self.habit_weekly.get_rollups()
+        # Weeks count once, in the month and year of their Monday
+        self.assertEqual({format_bucket("WEEK", key): count for key, count in rollups.weeks.items()},
+                         {'2024-W01': 1, '2024-W05': 1, '2024-W06': 1, '2025-W01': 1})
+        self.assertEqual(rollups.to_dict()['months'], "2024-01:2,1,0,0,0,0,0,0,0,0,0,1")
+        self.assertEqual(rollups.to_dict()['years'], "2024:4")
+        self.habit_weekly.marked_dates = list(self.habit_weekly.marked_dates)  # Built again from scratch
+        self.assertEqual(self.habit_weekly.get_rollups().to_dict(), rollups.to_dict())
+
+    def test_rollups_are_stored(self):
+        self.habit_daily.created = datetime(2024, 6, 1, 8, 0)
+        for day in (1, 2, 30):
+            self.habit_daily.mark_complete(datetime(2024, 6, day, 9, 0))
+        habit_dict = self.habit_daily.to_dict()
+        self.assertEqual(habit_dict['rollups']['months'], "2024-06:3")
+
+        new_habit = Habit.from_dict(habit_dict)
+        new_habit.mark_complete(datetime(2024, 7, 1, 9, 0))
+        self.assertEqual(new_habit.get_rollups().to_dict()['months'], "2024-06:3,1")
+
+        habit_dict['marked_dates'].append("2024-07-02T09:00:00")  # Edited without updating the rollups
+        stale_habit = Habit.from_dict(habit_dict)
+        self.assertEqual(stale_habit.get_rollups().to_dict()['months'], "2024-06:3,1")
+
     def test_print_out(self):
         # This test captures the printed output and verifies its correctness
         from io import StringIO
@@ -0,0 +1,74 @@
+import json
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+from Habit import Habit
+import instrumentation
+import storage
+
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.habit_file = os.path.join(self.temp_dir, 'habits.json')
+        shutil.copy('test_habits.json', self.habit_file)
+        instrumentation.reset()
+
+    def tearDown(self):
+        instrumentation.disable()
+        instrumentation.reset()
+        shutil.rmtree(self.temp_dir)
+
+    def test_disabled_records_nothing(self):
+        from_dict = Habit.__dict__['from_dict']
+        storage.load_habits(self.habit_file)
+        instrumentation.record("custom", 0.5, habits=1)
+        self.assertEqual(instrumentation.get_summary(), {})
+        # Per-habit methods are left unwrapped while disabled
+        self.assertIs(Habit.__dict__['from_dict'], from_dict)
+
+    def test_load_and_save_are_counted(self):
+        size = os.path.getsize(self.habit_file)
+        instrumentation.enable()
+        habits = storage.load_habits(self.habit_file)
+        storage.save_habits(habits, self.habit_file)
+        instrumentation.disable()
+        self.assertIs(type(Habit.__dict__['from_dict']), classmethod)
+
+        summary = instrumentation.get_summary()
+        completions = sum(habit.count_completions() for habit in habits)
+        load = summary['storage.load_habits']
+        self.assertEqual((load['calls'], load['habits'], load['completions']), (1, len(habits), completions))
+        self.assertEqual(load['bytes_read'], size)
+        self.assertEqual(summary['storage.save_habits']['bytes_written'], os.path.getsize(self.habit_file))
+        self.assertEqual(summary['Habit.from_dict']['calls'], len(habits))
+        self.assertEqual(summary['Habit.to_dict']['calls'], len(habits))
+
+    def test_percentiles(self):
+        instrumentation.enable()
+        for milliseconds in range(1, 101):
+            instrumentation.record("custom", milliseconds / 1000)
+        entry = instrumentation.get_summary()['custom']
+        self.assertEqual(entry['calls'], 100)
+        self.assertAlmostEqual(entry['p50_seconds'], 0.051)
+        self.assertAlmostEqual(entry['p99_seconds'], 0.100)
+        self.assertAlmostEqual(entry['max_seconds'], 0.100)
+        self.assertIn("custom", instrumentation.format_summary())
+
+    def test_report_and_profile(self):
+        output_file = os.path.join(self.temp_dir, 'summary.json')
+        profile_file = os.path.join(self.temp_dir, 'habits.prof')
+        instrumentation.enable()
+        with instrumentation.profile(profile_file):
+            storage.load_habits(self.habit_file)
+        instrumentation.report(output_file)
+        with open(output_file) as file:
+            self.assertEqual(json.load(file)['storage.load_habits']['calls'], 1)
+        self.assertGreater(pstats.Stats(profile_file).total_calls, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
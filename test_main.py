@@ -0,0 +1,79 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from Habit import Habit
+import main
+
+
+class TestHabitListPages(unittest.TestCase):
+
+    def setUp(self):
+        frequencies = ["DAILY", "DAILY", "WEEKLY", "EVERY_3_DAYS", "DAILY", "EVERY_10_DAYS", "WEEKLY"]
+        self.habits = [Habit(f"Habit {i}", "", frequency) for i, frequency in enumerate(frequencies)]
+        for habit in self.habits[::2]:
+            habit.mark_complete()
+        self.sections = main.get_habit_sections(self.habits)
+
+    def all_lines(self, sections):
+        lines = []
+        for title, indices in sections:
+            lines.append(f"{title}:")
+            lines.extend(f"{i+1}. {self.habits[i].name}" for i in indices)
+        return lines
+
+    def test_sections(self):
+        self.assertEqual([title for title, _ in self.sections], [
+            "Tasks not yet checked-off", "Weekly habits", "Daily habits", "Monthly habits",
+            "Every 3 days habits", "Every 10 days habits"])
+        self.assertEqual(self.sections[0][1], [1, 3, 5])
+        self.assertEqual(self.sections[3][1], [])  # Empty sections keep their title
+        self.assertEqual(main.count_section_lines(self.sections), len(self.all_lines(self.sections)))
+
+    def test_pages_split_the_list_at_any_size(self):
+        lines = self.all_lines(self.sections)
+        for page_size in (1, 2, 3, 4, 7, len(lines), 100):
+            page_count = (len(lines) + page_size - 1) // page_size
+            for page in range(page_count):
+                text = main.format_habit_page(self.habits, self.sections, page, page_size)
+                page_lines = [line for line in text.split("\n") if line]
+                self.assertEqual(page_lines, lines[page * page_size:(page + 1) * page_size], (page_size, page))
+                # A blank line separates sections, but never starts a page
+                self.assertFalse(text.startswith("\n"))
+            self.assertEqual(main.format_habit_page(self.habits, self.sections, page_count, page_size), "")
+
+    def test_page_boundary_at_section_title(self):
+        # With 4 lines per page, the second page starts with the title of the weekly habits
+        self.assertEqual(main.format_habit_page(self.habits, self.sections, 1, 4),
+                         "Weekly habits:\n3. Habit 2\n7. Habit 6\n\nDaily habits:")
+
+    def test_find_habit_page(self):
+        lines = self.all_lines(self.sections)
+        for page_size in (1, 3, 5, 100):
+            for i, habit in enumerate(self.habits):
+                page = main.find_habit_page(self.sections, i, page_size)
+                # The page holds the first line of the habit
+                self.assertEqual(page, lines.index(f"{i+1}. {habit.name}") // page_size)
+        self.assertIsNone(main.find_habit_page(self.sections, len(self.habits)))
+
+    def test_search_section(self):
+        temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, temp_dir)
+        habit_file = os.path.join(temp_dir, 'habits.json')
+        shutil.copy('test_habits.json', habit_file)
+        habits = main.analytics.get_habit_list(habit_file)
+        with patch('main.habit_file', habit_file):
+            sections = main.get_habit_sections(habits, "yoga")
+            all_matches = main.get_habit_sections(habits, "e")[0][1]
+            first_matches = main.get_habit_sections(habits, "e", 1)[0][1]
+        self.assertEqual(len(sections), 1)
+        self.assertEqual(sections[0][0], "Habits matching 'yoga'")
+        self.assertEqual(main.find_habit_page(sections, sections[0][1][0], 1), 1)
+        # A limited search finds the first matches only
+        self.assertGreater(len(all_matches), 1)
+        self.assertEqual(first_matches, all_matches[:1])
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,63 @@
+import csv
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime
+from parallel_analytics import find_habit_files, summarize_habit_file, analyze_habit_files, write_report
+
+
+class TestParallelAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.habit_files = []
+        for i in range(5):
+            habit_file = os.path.join(self.temp_dir, f'user{i}.json')
+            shutil.copy('test_habits.json', habit_file)
+            self.habit_files.append(habit_file)
+        with open(os.path.join(self.temp_dir, 'notes.txt'), 'w') as file:
+            file.write('not a habit file')
+        self.current_date = datetime(2024, 6, 30, 12, 0)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_find_habit_files(self):
+        self.assertEqual(find_habit_files(self.temp_dir), self.habit_files)
+        self.assertEqual(find_habit_files(os.path.join(self.temp_dir, 'user[12].json')), self.habit_files[1:3])
+
+    def test_summarize_habit_file(self):
+        summary = summarize_habit_file(self.habit_files[0], self.current_date)
+        self.assertEqual(summary['habits'], 5)
+        self.assertEqual(summary['daily_habits'] + summary['weekly_habits'], 5)
+        self.assertIsNone(summary['error'])
+
+    def test_parallel_matches_serial(self):
+        serial = analyze_habit_files(self.habit_files, workers=1, current_date=self.current_date)
+        parallel = analyze_habit_files(self.habit_files, workers=2, chunk_size=2, current_date=self.current_date)
+        self.assertEqual(parallel, serial)
+        self.assertEqual([summary['file'] for summary in parallel], self.habit_files)
+
+    def test_write_report(self):
+        summaries = analyze_habit_files(self.habit_files, workers=1, current_date=self.current_date)
+
+        output = io.StringIO()
+        write_report(summaries, output, 'json')
+        report = json.loads(output.getvalue())
+        self.assertEqual(report['totals']['files'], 5)
+        self.assertEqual(report['totals']['habits'], 25)
+
+        output = io.StringIO()
+        write_report(summaries, output, 'csv')
+        rows = list(csv.DictReader(io.StringIO(output.getvalue())))
+        self.assertEqual([row['file'] for row in rows], self.habit_files)
+
+        with self.assertRaises(ValueError):
+            write_report(summaries, io.StringIO(), 'xml')
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,69 @@
+import unittest
+from datetime import date, datetime, timedelta
+from unittest.mock import patch
+from Habit import Habit
+from periods import get_period, every_n_days_frequency, is_supported_frequency, get_frequency_label
+
+
+class TestPeriods(unittest.TestCase):
+
+    def test_weekly_keys_follow_iso_weeks(self):
+        period = get_period("WEEKLY")
+        self.assertEqual(period.key(date(2023, 12, 31).toordinal()) + 1, period.key(date(2024, 1, 1).toordinal()))
+        self.assertNotEqual(period.key(date(2023, 1, 30).toordinal()), period.key(date(2024, 1, 29).toordinal()))
+        self.assertEqual(period.day_range(period.key(date(2024, 1, 3).toordinal())),
+                         (date(2024, 1, 1).toordinal(), date(2024, 1, 7).toordinal()))
+
+    def test_monthly_periods(self):
+        period = get_period("MONTHLY")
+        self.assertEqual(period.key(date(2024, 2, 29).toordinal()), 2024 * 12 + 1)
+        self.assertEqual(period.key(date(2023, 12, 1).toordinal()) + 1, period.key(date(2024, 1, 31).toordinal()))
+        self.assertEqual(period.day_range(2024 * 12 + 1), (date(2024, 2, 1).toordinal(), date(2024, 2, 29).toordinal()))
+        self.assertEqual(period.step_back(datetime(2024, 3, 31, 9, 0), 1), datetime(2024, 2, 29, 9, 0))
+        # Stepping back from March 31 lands on February 29, before the creation date
+        self.assertEqual(period.count_reachable_periods(datetime(2024, 2, 29, 10, 0), datetime(2024, 3, 31, 9, 0)), 1)
+        self.assertEqual(period.count_reachable_periods(datetime(2024, 2, 29, 8, 0), datetime(2024, 3, 31, 9, 0)), 2)
+
+    def test_every_n_days_periods_start_at_creation(self):
+        created = datetime(2024, 6, 5, 18, 0)
+        period = get_period(every_n_days_frequency(3), created)
+        self.assertIs(period, get_period("EVERY_3_DAYS", created))  # Strategies are shared
+        self.assertEqual(period.key(created.toordinal()), 0)
+        self.assertEqual(period.key(date(2024, 6, 7).toordinal()), 0)
+        self.assertEqual(period.key(date(2024, 6, 8).toordinal()), 1)
+        self.assertEqual(period.key(date(2024, 6, 4).toordinal()), -1)
+        self.assertEqual(period.count_reachable_periods(created, datetime(2024, 6, 11, 12, 0)), 2)
+
+    def test_frequencies(self):
+        for frequency in ("DAILY", "WEEKLY", "MONTHLY", "EVERY_2_DAYS"):
+            self.assertTrue(is_supported_frequency(frequency))
+            self.assertIsNotNone(get_period(frequency, datetime(2024, 1, 1)))
+        for frequency in ("YEARLY", "EVERY_0_DAYS", "EVERY_X_DAYS"):
+            self.assertFalse(is_supported_frequency(frequency))
+            self.assertIsNone(get_period(frequency, datetime(2024, 1, 1)))
+        self.assertEqual(get_frequency_label("EVERY_14_DAYS"), "Every 14 days")
+        self.assertEqual(get_frequency_label("MONTHLY"), "Monthly")
+        with self.assertRaises(ValueError):
+            every_n_days_frequency(0)
+
+    def test_caches_survive_period_cache_evictions(self):
+        habits = []
+        for day in range(1500):  # More creation days than the period cache holds
+            habit = Habit(f"Habit {day}", "", "EVERY_3_DAYS")
+            habit.created = datetime(2020, 1, 1) + timedelta(days=day)
+            habit.mark_complete(habit.created)
+            habits.append(habit)
+        self.assertEqual(get_period("EVERY_3_DAYS", datetime(2020, 1, 1)), habits[0].get_period())
+        self.assertNotEqual(get_period("EVERY_3_DAYS", datetime(2020, 1, 2)), habits[0].get_period())
+        self.assertNotEqual(get_period("DAILY"), get_period("EVERY_1_DAYS", datetime(1, 1, 1)))
+
+        for habit in habits:
+            habit.get_current_streak(habit.created)
+        with patch.object(Habit, '_count_streaks', autospec=True, side_effect=Habit._count_streaks) as count_streaks:
+            for habit in habits:
+                self.assertEqual(habit.get_current_streak(habit.created), 1)
+        self.assertEqual(count_streaks.call_count, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,72 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from Habit import Habit
+import storage
+from repository import HabitRepository
+
+
+class TestHabitRepository(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.habit_file = os.path.join(self.temp_dir, 'habits.json')
+        shutil.copy('test_habits.json', self.habit_file)
+        self.repository = HabitRepository(self.habit_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_loads_file_once(self):
+        with patch('repository.storage.load_habits', wraps=storage.load_habits) as mock_load_habits:
+            self.assertEqual(len(self.repository.list()), 5)
+            self.assertIn("Read a book", self.repository)
+            self.assertNotIn("Meditation", self.repository)
+            self.assertEqual(self.repository.get("Do yoga").frequency, "DAILY")
+            self.assertEqual(mock_load_habits.call_count, 1)
+
+    def test_reloads_changed_file(self):
+        habits = self.repository.list()
+        storage.save_habits(habits[:2], self.habit_file)
+        os.utime(self.habit_file, ns=(0, 0))  # Make sure the change is visible even with coarse timestamps
+        self.assertEqual(len(self.repository.list()), 2)
+
+    def test_writes_only_on_change(self):
+        habit = self.repository.get("Do yoga")
+        with patch('repository.storage.save_completion') as mock_save_completion:
+            self.assertTrue(self.repository.mark_complete(habit))
+            self.assertFalse(self.repository.mark_complete(habit))
+            self.assertEqual(mock_save_completion.call_count, 1)
+
+    def test_changes_are_saved(self):
+        habit = Habit("Meditate", "Meditate for ten minutes", "DAILY")
+        self.repository.add(habit)
+        self.repository.mark_complete(habit)
+        self.repository.remove(self.repository.get("Read a book"))
+        self.assertEqual([habit.to_dict() for habit in storage.load_habits(self.habit_file)],
+                         [habit.to_dict() for habit in self.repository.list()])
+        with self.assertRaises(ValueError):
+            self.repository.add(Habit("Meditate", "", "WEEKLY"))
+
+    def test_save_deletes_habits_removed_from_the_list(self):
+        habits = self.repository.list()
+        deleted_habit = habits.pop(0)
+        self.repository.save(habits)
+        self.assertNotIn(deleted_habit.name, [habit.name for habit in storage.load_habits(self.habit_file)])
+
+        # Also when another process saved in between, whose new habit is kept
+        habits = self.repository.list()
+        other_habits = storage.load_habits(self.habit_file)
+        other_habits.append(Habit("Stretch", "", "DAILY"))
+        storage.save_habits(other_habits, self.habit_file)
+        deleted_habit = habits.pop(0)
+        self.repository.save(habits)
+        names = [habit.name for habit in storage.load_habits(self.habit_file)]
+        self.assertNotIn(deleted_habit.name, names)
+        self.assertIn("Stretch", names)
+
+
+if __name__ == '__main__':
+    unittest.main()
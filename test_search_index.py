@@ -0,0 +1,78 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from Habit import Habit
+from repository import HabitRepository
+from search_index import SearchIndex, tokenize
+
+
+class TestSearchIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.habits = [
+            Habit("Read a book", "Read at least 20 pages", "DAILY"),
+            Habit("Running", "Run in the morning", "WEEKLY"),
+            Habit("read news", "", "DAILY"),
+            Habit("Yoga", "Morning stretch, then read", "DAILY"),
+        ]
+        self.index = SearchIndex(self.habits)
+
+    def test_name_prefix(self):
+        self.assertEqual(self.index.find_by_name_prefix("read"), [0, 2])
+        self.assertEqual(self.index.find_by_name_prefix("Read a"), [0])
+        self.assertEqual(self.index.find_by_name_prefix("Swim"), [])
+
+    def test_search(self):
+        self.assertEqual(self.index.search("run morn"), [1])
+        self.assertEqual(self.index.search("MORNING"), [1, 3])
+        self.assertEqual(self.index.search("read"), [0, 2, 3])
+        self.assertEqual(self.index.search("read", limit=2), [0, 2])
+        self.assertEqual(self.index.search("read a b"), [0])  # Name prefix, with the spaces
+        self.assertEqual(self.index.search("pages swim"), [])
+        self.assertEqual(self.index.search("  "), [])
+
+    def test_search_matches_brute_force(self):
+        generator = random.Random(0)
+        words = ["walk", "water", "wake", "read", "run", "rest", "sleep", "stretch", "study"]
+        habits = [Habit(f"{generator.choice(words).title()} {i}",
+                        " ".join(generator.sample(words, 3)), "DAILY") for i in range(500)]
+        index = SearchIndex(habits)
+
+        def brute_force(query):
+            query_tokens = tokenize(query)
+            return [i for i, habit in enumerate(habits)
+                    if habit.name.casefold().startswith(query.casefold())
+                    or all(any(token.startswith(query_token) for token in tokenize(habit.name + " " + habit.description))
+                           for query_token in query_tokens)]
+
+        for query in ["wa", "walk", "re st", "study sleep", "Run 1", "s", "water 4", "zzz"]:
+            self.assertEqual(index.search(query), brute_force(query), query)
+            for limit in (1, 5, 50):
+                self.assertEqual(index.search(query, limit), brute_force(query)[:limit], (query, limit))
+
+
+class TestRepositorySearch(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.habit_file = os.path.join(self.temp_dir, 'habits.json')
+        shutil.copy('test_habits.json', self.habit_file)
+        self.repository = HabitRepository(self.habit_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def test_index_follows_changes(self):
+        habits = self.repository.list()
+        self.assertEqual(self.repository.search("do yoga"), [habits.index(self.repository.get("Do yoga"))])
+        self.repository.add(Habit("Do the dishes", "After dinner", "DAILY"))
+        self.assertEqual(len(self.repository.search("do")), 2)
+        self.assertEqual(self.repository.search("dinner"), [len(habits)])
+        self.repository.remove(self.repository.get("Do yoga"))
+        self.assertEqual(self.repository.search("dinner"), [len(habits) - 1])
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+from load_test import run_load_test
+from server import HabitServer, _save_habit_dicts
+import storage
+
+
+class TestHabitServer(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.habit_file = os.path.join(self.temp_dir, 'habits.json')
+        shutil.copy('test_habits.json', self.habit_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def run_server(self, scenario):
+        async def run():
+            server = HabitServer(self.habit_file, save_delay=0.05)
+            port = await server.start(port=0)
+            try:
+                await scenario(server, port)
+            finally:
+                await server.stop()
+        asyncio.run(run())
+
+    @staticmethod
+    async def request(port, method, path, body=None):
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        data = json.dumps(body).encode() if body is not None else b''
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(data)}\r\nConnection: close\r\n\r\n".encode() + data)
+        response = await reader.read()
+        writer.close()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split(b' ')[1]), json.loads(body)
+
+    def test_reads(self):
+        async def scenario(server, port):
+            status, habits = await self.request(port, 'GET', '/habits')
+            self.assertEqual(status, 200)
+            self.assertEqual([habit['name'] for habit in habits], [habit.name for habit in server.habits])
+            status, habit = await self.request(port, 'GET', '/habits/Do%20yoga')
+            self.assertEqual((status, habit['name']), (200, "Do yoga"))
+            status, result = await self.request(port, 'GET', '/analytics')
+            self.assertEqual((status, result['habits']), (200, len(server.habits)))
+            self.assertEqual((await self.request(port, 'GET', '/habits/Unknown'))[0], 404)
+            self.assertEqual((await self.request(port, 'GET', '/nothing'))[0], 404)
+            self.assertEqual((await self.request(port, 'POST', '/habits'))[0], 405)
+        self.run_server(scenario)
+
+    def test_writes_are_coalesced_into_one_save(self):
+        async def scenario(server, port):
+            responses = await asyncio.gather(*(
+                self.request(port, 'POST', '/habits/Do%20yoga/complete', {'date': f"2024-07-{day:02d}T08:00:00"})
+                for day in range(1, 11)))
+            self.assertEqual(responses, [(200, {'added': True})] * 10)
+            self.assertEqual(await self.request(port, 'POST', '/habits/Do%20yoga/complete', {'date': "2024-07-01"}),
+                             (200, {'added': False}))
+            self.assertEqual((await self.request(port, 'POST', '/habits/Do%20yoga/complete', {'day': 1}))[0], 400)
+            # The cached habit reflects the writes
+            status, habit = await self.request(port, 'GET', '/habits/Do%20yoga')
+            self.assertIn("2024-07-10T08:00:00", habit['marked_dates'])
+
+        with patch('storage.save_habits', wraps=storage.save_habits) as save_habits:
+            self.run_server(scenario)
+        self.assertEqual(save_habits.call_count, 1)
+        yoga = next(habit for habit in storage.load_habits(self.habit_file) if habit.name == "Do yoga")
+        self.assertEqual(sum(marked_date.month == 7 and marked_date.year == 2024 for marked_date in yoga.marked_dates), 10)
+
+    def test_changes_of_other_processes_are_merged_into_new_habits(self):
+        async def scenario(server, port):
+            read_book = server._habits_by_name["Read a book"]
+            other_habits = storage.load_habits(self.habit_file)
+            next(habit for habit in other_habits if habit.name == "Read a book").mark_complete(datetime(2024, 8, 1, 8, 0))
+            storage.save_habits(other_habits, self.habit_file)
+
+            await self.request(port, 'POST', '/habits/Do%20yoga/complete', {'date': "2024-07-01T08:00:00"})
+            await server._writes.join()
+            # The habits the readers were using are left alone, and the merged ones replace them
+            self.assertNotIn(datetime(2024, 8, 1, 8, 0), read_book.marked_dates)
+            status, habit = await self.request(port, 'GET', '/habits/Read%20a%20book')
+            self.assertIn("2024-08-01T08:00:00", habit['marked_dates'])
+            status, habit = await self.request(port, 'GET', '/habits/Do%20yoga')
+            self.assertIn("2024-07-01T08:00:00", habit['marked_dates'])
+        self.run_server(scenario)
+
+    def test_writes_queued_during_a_merged_save_are_kept(self):
+        async def scenario(server, port):
+            other_habits = storage.load_habits(self.habit_file)
+            next(habit for habit in other_habits if habit.name == "Read a book").mark_complete(datetime(2024, 8, 1, 8, 0))
+            storage.save_habits(other_habits, self.habit_file)
+
+            await self.request(port, 'POST', '/habits/Do%20yoga/complete', {'date': "2024-07-01T08:00:00"})
+            await asyncio.sleep(0.1)  # The merged save has started
+            self.assertEqual(await self.request(port, 'POST', '/habits/Do%20yoga/complete', {'date': "2024-07-02T08:00:00"}),
+                             (200, {'added': True}))
+
+        def slow_save(*args):
+            time.sleep(0.2)
+            return _save_habit_dicts(*args)
+
+        with patch('server._save_habit_dicts', side_effect=slow_save):
+            self.run_server(scenario)
+        yoga = next(habit for habit in storage.load_habits(self.habit_file) if habit.name == "Do yoga")
+        self.assertIn(datetime(2024, 7, 1, 8, 0), yoga.marked_dates)
+        self.assertIn(datetime(2024, 7, 2, 8, 0), yoga.marked_dates)
+
+    def test_load_test(self):
+        async def scenario(server, port):
+            result = await run_load_test('127.0.0.1', port, ['/habits', '/analytics'], connections=4, duration=0.2)
+            self.assertGreater(result['requests'], 0)
+            self.assertEqual(result['failures'], 0)
+        self.run_server(scenario)
+
+
+if __name__ == '__main__':
+    unittest.main()
\ No newline at end of file
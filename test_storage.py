@@ -0,0 +1,277 @@
+import json
+import multiprocessing
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+from unittest.mock import patch
+from datetime import datetime, timedelta
+from Habit import Habit
+import analytics
+from repository import HabitRepository
+import sqlite_storage
+from storage import (
+    load_habits,
+    save_habits,
+    save_completion,
+    get_journal_file,
+    compact_journal,
+    iter_habits,
+    save_habits_streaming,
+    read_generation,
+    merge_habits,
+    save_habits_merged
+)
+
+
+def _write_concurrently(habit_file: str, worker: int, days: int):
+    # Each save is a separate read-modify-write cycle, as in a main.py session
+    habits = analytics.get_habit_list(habit_file)
+    habits.append(Habit(f"Worker {worker}", "", "DAILY"))
+    analytics.save_habit_list(habits, habit_file)
+    for day in range(days):
+        habits = analytics.get_habit_list(habit_file)
+        habits[0].mark_complete(datetime(2025, 1, 1) + timedelta(days=worker * days + day))
+        analytics.save_habit_list(habits, habit_file)
+
+
+class TestStorage(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.json_file = os.path.join(self.temp_dir, 'habits.json')
+        self.db_file = os.path.join(self.temp_dir, 'habits.db')
+        self.binary_file = os.path.join(self.temp_dir, 'habits.bin')
+        shutil.copy('test_habits.json', self.json_file)
+        self.habits = load_habits(self.json_file)
+
+    def tearDown(self):
+        shutil.rmtree(self.temp_dir)
+
+    def assertSameHabits(self, habits, expected):
+        self.assertEqual([habit.to_dict() for habit in habits], [habit.to_dict() for habit in expected])
+
+    def test_json_round_trip(self):
+        save_habits(self.habits, self.json_file)
+        self.assertSameHabits(load_habits(self.json_file), self.habits)
+
+    def test_iter_habits(self):
+        for chunk_size in (1, 7, 4096):
+            self.assertSameHabits(list(iter_habits(self.json_file, chunk_size)), self.habits)
+
+    def test_iter_habits_rejects_invalid_json(self):
+        habits_json = [json.dumps(habit.to_dict()) for habit in self.habits[:2]]
+        with open(self.json_file, 'w') as file:
+            file.write('[' + ' '.join(habits_json) + ']')  # Missing comma
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_habits(self.json_file))
+
+    def test_save_habits_streaming(self):
+        save_habits(self.habits, self.json_file)
+        with open(self.json_file, 'r') as file:
+            expected = file.read()
+        save_habits_streaming(iter_habits(self.json_file), self.json_file)
+        with open(self.json_file, 'r') as file:
+            self.assertEqual(file.read(), expected)
+
+        save_habits_streaming([], self.json_file)
+        self.assertEqual(load_habits(self.json_file), [])
+
+    def test_binary_round_trip(self):
+        save_habits(self.habits, self.binary_file)
+        habits = load_habits(self.binary_file)
+        self.assertSameHabits(habits, self.habits)
+        self.assertEqual(habits[1].marked_dates, self.habits[1].marked_dates)
+
+    def test_binary_load_keeps_packed_dates(self):
+        save_habits(self.habits, self.binary_file)
+        habit = load_habits(self.binary_file)[1]  # "Eat vegetables"
+        self.assertTrue(habit.is_completed_in_this_period(datetime(2024, 6, 30, 23, 0)))
+        self.assertEqual(habit.get_packed_dates()[0][-1], datetime(2024, 6, 30).toordinal())
+        self.assertEqual(habit.marked_dates[-1], datetime(2024, 6, 30, 11, 15, 42, 884809))
+
+    def test_sqlite_round_trip(self):
+        save_habits(self.habits, self.db_file)
+        self.assertSameHabits(load_habits(self.db_file), self.habits)
+
+    def test_migrate_json_to_sqlite(self):
+        count = sqlite_storage.migrate_json_to_sqlite(self.json_file, self.db_file)
+        self.assertEqual(count, 5)
+        self.assertSameHabits(load_habits(self.db_file), self.habits)
+
+    def test_sqlite_save_completion(self):
+        save_habits(self.habits, self.db_file)
+        habit = self.habits[4]
+        self.assertTrue(habit.mark_complete())
+        save_completion(habit, self.habits, self.db_file)
+        self.assertSameHabits(load_habits(self.db_file), self.habits)
+        # The same day is not inserted twice
+        self.assertFalse(sqlite_storage.add_completion(habit.name, datetime.today(), self.db_file))
+
+    def test_back_dated_completion_is_saved(self):
+        for habit_file, journal_mode in ((self.db_file, False), (self.json_file, True), (self.json_file, False)):
+            with self.subTest(habit_file=habit_file, journal_mode=journal_mode), patch('storage.JOURNAL_MODE', journal_mode):
+                save_habits(self.habits, habit_file)
+                repository = HabitRepository(habit_file)
+                habit = repository.get("Do yoga")
+                self.assertTrue(repository.mark_complete(habit, datetime(2024, 6, 10, 8, 0)))
+                self.assertTrue(repository.mark_complete(habit, datetime(2024, 6, 5, 8, 0)))
+                marked_dates = next(habit for habit in load_habits(habit_file) if habit.name == "Do yoga").marked_dates
+                self.assertIn(datetime(2024, 6, 10, 8, 0), marked_dates)
+                self.assertIn(datetime(2024, 6, 5, 8, 0), marked_dates)
+                compact_journal(habit_file)
+
+    def test_sqlite_filters_match_analytics(self):
+        for frequency, day in (("MONTHLY", 3), ("EVERY_3_DAYS", 20), ("EVERY_10_DAYS", 5)):
+            habit = Habit(frequency.lower(), "", frequency)
+            habit.created = datetime(2024, 5, 28, 18, 0)
+            habit.mark_complete(datetime(2024, 6, day, 7, 0))
+            self.habits.append(habit)
+        save_habits(self.habits, self.db_file)
+        current_dates = [datetime(2024, 6, 30), datetime(2024, 6, 24), datetime.today()]
+        current_dates += [datetime(2024, 5, 20) + timedelta(days=offset) for offset in range(0, 50, 3)]
+        for current_date in current_dates:
+            self.assertEqual(sqlite_storage.filter_habits_unchecked(self.db_file, current_date),
+                             [i for i, habit in enumerate(self.habits)
+                              if not habit.is_completed_in_this_period(current_date)])
+        for period in ("DAILY", "WEEKLY"):
+            self.assertEqual(sqlite_storage.filter_habits_per_period(self.db_file, period),
+                             analytics.filter_habits_per_period(self.habits, period))
+
+    def test_failed_save_keeps_file(self):
+        with open(self.json_file, 'r') as file:
+            snapshot = file.read()
+        with patch.object(Habit, 'to_dict', side_effect=RuntimeError("serialization failed")):
+            save_habits(self.habits, self.json_file)
+        with open(self.json_file, 'r') as file:
+            self.assertEqual(file.read(), snapshot)
+        self.assertEqual(os.listdir(self.temp_dir), ['habits.json'])
+
+    def test_load_falls_back_to_backup(self):
+        save_habits(self.habits, self.json_file)
+        self.assertTrue(os.path.exists(self.json_file + '.bak'))
+        with open(self.json_file, 'w') as file:
+            file.write('[{"name": "Read a bo')
+        self.assertSameHabits(load_habits(self.json_file), self.habits)
+
+    def test_save_never_removes_the_file(self):
+        with open(self.json_file, 'r') as file:
+            snapshot = file.read()
+        replace = os.replace
+
+        def checked_replace(source, destination):
+            self.assertTrue(os.path.exists(self.json_file))
+            replace(source, destination)
+
+        self.habits[0].mark_complete(datetime(2025, 1, 1))
+        with patch('storage.os.replace', side_effect=checked_replace) as mock_replace:
+            save_habits(self.habits, self.json_file)
+        self.assertEqual(mock_replace.call_count, 2)
+        with open(self.json_file + '.bak', 'r') as file:
+            self.assertEqual(file.read(), snapshot)
+        self.assertSameHabits(load_habits(self.json_file), self.habits)
+        self.assertEqual([name for name in os.listdir(self.temp_dir) if '.tmp' in name], [])
+
+    @unittest.skipIf(os.name == 'nt', "File modes are POSIX only")
+    def test_save_keeps_the_file_mode(self):
+        os.chmod(self.json_file, 0o644)
+        save_habits(self.habits, self.json_file)
+        self.assertEqual(stat.S_IMODE(os.stat(self.json_file).st_mode), 0o644)
+        os.chmod(self.json_file, 0o600)
+        save_habits(self.habits, self.json_file)
+        self.assertEqual(stat.S_IMODE(os.stat(self.json_file).st_mode), 0o600)
+
+        new_file = os.path.join(self.temp_dir, 'new_habits.json')
+        umask = os.umask(0o022)
+        try:
+            save_habits(self.habits, new_file)
+        finally:
+            os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(new_file).st_mode), 0o644)
+
+    @patch('storage.JOURNAL_MODE', True)
+    def test_journal_mode_appends_changes(self):
+        with open(self.json_file, 'r') as file:
+            snapshot = file.read()
+
+        repository = HabitRepository(self.json_file)
+        new_habit = Habit("Meditate", "Meditate for ten minutes", "DAILY")
+        repository.add(new_habit)
+        repository.mark_complete(new_habit)
+        repository.remove(repository.list()[0])
+
+        with open(self.json_file, 'r') as file:
+            self.assertEqual(file.read(), snapshot)
+        with open(get_journal_file(self.json_file), 'r') as file:
+            self.assertEqual(len(file.readlines()), 3)
+        self.assertSameHabits(load_habits(self.json_file), repository.list())
+        self.assertSameHabits(list(iter_habits(self.json_file)), repository.list())
+
+    @patch('storage.JOURNAL_MODE', True)
+    def test_journal_ignores_torn_entry(self):
+        habit = self.habits[4]
+        habit.mark_complete()
+        save_completion(habit, self.habits, self.json_file)
+        with open(get_journal_file(self.json_file), 'a') as file:
+            file.write('{"op": "delete", "na')
+        self.assertSameHabits(load_habits(self.json_file), self.habits)
+
+    @patch('storage.JOURNAL_MODE', True)
+    def test_journal_compaction(self):
+        with patch('storage.JOURNAL_COMPACT_SIZE', 200):
+            for habit in self.habits:
+                habit.mark_complete()
+                save_completion(habit, self.habits, self.json_file)
+        self.assertLess(os.path.getsize(get_journal_file(self.json_file)), 200)
+        compact_journal(self.json_file)
+        self.assertFalse(os.path.exists(get_journal_file(self.json_file)))
+        self.assertSameHabits(load_habits(self.json_file), self.habits)
+
+    def test_saves_increment_generation(self):
+        generation = read_generation(self.json_file)
+        save_habits(self.habits, self.json_file)
+        self.assertEqual(read_generation(self.json_file), generation + 1)
+        with patch('storage.JOURNAL_MODE', True):
+            save_completion(self.habits[0], self.habits, self.json_file)
+        self.assertEqual(read_generation(self.json_file), generation + 2)
+
+    def test_merge_habits(self):
+        stored_habits = load_habits(self.json_file)
+        stored_habits[0].mark_complete(datetime(2025, 1, 1))
+        stored_habits.append(Habit("Stretch", "", "DAILY"))
+        self.habits[0].mark_complete(datetime(2025, 1, 2))
+        self.assertEqual(merge_habits(self.habits, stored_habits), 2)
+        self.assertEqual(self.habits[0].marked_dates[-2:], [datetime(2025, 1, 1), datetime(2025, 1, 2)])
+        self.assertEqual(self.habits[-1].name, "Stretch")
+
+    def test_stale_save_merges_instead_of_overwriting(self):
+        generation = read_generation(self.json_file)
+        other_habits = load_habits(self.json_file)
+        other_habits[1].mark_complete(datetime(2025, 1, 1))
+        save_habits(other_habits, self.json_file)
+
+        self.habits[1].mark_complete(datetime(2025, 1, 2))
+        self.assertEqual(save_habits_merged(self.habits, self.json_file, generation), generation + 2)
+        marked_dates = load_habits(self.json_file)[1].marked_dates
+        self.assertIn(datetime(2025, 1, 1), marked_dates)
+        self.assertIn(datetime(2025, 1, 2), marked_dates)
+
+    def test_concurrent_writer_processes_lose_nothing(self):
+        workers, days = 6, 8
+        processes = [multiprocessing.Process(target=_write_concurrently, args=(self.json_file, worker, days))
+                     for worker in range(workers)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        habits = load_habits(self.json_file)
+        self.assertEqual({f"Worker {worker}" for worker in range(workers)} - {habit.name for habit in habits}, set())
+        expected_dates = {datetime(2025, 1, 1) + timedelta(days=day) for day in range(workers * days)}
+        self.assertEqual(expected_dates - set(habits[0].marked_dates), set())
+
+
+if __name__ == '__main__':
+    unittest.main()